@@ -0,0 +1,65 @@
+# Misura il throughput del calcolo IVA a blocchi e della scrittura del report in streaming.
+#
+#   python3 benchmark_iva.py [numero_righe]
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import calcolatrice_iva as calc
+
+
+def genera_righe(n):
+    for i in range(n):
+        yield f"Prodotto {i}", (i % 100_000) / 100 + 0.99, 0.22 if i % 3 else 0.10
+
+
+def misura_calcolo(n):
+    prezzi = [(i % 100_000) / 100 + 0.99 for i in range(n)]
+    aliquote = [0.22 if i % 3 else 0.10 for i in range(n)]
+    risultati = {}
+
+    inizio = time.perf_counter()
+    for p, a in zip(prezzi, aliquote):
+        calc.calcola_iva(p, a)
+    risultati["riga per riga"] = time.perf_counter() - inizio
+
+    inizio = time.perf_counter()
+    calc._calcola_blocco_python(prezzi, aliquote)
+    risultati["blocco puro Python"] = time.perf_counter() - inizio
+
+    if calc.np is not None:
+        inizio = time.perf_counter()
+        calc._calcola_blocco_numpy(prezzi, aliquote)
+        risultati["blocco NumPy"] = time.perf_counter() - inizio
+
+    return risultati
+
+
+def misura_report(n):
+    with tempfile.TemporaryDirectory() as cartella:
+        nome_file = os.path.join(cartella, "report.csv")
+        inizio = time.perf_counter()
+        calc.scrivi_report_iva(genera_righe(n), nome_file)
+        secondi = time.perf_counter() - inizio
+
+        # Seconda passata solo per il picco di memoria: tracemalloc rallenta molto l'esecuzione
+        tracemalloc.start()
+        calc.scrivi_report_iva(genera_righe(n), nome_file)
+        _, picco = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return secondi, picco
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    print(f"--- Calcolo IVA su {n} prezzi ---")
+    for nome, secondi in misura_calcolo(n).items():
+        print(f"{nome:>20}: {secondi:7.3f} s | {n / secondi / 1e6:6.2f} M righe/s")
+
+    secondi, picco = misura_report(n)
+    print(f"--- Report CSV in streaming ({n} righe, blocchi da {calc.DIMENSIONE_BLOCCO}) ---")
+    print(f"{'scrittura':>20}: {secondi:7.3f} s | {n / secondi / 1e6:6.2f} M righe/s | picco memoria {picco / 1e6:.1f} MB")
@@ -1,43 +1,158 @@
-def calcola_iva(prezzo_base):
+import csv # Importa il modulo standard
+import math
+import sys
+from itertools import islice
 
-	aliquota_iva = 0.22
-	iva_calcolata = prezzo_base * aliquota_iva
-	prezzo_finale = prezzo_base + iva_calcolata
-	return prezzo_base, iva_calcolata, prezzo_finale, aliquota_iva
+# NumPy è opzionale: se manca, il calcolo a blocchi usa lo stesso algoritmo in puro Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-dati_csv = []
+ALIQUOTA_DEFAULT = 0.22
 
-intestazione = ["Nome Prodotto", "Prezzo Base", "IVA Calcolata", "Prezzo Finale", "Aliquota"]
-dati_csv.append(intestazione)
+# Numero di righe elaborate (e scritte) per volta: la memoria usata non dipende dalla lunghezza del listino
+DIMENSIONE_BLOCCO = 100_000
 
-# Esempio 1: Laptop
-pb_laptop, iva_laptop, pf_laptop, ali_laptop = calcola_iva(1500.00)
-dati_csv.append(["Laptop", pb_laptop, iva_laptop, pf_laptop, ali_laptop])
+INTESTAZIONE = ["Nome Prodotto", "Prezzo Base", "IVA Calcolata", "Prezzo Finale", "Aliquota"]
 
-# Esempio 2: Smartphone
-pb_smartphone, iva_smartphone, pf_smartphone, ali_smartphone = calcola_iva(450.00)
-dati_csv.append(["Smartphone", pb_smartphone, iva_smartphone, pf_smartphone, ali_smartphone])
 
-# Esempio 3: Caricabatterie
-pb_caricabatterie, iva_caricabatterie, pf_caricabatterie, ali_caricabatterie = calcola_iva(20.00)
-dati_csv.append(["Caricabatterie", pb_caricabatterie, iva_caricabatterie, pf_caricabatterie, ali_caricabatterie])
+# Scala (sei cifre decimali) a cui si riporta prezzo x 100 prima dell'arrotondamento al centesimo: elimina l'errore
+# della rappresentazione binaria (1.005 * 100 = 100.49999999999999) e lascia intatti i mezzi centesimi
+SCALA_CORREZIONE = 1e6
 
-# esempio 4 : Cuffie
-pb_cuffie, iva_cuffie, pf_cuffie, ali_cuffie = calcola_iva(10.00)
-dati_csv.append(["Cuffie", pb_cuffie, iva_cuffie, pf_cuffie, ali_cuffie])
 
-import csv # Importa il modulo standard
+def calcola_iva(prezzo_base, aliquota_iva=ALIQUOTA_DEFAULT):
+    base_centesimi = _in_centesimi(prezzo_base)
+    iva_centesimi = _iva_in_centesimi(base_centesimi, round(aliquota_iva * 10000))
+    iva_calcolata = iva_centesimi / 100
+    prezzo_finale = (base_centesimi + iva_centesimi) / 100
+    return prezzo_base, iva_calcolata, prezzo_finale, aliquota_iva
+
+
+def _in_centesimi(prezzo):
+    # Arrotondamento al centesimo "half up" come per l'IVA (1.005 -> 101), con le stesse operazioni
+    # in virgola mobile di _calcola_blocco_numpy: i due percorsi danno sempre lo stesso risultato
+    return math.floor(round(prezzo * 100 * SCALA_CORREZIONE) / SCALA_CORREZIONE + 0.5)
+
+
+def _iva_in_centesimi(base_centesimi, aliquota_punti_base):
+    # Aritmetica intera: centesimi x punti base (0.22 -> 2200), arrotondamento al centesimo "half up"
+    return (base_centesimi * aliquota_punti_base + 5000) // 10000
+
+
+def _calcola_blocco_python(prezzi_base, aliquote):
+    base = [_in_centesimi(p) for p in prezzi_base]
+    if any(b < 0 for b in base):
+        raise ValueError("I prezzi base non possono essere negativi.")
+    iva = [_iva_in_centesimi(b, round(a * 10000)) for b, a in zip(base, aliquote)]
+    finale = [b + i for b, i in zip(base, iva)]
+    return base, iva, finale
+
+
+def _calcola_blocco_numpy(prezzi_base, aliquote):
+    centesimi = np.rint(np.asarray(prezzi_base, dtype=np.float64) * 100 * SCALA_CORREZIONE) / SCALA_CORREZIONE
+    base = np.floor(centesimi + 0.5).astype(np.int64)
+    if (base < 0).any():
+        raise ValueError("I prezzi base non possono essere negativi.")
+    punti_base = np.rint(np.asarray(aliquote, dtype=np.float64) * 10000).astype(np.int64)
+    iva = _iva_in_centesimi(base, punti_base)
+    return base, iva, base + iva
+
+
+def calcola_iva_centesimi(prezzi_base, aliquote=ALIQUOTA_DEFAULT):
+    """Calcola in un'unica passata le colonne (base, IVA, prezzo finale) in centesimi interi.
+
+    `aliquote` può essere un singolo valore o una sequenza della stessa lunghezza dei prezzi.
+    Prezzi base e IVA sono arrotondati al centesimo con la stessa regola, "half up" (1.005 -> 1.01).
+    Usa NumPy se installato, altrimenti puro Python con lo stesso risultato.
+    """
+    if isinstance(aliquote, (int, float)):
+        aliquote = [aliquote] * len(prezzi_base)
+    if len(aliquote) != len(prezzi_base):
+        raise ValueError("Prezzi base e aliquote devono avere la stessa lunghezza.")
+
+    if np is not None:
+        return _calcola_blocco_numpy(prezzi_base, aliquote)
+    return _calcola_blocco_python(prezzi_base, aliquote)
+
+
+def calcola_iva_batch(prezzi_base, aliquote=ALIQUOTA_DEFAULT):
+    """Come calcola_iva_centesimi, ma restituisce le colonne IVA e prezzo finale in euro."""
+    _, iva, finale = calcola_iva_centesimi(prezzi_base, aliquote)
+    if np is not None:
+        return iva / 100, finale / 100
+    return [i / 100 for i in iva], [f / 100 for f in finale]
+
+
+def _in_euro(centesimi):
+    # Formattazione fissa a due decimali, direttamente dagli interi
+    if np is not None:
+        centesimi = centesimi.tolist()
+    return [f"{c // 100}.{c % 100:02d}" for c in centesimi]
+
+
+def scrivi_report_iva(righe, nome_file, dimensione_blocco=DIMENSIONE_BLOCCO):
+    """Scrive il report CSV (delimitatore ';') elaborando le righe a blocchi.
+
+    `righe` è un iterabile di (nome, prezzo_base, aliquota): può essere un generatore,
+    quindi il listino non viene mai caricato per intero in memoria. Restituisce il numero di righe scritte.
+    """
+    scritte = 0
+    iteratore = iter(righe)
+
+    # 'with open(...)' apre e chiude il file automaticamente, anche in caso di errore
+    # 'newline=' assicura che non vengano aggiunte righe vuote tra i dati
+    with open(nome_file, 'w', newline='', encoding='utf-8') as file_csv:
+        scrittore = csv.writer(file_csv, delimiter=';')
+        scrittore.writerow(INTESTAZIONE)
+
+        while True:
+            blocco = list(islice(iteratore, dimensione_blocco))
+            if not blocco:
+                break
+
+            nomi, prezzi_base, aliquote = zip(*blocco)
+            base, iva, finale = calcola_iva_centesimi(prezzi_base, aliquote)
+            scrittore.writerows(zip(nomi, _in_euro(base), _in_euro(iva), _in_euro(finale), aliquote))
+            scritte += len(blocco)
+
+    return scritte
+
+
+def leggi_listino(nome_file):
+    """Generatore sulle righe di un listino CSV ';' con colonne: nome;prezzo_base[;aliquota].
+
+    Una prima riga di intestazione (prezzo non numerico) viene saltata.
+    """
+    with open(nome_file, newline='', encoding='utf-8') as file_csv:
+        for numero, riga in enumerate(csv.reader(file_csv, delimiter=';'), start=1):
+            if not riga:
+                continue
+            try:
+                prezzo_base = float(riga[1].replace(',', '.'))
+            except (IndexError, ValueError):
+                if numero == 1:
+                    continue
+                raise ValueError(f"Riga {numero} del listino non valida: {riga}")
+            aliquota = float(riga[2].replace(',', '.')) if len(riga) > 2 and riga[2] else ALIQUOTA_DEFAULT
+            yield riga[0], prezzo_base, aliquota
+
 
-nome_file = 'report_iva.csv'
+if __name__ == '__main__':
+    # Uso: python3 calcolatrice_iva.py [listino.csv] [report.csv]
+    # Senza argomenti calcola il report dei prodotti di esempio.
+    if len(sys.argv) > 1:
+        righe = leggi_listino(sys.argv[1])
+    else:
+        righe = [
+            ("Laptop", 1500.00, ALIQUOTA_DEFAULT),
+            ("Smartphone", 450.00, ALIQUOTA_DEFAULT),
+            ("Caricabatterie", 20.00, ALIQUOTA_DEFAULT),
+            ("Cuffie", 10.00, ALIQUOTA_DEFAULT),
+        ]
 
-# 'with open(...)' apre e chiude il file automaticamente, anche in caso di errore
-# 'w' sta per modalità "write" (scrittura)
-# 'newline=' assicura che non vengano aggiunte righe vuote tra i dati
-with open(nome_file, 'w', newline='', encoding='utf-8') as file_csv:
-    # csv.writer crea l'oggetto che scrive nel formato CSV
-    scrittore = csv.writer(file_csv, delimiter=';') 
-    
-    # Scrive tutte le righe di dati_csv nel file
-    scrittore.writerows(dati_csv)
+    nome_file = sys.argv[2] if len(sys.argv) > 2 else 'report_iva.csv'
+    scritte = scrivi_report_iva(righe, nome_file)
 
-print(f"\nReport IVA salvato con successo nel file: {nome_file}")
+    print(f"\nReport IVA salvato con successo nel file: {nome_file} ({scritte} righe)")
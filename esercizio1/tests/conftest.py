@@ -0,0 +1,10 @@
+# esercizi/esercizio1/tests/conftest.py
+#
+# I test non richiedono NumPy: i confronti con il percorso NumPy vengono saltati se non è installato.
+#
+#   python -m pytest esercizio1/tests
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
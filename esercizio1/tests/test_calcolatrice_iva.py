@@ -0,0 +1,58 @@
+import csv
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+import calcolatrice_iva as calc
+
+# Mezzi centesimi (x.xx5) e valori vicini, più un campione di prezzi qualsiasi
+PREZZI = [0.005, 0.015, 0.125, 1.005, 1.115, 2.675, 10.125, 100.005, 1234.565, 1.004999, 1.005001, 0.0, 19.99]
+_CASUALE = random.Random(42)
+PREZZI += [round(_CASUALE.uniform(0, 5000), 3) for _ in range(2000)]
+ALIQUOTE = [0.22, 0.10, 0.04, 0.05]
+
+
+def centesimi_attesi(prezzo):
+    """Riferimento: arrotondamento "half up" del prezzo come scritto in decimale."""
+    return int(Decimal(repr(prezzo)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+
+
+def test_prezzo_base_arrotondato_half_up():
+    base, _, _ = calc._calcola_blocco_python(PREZZI, [0.22] * len(PREZZI))
+    assert base == [centesimi_attesi(p) for p in PREZZI]
+
+
+def test_iva_arrotondata_half_up():
+    # 0.25 x 22% = 5,5 centesimi -> 6; 1.25 x 10% = 12,5 centesimi -> 13
+    assert calc.calcola_iva(0.25, 0.22)[1:3] == (0.06, 0.31)
+    assert calc.calcola_iva(1.25, 0.10)[1:3] == (0.13, 1.38)
+
+
+def test_riga_per_riga_uguale_al_blocco_python():
+    aliquote = [ALIQUOTE[i % len(ALIQUOTE)] for i in range(len(PREZZI))]
+    base, iva, finale = calc._calcola_blocco_python(PREZZI, aliquote)
+
+    for i, (prezzo, aliquota) in enumerate(zip(PREZZI, aliquote)):
+        _, iva_riga, finale_riga, _ = calc.calcola_iva(prezzo, aliquota)
+        assert (round(iva_riga * 100), round(finale_riga * 100)) == (iva[i], finale[i]), prezzo
+
+
+@pytest.mark.skipif(calc.np is None, reason="NumPy non installato")
+def test_blocco_numpy_uguale_al_blocco_python():
+    aliquote = [ALIQUOTE[i % len(ALIQUOTE)] for i in range(len(PREZZI))]
+    python = calc._calcola_blocco_python(PREZZI, aliquote)
+    numpy = calc._calcola_blocco_numpy(PREZZI, aliquote)
+
+    for colonna_python, colonna_numpy in zip(python, numpy):
+        assert list(colonna_python) == colonna_numpy.tolist()
+
+
+def test_report_con_mezzo_centesimo(tmp_path):
+    report = tmp_path / "report.csv"
+    calc.scrivi_report_iva([("Articolo", 1.005, 0.22)], report)
+
+    with open(report, newline="", encoding="utf-8") as file_csv:
+        righe = list(csv.reader(file_csv, delimiter=";"))
+    # 1,01 + 22% = 0,2222 -> 0,22
+    assert righe[1][:4] == ["Articolo", "1.01", "0.22", "1.23"]
@@ -0,0 +1,43 @@
+# esercizi/esercizio2/aggiorna_modello_lettura.py
+#
+# Aggiorna la vista materializzata catalogo_prodotti (migrazione 005) con un refresh concorrente:
+# le API che leggono dal modello di lettura (DB_MODELLO_LETTURA=1) continuano a rispondere durante
+# l'aggiornamento. Se il catalogo non è cambiato dall'ultimo refresh non fa nulla.
+# Pensato per cron o per girare in background con --ogni.
+#
+#   python esercizio2/aggiorna_modello_lettura.py [--forza] [--ogni 30]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_manager import ProdottoDBManager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggiorna il modello di lettura del catalogo prodotti.")
+    parser.add_argument("--forza", action="store_true", help="aggiorna anche se il catalogo non è cambiato")
+    parser.add_argument("--ogni", type=float, default=None, help="ripete il controllo ogni N secondi")
+    argomenti = parser.parse_args(argv)
+
+    db_manager = ProdottoDBManager(istruzioni_preparate=False)
+    if not db_manager.connetti():
+        return 1
+
+    try:
+        while True:
+            esito = db_manager.aggiorna_modello_lettura(forza=argomenti.forza)
+            if argomenti.ogni is None:
+                return 0 if esito is not None else 1
+            time.sleep(argomenti.ogni)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        db_manager.disconnetti()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,416 @@
 # esercizi/esercizio2/app.py
+#
+# API REST dei prodotti. crea_app() costruisce l'applicazione senza aprire connessioni: il manager si
+# collega alla prima richiesta che usa il database, quindi l'avvio dei worker e l'importazione del modulo
+# (test, strumenti) non dipendono dalla raggiungibilità di PostgreSQL.
+#
+#   python esercizio2/app.py                                   (server di sviluppo)
+#   gunicorn --chdir esercizio2 'app:crea_app()'               (oppure: flask --app 'app:crea_app()' run)
 
-import json
-from flask import Flask, jsonify, request
+import hashlib
+import threading
+import time
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, request, stream_with_context, url_for
+from werkzeug.local import LocalProxy
+import psycopg2
 import sys
 import os
+import atexit
 
 # Aggiusta il path per l'importazione dei moduli locali (db_manager e classe)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from db_manager import ProdottoDBManager
+from db_manager import ProdottoDBManager, POOL_CONFIG, CACHE_CONFIG, LETTURA_CONFIG, RICONNESSIONE_CONFIG, REPLICHE_CONFIG
+from metriche import metriche
 from classe import Prodotto, Fornitore
+from indice_catalogo import IndiceCatalogo
+from esporta_catalogo import FORMATI, FORMATI_COLONNARI, PYARROW_DISPONIBILE, itera_csv, itera_colonnare
+from serializzazione import (
+    prodotto_a_dict, LIMITE_PAGINA_DEFAULT, LIMITE_PAGINA_MAX, MIMETYPE_NDJSON, RIGHE_PER_BLOCCO
+)
 
-# Inizializzazione dell'Applicazione Flask e del Database Manager
-app = Flask(__name__)
-db_manager = ProdottoDBManager()
+api = Blueprint('api', __name__)
 
-# Collegamento al DB all'avvio dell'applicazione
-# Utilizziamo il contesto dell'applicazione Flask per la gestione della connessione
-with app.app_context():
-    if not db_manager.connetti():
-        print("Errore: Impossibile connettersi al database all'avvio dell'API.")
-        sys.exit(1)
+
+class ServiziERP:
+    """Manager del database e indice in memoria di un'istanza dell'applicazione (app.extensions['erp'])."""
+
+    def __init__(self, db_manager, indice=None):
+        self.db_manager = db_manager
+        self.indice = indice
+        self._lock = threading.Lock()
+        self._indice_avviato = False
+
+    def avvia_indice(self):
+        """Avvia l'ascolto dell'indice in memoria, una sola volta e senza attendere il primo caricamento."""
+        if self.indice is None or self._indice_avviato:
+            return
+        with self._lock:
+            if not self._indice_avviato:
+                self.indice.avvia_ascolto(self.db_manager, attesa_iniziale=0)
+                self._indice_avviato = True
+
+    def chiudi(self):
+        if self.indice is not None:
+            self.indice.ferma_ascolto()
+        self.db_manager.disconnetti()
+
+
+# Le route usano il manager dell'applicazione che sta servendo la richiesta
+db_manager = LocalProxy(lambda: current_app.extensions['erp'].db_manager)
+
+
+def crea_app(db_manager=None, indice_in_memoria=None):
+    """Crea l'applicazione Flask. Nessuna connessione viene aperta qui.
+
+    Senza `db_manager` ne crea uno dalla configurazione del .env (pool, cache, modello di lettura) con
+    connessione pigra: in modalità pool ogni richiesta preleva una connessione e la restituisce al termine.
+    Nodi di sola lettura: con INDICE_IN_MEMORIA=1 (o `indice_in_memoria=True`) le ricerche sono servite
+    da un indice in memoria tenuto aggiornato tramite LISTEN/NOTIFY (migrazione 003), che inizia a
+    caricarsi alla prima richiesta; fino ad allora le ricerche usano il database.
+    """
+    app = Flask(__name__)
+    if db_manager is None:
+        db_manager = ProdottoDBManager(
+            **POOL_CONFIG, **CACHE_CONFIG, **LETTURA_CONFIG, **RICONNESSIONE_CONFIG, **REPLICHE_CONFIG,
+            connessione_pigra=True
+        )
+    if indice_in_memoria is None:
+        indice_in_memoria = os.environ.get("INDICE_IN_MEMORIA", "0") == "1"
+
+    app.extensions['erp'] = ServiziERP(db_manager, IndiceCatalogo() if indice_in_memoria else None)
+    app.register_blueprint(api)
+    return app
+
+
+@api.before_app_request
+def avvia_indice():
+    current_app.extensions['erp'].avvia_indice()
+
+
+# Tempi per route: la durata va dall'inizio della richiesta alla risposta pronta
+# (per le risposte in streaming non comprende l'invio del corpo)
+@api.before_app_request
+def avvia_cronometro():
+    if metriche.attivo:
+        g.inizio_richiesta = time.perf_counter()
+
+
+@api.after_app_request
+def registra_durata(risposta):
+    inizio = g.pop('inizio_richiesta', None)
+    if inizio is not None:
+        route = request.url_rule.rule if request.url_rule else 'sconosciuta'
+        metriche.registra_richiesta(request.method, route, risposta.status_code, time.perf_counter() - inizio)
+    return risposta
 
 
 # ==============================================================================
 # 1. READ ALL (GET /api/v1/prodotti)
 # ==============================================================================
-@app.route('/api/v1/prodotti', methods=['GET'])
+@api.route('/api/v1/prodotti', methods=['GET'])
 def get_prodotti():
-    prodotti = db_manager.leggi_prodotti()
-    
-    # Trasforma la lista di oggetti Prodotto in una lista di dizionari per JSON
-    prodotti_json = []
-    for p in prodotti:
-        # Serializzazione completa del Prodotto, includendo il fornitore
-        fornitore_data = None
-        if p.fornitore:
-            fornitore_data = {
-                'id': p.fornitore.id_fornitore,
-                'nome': p.fornitore.nome
-            }
-            
-        prodotti_json.append({
-            'codice': p.codice,
-            'nome': p.nome,
-            'prezzo_netto': p.prezzo_netto,
-            'prezzo_lordo': p.prezzo_lordo,
-            'aliquota_iva': p.aliquota_iva,
-            'fornitore': fornitore_data # <-- La relazione è qui
-        })
-        
-    return jsonify(prodotti_json)
+    formato = request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON])
+
+    # Versione ed elenco dalla stessa replica: da due repliche con ritardi diversi il corpo di una
+    # finirebbe in cache sotto l'ETag dell'altra
+    replica = db_manager.scegli_replica()
+
+    # GET condizionale: a catalogo invariato basta la lettura della sua versione, senza toccare i prodotti
+    validatori = validatori_catalogo(formato, replica)
+    if validatori and non_modificato(*validatori):
+        return applica_validatori(Response(status=304), *validatori)
+
+    risposta = current_app.make_response(risposta_prodotti(formato, replica))
+    if validatori and risposta.status_code == 200:
+        applica_validatori(risposta, *validatori)
+    return risposta
+
+
+def risposta_prodotti(formato, replica=True):
+    if 'after' in request.args or 'limit' in request.args:
+        return get_prodotti_paginati(replica)
+
+    # Catalogo completo: il JSON arriva già pronto da PostgreSQL, senza passare da Prodotto e prodotto_a_dict
+    if formato == MIMETYPE_NDJSON:
+        return Response(stream_with_context(genera_ndjson(db_manager.itera_prodotti_json(replica=replica))), mimetype=MIMETYPE_NDJSON)
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return Response(stream_with_context(genera_array_json(db_manager.itera_prodotti_json(replica=replica))), mimetype='application/json')
+
+    catalogo = db_manager.leggi_prodotti_json(replica=replica)
+    # In caso di errore, come in precedenza, una lista vuota
+    return Response(catalogo if catalogo is not None else '[]', mimetype='application/json')
+
+
+def validatori_catalogo(formato, replica=True):
+    """(etag, ultima_modifica) della rappresentazione richiesta, o None se la versione non è leggibile."""
+    versione = db_manager.leggi_versione_catalogo(replica=replica)
+    if versione is None:
+        return None
+
+    numero, aggiornato_il = versione
+    if 'after' in request.args or 'limit' in request.args:
+        # Ogni pagina ha il suo ETag: il validatore di una pagina non deve convalidare il corpo di un'altra
+        pagina = f"{request.args.get('after', '')}\n{request.args.get('limit', '')}"
+        variante = f"pagina-{hashlib.sha1(pagina.encode()).hexdigest()[:16]}"
+    else:
+        variante = 'ndjson' if formato == MIMETYPE_NDJSON else 'json'
+    # Last-Modified ha la precisione del secondo
+    return f"catalogo-{numero}-{variante}", aggiornato_il.replace(microsecond=0)
+
+
+def non_modificato(etag, ultima_modifica):
+    # If-None-Match, se presente, ha la precedenza su If-Modified-Since
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    return request.if_modified_since is not None and ultima_modifica <= request.if_modified_since
+
+
+def applica_validatori(risposta, etag, ultima_modifica):
+    risposta.set_etag(etag)
+    risposta.last_modified = ultima_modifica
+    risposta.cache_control.no_cache = True
+    risposta.vary.add('Accept')
+    return risposta
+
+
+def a_blocchi(frammenti, dimensione=RIGHE_PER_BLOCCO):
+    """Raggruppa i frammenti di testo per non inviare un chunk HTTP per ogni riga."""
+    blocco = []
+    for frammento in frammenti:
+        blocco.append(frammento)
+        if len(blocco) >= dimensione:
+            yield ''.join(blocco)
+            blocco = []
+    if blocco:
+        yield ''.join(blocco)
+
+
+def genera_ndjson(oggetti_json):
+    """Un oggetto JSON per riga, emesso man mano che i testi escono dal cursore."""
+    yield from a_blocchi(testo + '\n' for testo in oggetti_json)
+
+
+def genera_array_json(oggetti_json):
+    """Array JSON inviato a pezzi: '[' parte subito, poi gli oggetti a blocchi, infine ']'.
+
+    Se la sorgente si interrompe con un errore, l'errore attraversa il generatore e la ']' non
+    viene inviata: il server chiude il trasferimento a blocchi e il client vede una risposta troncata.
+    """
+    yield '['
+    yield from a_blocchi((',' if i else '') + testo for i, testo in enumerate(oggetti_json))
+    yield ']'
+
+
+def get_prodotti_paginati(replica=True):
+    """Pagina keyset: ?after=<nome,codice>&limit=N, ordinata per (nome, codice).
+
+    Il cursore della pagina successiva è nell'header Link (rel="next"), assente sull'ultima pagina.
+    """
+    try:
+        limite = int(request.args.get('limit', LIMITE_PAGINA_DEFAULT))
+    except ValueError:
+        return jsonify({'errore': "Il parametro 'limit' deve essere un intero."}), 400
+    if not 1 <= limite <= LIMITE_PAGINA_MAX:
+        return jsonify({'errore': f"Il parametro 'limit' deve essere tra 1 e {LIMITE_PAGINA_MAX}."}), 400
+
+    dopo = None
+    after = request.args.get('after')
+    if after:
+        # Il codice è l'ultimo campo: il nome può contenere virgole
+        nome, sep, codice = after.rpartition(',')
+        if not sep or not nome or not codice:
+            return jsonify({'errore': "Il parametro 'after' deve avere la forma <nome,codice>."}), 400
+        dopo = (nome, codice)
+
+    # Si legge una riga in più per sapere se esiste una pagina successiva. Una lettura interrotta
+    # non deve diventare una pagina corta con un ETag valido: meglio un errore
+    try:
+        prodotti = list(db_manager.itera_prodotti(
+            dopo=dopo, limite=limite + 1, itersize=limite + 1, solleva=True, replica=replica
+        ))
+    except psycopg2.Error:
+        return jsonify({'errore': "Errore del database durante la lettura dei prodotti."}), 503
+    altra_pagina = len(prodotti) > limite
+    prodotti = prodotti[:limite]
+
+    risposta = jsonify([prodotto_a_dict(p) for p in prodotti])
+    if altra_pagina:
+        ultimo = prodotti[-1]
+        url_successivo = url_for(
+            'api.get_prodotti', after=f"{ultimo.nome},{ultimo.codice}", limit=limite, _external=True
+        )
+        risposta.headers['Link'] = f'<{url_successivo}>; rel="next"'
+    return risposta
+
+# ==============================================================================
+# 2. RICERCA (GET /api/v1/prodotti/ricerca?nome=&prezzo_max=)
+# ==============================================================================
+@api.route('/api/v1/prodotti/ricerca', methods=['GET'])
+def get_ricerca_prodotti():
+    nome = request.args.get('nome') or None
+    try:
+        prezzo_max = float(request.args['prezzo_max']) if request.args.get('prezzo_max') else None
+    except ValueError:
+        return jsonify({'errore': "Il parametro 'prezzo_max' deve essere un numero."}), 400
+
+    indice = current_app.extensions['erp'].indice
+    if indice is not None and indice.ricariche:
+        prodotti = indice.cerca(nome=nome, prezzo_max=prezzo_max)
+    else:
+        prodotti = db_manager.ricerca_prodotti_filtrata(nome=nome, prezzo_max=prezzo_max)
+
+    return jsonify([prodotto_a_dict(p) for p in prodotti])
+
+# ==============================================================================
+# 3. LETTURA MULTIPLA PER CODICE (GET|POST /api/v1/prodotti/batch)
+# ==============================================================================
+# Massimo numero di codici per richiesta (un ordine da 500 righe ci sta con margine)
+LIMITE_CODICI_BATCH = 1000
+
+@api.route('/api/v1/prodotti/batch', methods=['GET', 'POST'])
+def get_prodotti_batch():
+    """Prodotti per una lista di codici con una sola query.
+
+    GET: ?codici=A,B,C (oppure ?codice=A&codice=B). POST: JSON {"codici": [...]} o direttamente la lista.
+    Risposta: {"prodotti": {codice: prodotto}, "mancanti": [codici inesistenti o non attivi]}.
+    """
+    if request.method == 'POST':
+        dati = request.get_json(silent=True)
+        codici = dati.get('codici') if isinstance(dati, dict) else dati
+        if not isinstance(codici, list) or not all(isinstance(c, str) for c in codici):
+            return jsonify({'errore': "Il corpo deve contenere una lista di codici: {\"codici\": [...]}."}), 400
+    else:
+        codici = [c for valore in request.args.getlist('codici') for c in valore.split(',')]
+        codici += request.args.getlist('codice')
+
+    codici = [c.strip() for c in codici if c and c.strip()]
+    if not codici:
+        return jsonify({'errore': "Indicare almeno un codice."}), 400
+    if len(codici) > LIMITE_CODICI_BATCH:
+        return jsonify({'errore': f"Al massimo {LIMITE_CODICI_BATCH} codici per richiesta."}), 400
+
+    trovati = db_manager.leggi_prodotti_per_codici(codici)
+    if trovati is None:
+        return jsonify({'errore': "Errore del database durante la lettura dei prodotti."}), 503
+
+    return jsonify({
+        'prodotti': {codice: prodotto_a_dict(p) for codice, p in trovati.items() if p is not None},
+        'mancanti': [codice for codice, p in trovati.items() if p is None]
+    })
+
+# ==============================================================================
+# 4. ESPORTAZIONE (GET /api/v1/prodotti/export?formato=csv|parquet|arrow)
+# ==============================================================================
+@api.route('/api/v1/prodotti/export', methods=['GET'])
+def get_esportazione_prodotti():
+    """Catalogo dei prodotti attivi come file da scaricare, prodotto da COPY e inviato a blocchi.
+
+    CSV con delimitatore ';' (predefinito), oppure Parquet o Arrow IPC se pyarrow è installato.
+    Un errore DB a metà interrompe la risposta: il client riceve un trasferimento incompleto.
+    """
+    formato = request.args.get('formato', 'csv').lower()
+    if formato not in FORMATI:
+        return jsonify({'errore': f"Formato non supportato. Valori ammessi: {', '.join(FORMATI)}."}), 400
+    if formato in FORMATI_COLONNARI and not PYARROW_DISPONIBILE:
+        return jsonify({'errore': f"Il formato {formato} richiede pyarrow sul server."}), 501
+
+    mimetype, estensione = FORMATI[formato]
+    # Il COPY gira in un thread senza contesto dell'applicazione: gli si passa il manager, non il proxy
+    manager = db_manager._get_current_object()
+    blocchi = itera_csv(manager) if formato == 'csv' else itera_colonnare(manager, formato)
+    risposta = Response(stream_with_context(blocchi), mimetype=mimetype)
+    risposta.headers['Content-Disposition'] = f'attachment; filename="catalogo.{estensione}"'
+    return risposta
+
+# ==============================================================================
+# STATO DEL POOL (GET /api/v1/stato/pool)
+# ==============================================================================
+@api.route('/api/v1/stato/pool', methods=['GET'])
+def get_stato_pool():
+    statistiche = db_manager.statistiche_pool()
+    if statistiche is None:
+        # Con la connessione pigra il pool nasce alla prima richiesta che usa il database
+        corpo = {'modalita': 'non_connesso' if db_manager.pool_max else 'connessione_singola'}
+    else:
+        corpo = {'modalita': 'pool', **statistiche}
+    repliche = db_manager.statistiche_repliche()
+    if repliche is not None:
+        corpo['repliche'] = repliche
+    return jsonify(corpo)
+
+# ==============================================================================
+# SALUTE E PRONTEZZA (GET /api/v1/stato/salute, GET /api/v1/stato/pronto)
+# ==============================================================================
+@api.route('/api/v1/stato/salute', methods=['GET'])
+def get_stato_salute():
+    """Liveness: il processo risponde. Non tocca il database, così un DB lento non fa riavviare i worker."""
+    return jsonify({'stato': 'ok'})
+
+
+@api.route('/api/v1/stato/pronto', methods=['GET'])
+def get_stato_pronto():
+    """Readiness: 200 se il database risponde a SELECT 1 (la prima chiamata apre la connessione), altrimenti 503."""
+    latenza_ms = db_manager.verifica_database()
+    corpo = {'database': latenza_ms is not None}
+    if latenza_ms is not None:
+        corpo['latenza_ms'] = round(latenza_ms, 2)
+    indice = current_app.extensions['erp'].indice
+    if indice is not None:
+        # L'indice non condiziona la prontezza: finché non è caricato le ricerche usano il database
+        corpo['indice_in_memoria'] = {'caricato': indice.ricariche > 0, 'prodotti': len(indice)}
+    corpo['stato'] = 'pronto' if latenza_ms is not None else 'non_pronto'
+    return jsonify(corpo), 200 if latenza_ms is not None else 503
+
+# ==============================================================================
+# STATO DELLA CACHE (GET /api/v1/stato/cache)
+# ==============================================================================
+@api.route('/api/v1/stato/cache', methods=['GET'])
+def get_stato_cache():
+    statistiche = db_manager.statistiche_cache()
+    if statistiche is None:
+        return jsonify({'attiva': False})
+    return jsonify({'attiva': True, **statistiche})
+
+# ==============================================================================
+# METRICHE (GET /metrics, formato testo di Prometheus)
+# ==============================================================================
+@api.route('/metrics', methods=['GET'])
+def get_metriche():
+    if not metriche.attivo:
+        return jsonify({'errore': "Metriche disattivate: impostare METRICHE_ATTIVE=1."}), 404
+
+    indicatori = {}
+    statistiche = db_manager.statistiche_pool()
+    if statistiche is not None:
+        indicatori['erp_pool_connessioni'] = (
+            'gauge', "Connessioni del pool per stato.",
+            {(('stato', 'in_uso'),): statistiche['in_uso'], (('stato', 'libere'),): statistiche['libere']}
+        )
+        indicatori['erp_pool_attese_total'] = (
+            'counter', "Prelievi che hanno dovuto attendere una connessione.", statistiche['attese']
+        )
+        indicatori['erp_pool_timeout_scaduti_total'] = (
+            'counter', "Prelievi falliti per pool esaurito.", statistiche['timeout_scaduti']
+        )
+    statistiche = db_manager.statistiche_cache()
+    if statistiche is not None:
+        indicatori['erp_cache_voci'] = ('gauge', "Voci presenti nella cache per codice.", statistiche['dimensione'])
+        indicatori['erp_cache_letture_total'] = (
+            'counter', "Letture della cache per codice per esito.",
+            {(('esito', 'hit'),): statistiche['hit'], (('esito', 'miss'),): statistiche['miss']}
+        )
+
+    return Response(metriche.esporta_prometheus(indicatori), mimetype='text/plain; version=0.0.4')
 
 # ==============================================================================
 # Esecuzione dell'App
 # ==============================================================================
 if __name__ == '__main__':
-    # Quando l'applicazione si chiude, chiudiamo la connessione al DB
-    @app.teardown_appcontext
-    def shutdown_session(exception=None):
-        if db_manager:
-            db_manager.disconnetti()
+    app = crea_app()
+    # Quando il processo termina chiudiamo il pool. Non usiamo teardown_appcontext:
+    # scatta alla fine di ogni richiesta e chiuderebbe le connessioni dopo la prima.
+    atexit.register(app.extensions['erp'].chiudi)
     
     print("--- API RESTful Prodotto avviata su http://127.0.0.1:5000 ---")
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True, threaded=True)
\ No newline at end of file
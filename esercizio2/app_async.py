@@ -0,0 +1,215 @@
+# esercizi/esercizio2/app_async.py
+#
+# Le route /api/v1/prodotti di app.py servite da un'applicazione ASGI (Quart, stessa API di Flask)
+# sopra ProdottoDBManagerAsync. Un solo worker gestisce molte richieste concorrenti: durante
+# l'attesa del database il processo serve le altre, senza un thread per richiesta.
+#
+#   uvicorn app_async:app --app-dir esercizio2          (oppure: hypercorn, o python esercizio2/app_async.py)
+
+import hashlib
+import sys
+import os
+
+from quart import Quart, Response, jsonify, request, url_for
+
+# Aggiusta il path per l'importazione dei moduli locali (db_manager_async e classe)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_manager import POOL_CONFIG, LETTURA_CONFIG
+from db_manager_async import ProdottoDBManagerAsync
+from serializzazione import (
+    prodotto_a_dict, LIMITE_PAGINA_DEFAULT, LIMITE_PAGINA_MAX, MIMETYPE_NDJSON, RIGHE_PER_BLOCCO
+)
+
+app = Quart(__name__)
+db_manager = ProdottoDBManagerAsync(
+    pool_min=POOL_CONFIG["pool_min"],
+    pool_max=POOL_CONFIG["pool_max"] or 10,
+    pool_timeout=POOL_CONFIG["pool_timeout"],
+    **LETTURA_CONFIG
+)
+
+
+# Il pool asyncio va creato dentro l'event loop del server: lo apriamo all'avvio e lo chiudiamo all'arresto
+@app.before_serving
+async def apri_pool():
+    if not await db_manager.connetti():
+        raise RuntimeError("Impossibile connettersi al database all'avvio dell'API.")
+
+
+@app.after_serving
+async def chiudi_pool():
+    await db_manager.disconnetti()
+
+
+# ==============================================================================
+# 1. READ ALL (GET /api/v1/prodotti)
+# ==============================================================================
+@app.route('/api/v1/prodotti', methods=['GET'])
+async def get_prodotti():
+    formato = request.accept_mimetypes.best_match(['application/json', MIMETYPE_NDJSON])
+
+    # GET condizionale: a catalogo invariato basta la lettura della sua versione, senza toccare i prodotti
+    validatori = await validatori_catalogo(formato)
+    if validatori and non_modificato(*validatori):
+        return applica_validatori(Response('', status=304), *validatori)
+
+    risposta = await app.make_response(await risposta_prodotti(formato))
+    if validatori and risposta.status_code == 200:
+        applica_validatori(risposta, *validatori)
+    return risposta
+
+
+async def risposta_prodotti(formato):
+    if 'after' in request.args or 'limit' in request.args:
+        return await get_prodotti_paginati()
+
+    # Catalogo completo: il JSON arriva già pronto da PostgreSQL, come in app.py
+    if formato == MIMETYPE_NDJSON:
+        return Response(genera_ndjson(db_manager.itera_prodotti_json()), mimetype=MIMETYPE_NDJSON)
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return Response(genera_array_json(db_manager.itera_prodotti_json()), mimetype='application/json')
+
+    catalogo = await db_manager.leggi_prodotti_json()
+    return Response(catalogo if catalogo is not None else '[]', mimetype='application/json')
+
+
+async def validatori_catalogo(formato):
+    """(etag, ultima_modifica) della rappresentazione richiesta, o None se la versione non è leggibile."""
+    versione = await db_manager.leggi_versione_catalogo()
+    if versione is None:
+        return None
+
+    numero, aggiornato_il = versione
+    if 'after' in request.args or 'limit' in request.args:
+        # Ogni pagina ha il suo ETag: il validatore di una pagina non deve convalidare il corpo di un'altra
+        pagina = f"{request.args.get('after', '')}\n{request.args.get('limit', '')}"
+        variante = f"pagina-{hashlib.sha1(pagina.encode()).hexdigest()[:16]}"
+    else:
+        variante = 'ndjson' if formato == MIMETYPE_NDJSON else 'json'
+    # Last-Modified ha la precisione del secondo
+    return f"catalogo-{numero}-{variante}", aggiornato_il.replace(microsecond=0)
+
+
+def non_modificato(etag, ultima_modifica):
+    # If-None-Match, se presente, ha la precedenza su If-Modified-Since
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    return request.if_modified_since is not None and ultima_modifica <= request.if_modified_since
+
+
+def applica_validatori(risposta, etag, ultima_modifica):
+    risposta.set_etag(etag)
+    risposta.last_modified = ultima_modifica
+    risposta.cache_control.no_cache = True
+    risposta.vary.add('Accept')
+    return risposta
+
+
+async def a_blocchi(frammenti, dimensione=RIGHE_PER_BLOCCO):
+    """Raggruppa i frammenti di testo per non inviare un chunk HTTP per ogni riga."""
+    blocco = []
+    async for frammento in frammenti:
+        blocco.append(frammento)
+        if len(blocco) >= dimensione:
+            yield ''.join(blocco)
+            blocco = []
+    if blocco:
+        yield ''.join(blocco)
+
+
+async def genera_ndjson(oggetti_json):
+    """Un oggetto JSON per riga, emesso man mano che i testi escono dal cursore."""
+    async for blocco in a_blocchi(testo + '\n' async for testo in oggetti_json):
+        yield blocco
+
+
+async def genera_array_json(oggetti_json):
+    """Array JSON inviato a pezzi: '[' parte subito, poi gli oggetti a blocchi, infine ']'."""
+    async def elementi():
+        primo = True
+        async for testo in oggetti_json:
+            yield ('' if primo else ',') + testo
+            primo = False
+
+    yield '['
+    async for blocco in a_blocchi(elementi()):
+        yield blocco
+    yield ']'
+
+
+async def get_prodotti_paginati():
+    """Pagina keyset: ?after=<nome,codice>&limit=N, ordinata per (nome, codice).
+
+    Il cursore della pagina successiva è nell'header Link (rel="next"), assente sull'ultima pagina.
+    """
+    try:
+        limite = int(request.args.get('limit', LIMITE_PAGINA_DEFAULT))
+    except ValueError:
+        return jsonify({'errore': "Il parametro 'limit' deve essere un intero."}), 400
+    if not 1 <= limite <= LIMITE_PAGINA_MAX:
+        return jsonify({'errore': f"Il parametro 'limit' deve essere tra 1 e {LIMITE_PAGINA_MAX}."}), 400
+
+    dopo = None
+    after = request.args.get('after')
+    if after:
+        # Il codice è l'ultimo campo: il nome può contenere virgole
+        nome, sep, codice = after.rpartition(',')
+        if not sep or not nome or not codice:
+            return jsonify({'errore': "Il parametro 'after' deve avere la forma <nome,codice>."}), 400
+        dopo = (nome, codice)
+
+    # Si legge una riga in più per sapere se esiste una pagina successiva
+    prodotti = await db_manager.leggi_pagina(dopo=dopo, limite=limite + 1)
+    altra_pagina = len(prodotti) > limite
+    prodotti = prodotti[:limite]
+
+    risposta = jsonify([prodotto_a_dict(p) for p in prodotti])
+    if altra_pagina:
+        ultimo = prodotti[-1]
+        url_successivo = url_for(
+            'get_prodotti', after=f"{ultimo.nome},{ultimo.codice}", limit=limite, _external=True
+        )
+        risposta.headers['Link'] = f'<{url_successivo}>; rel="next"'
+    return risposta
+
+# ==============================================================================
+# 2. RICERCA (GET /api/v1/prodotti/ricerca?nome=&prezzo_max=)
+# ==============================================================================
+@app.route('/api/v1/prodotti/ricerca', methods=['GET'])
+async def get_ricerca_prodotti():
+    nome = request.args.get('nome') or None
+    try:
+        prezzo_max = float(request.args['prezzo_max']) if request.args.get('prezzo_max') else None
+    except ValueError:
+        return jsonify({'errore': "Il parametro 'prezzo_max' deve essere un numero."}), 400
+
+    prodotti = await db_manager.ricerca_prodotti_filtrata(nome=nome, prezzo_max=prezzo_max)
+    return jsonify([prodotto_a_dict(p) for p in prodotti])
+
+# ==============================================================================
+# 3. READ ONE (GET /api/v1/prodotti/<codice>)
+# ==============================================================================
+@app.route('/api/v1/prodotti/<codice>', methods=['GET'])
+async def get_prodotto(codice):
+    prodotto = await db_manager.leggi_prodotto_per_codice(codice)
+    if prodotto is None:
+        return jsonify({'errore': f"Prodotto con codice '{codice}' non trovato."}), 404
+    return jsonify(prodotto_a_dict(prodotto))
+
+# ==============================================================================
+# STATO DEL POOL (GET /api/v1/stato/pool)
+# ==============================================================================
+@app.route('/api/v1/stato/pool', methods=['GET'])
+async def get_stato_pool():
+    statistiche = db_manager.statistiche_pool()
+    if statistiche is None:
+        return jsonify({'modalita': 'non_connesso'}), 503
+    return jsonify({'modalita': 'pool_asyncio', **statistiche})
+
+# ==============================================================================
+# Esecuzione dell'App
+# ==============================================================================
+if __name__ == '__main__':
+    print("--- API RESTful Prodotto (ASGI) avviata su http://127.0.0.1:5000 ---")
+    app.run(debug=True)
@@ -0,0 +1,56 @@
+# esercizi/esercizio2/benchmark/avvio.py
+#
+# Misura l'avvio a freddo della CLI (main.avvia_cli) e dell'API Flask (app.crea_app): ogni scenario
+# gira in un processo Python nuovo e il tempo è quello dell'intero processo, interprete compreso.
+# Si riporta la mediana di più esecuzioni; il primo scenario è il solo interprete, come riferimento.
+#
+#   python esercizio2/benchmark/avvio.py [esecuzioni]
+
+import sys
+import os
+import statistics
+import subprocess
+import time
+
+CARTELLA_ESERCIZIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Le richieste all'API passano dal client di test: si misura l'applicazione, non il server HTTP
+API = (
+    "import app\n"
+    "client = app.crea_app().test_client()\n"
+)
+
+# (descrizione, codice Python, input da tastiera)
+SCENARI = [
+    ("Interprete Python (riferimento)", "pass", ""),
+    ("CLI: menu pronto, uscita con 0", "import main\nmain.avvia_cli()", "0\n"),
+    ("CLI: prima operazione (7, fornitori)", "import main\nmain.avvia_cli()", "7\n0\n"),
+    ("API: import app + crea_app()", API, ""),
+    ("API: prima risposta /stato/salute", API + "assert client.get('/api/v1/stato/salute').status_code == 200", ""),
+    ("API: prima risposta /stato/pronto", API + "assert client.get('/api/v1/stato/pronto').status_code == 200", ""),
+]
+
+
+def misura(codice, tastiera):
+    inizio = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", codice], cwd=CARTELLA_ESERCIZIO, input=tastiera, text=True,
+        stdout=subprocess.DEVNULL, check=True
+    )
+    return (time.perf_counter() - inizio) * 1000
+
+
+def main():
+    esecuzioni = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+
+    print(f"Avvio a freddo, mediana di {esecuzioni} processi")
+    print(f"{'scenario':<40}{'mediana ms':>12}{'min ms':>10}")
+    for descrizione, codice, tastiera in SCENARI:
+        # Una prima esecuzione scartata: file .pyc e cache del sistema operativo già caldi per tutti
+        misura(codice, tastiera)
+        tempi = [misura(codice, tastiera) for _ in range(esecuzioni)]
+        print(f"{descrizione:<40}{statistics.median(tempi):>12.1f}{min(tempi):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# esercizi/esercizio2/benchmark/idratazione.py
+#
+# Microbenchmark della ricostruzione dei prodotti letti dal DB: confronta il costruttore
+# completo (validazione + ricalcolo del lordo) con Prodotto.da_riga_db.
+# Non richiede PostgreSQL: le righe sono tuple sintetiche con gli stessi tipi restituiti da psycopg2.
+#
+#   python esercizio2/benchmark/idratazione.py [numero_righe]
+
+import sys
+import os
+import time
+import tracemalloc
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classe import Prodotto, Fornitore
+
+
+def genera_righe(n, n_fornitori=50):
+    righe = []
+    for i in range(n):
+        netto = Decimal(f"{(i % 9973) + 0.99:.2f}")
+        aliquota = Decimal("22.00")
+        lordo = (netto * Decimal("1.22")).quantize(Decimal("0.01"))
+        id_fornitore = i % n_fornitori + 1
+        righe.append((f"P{i:07d}", f"Prodotto {i}", netto, aliquota, lordo, True, id_fornitore, f"Fornitore {id_fornitore}"))
+    return righe
+
+
+def idrata_completo(righe):
+    prodotti = []
+    for codice, nome, netto, aliquota, lordo, attivo, id_f, nome_f in righe:
+        fornitore = Fornitore(id_fornitore=id_f, nome=nome_f) if id_f is not None else None
+        prodotti.append(Prodotto(codice=codice, nome=nome, prezzo_netto=float(netto), aliquota_iva=float(aliquota), fornitore=fornitore))
+    return prodotti
+
+
+def idrata_veloce(righe):
+    prodotti = []
+    for codice, nome, netto, aliquota, lordo, attivo, id_f, nome_f in righe:
+        fornitore = Fornitore.da_riga_db(id_f, nome_f) if id_f is not None else None
+        prodotti.append(Prodotto.da_riga_db(codice, nome, netto, aliquota, lordo, fornitore))
+    return prodotti
+
+
+def misura(funzione, righe, ripetizioni=3):
+    migliore = float("inf")
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione(righe)
+        migliore = min(migliore, time.perf_counter() - inizio)
+
+    tracemalloc.start()
+    prodotti = funzione(righe)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del prodotti
+    return migliore, memoria
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    righe = genera_righe(n)
+
+    print(f"--- Idratazione di {n} righe (migliore di 3) ---")
+    risultati = {}
+    for nome, funzione in (("completo", idrata_completo), ("da_riga_db", idrata_veloce)):
+        secondi, memoria = misura(funzione, righe)
+        risultati[nome] = secondi
+        print(f"{nome:>12}: {secondi * 1000:8.1f} ms totali | {secondi * 1e6 / n:6.2f} µs/riga | {memoria / 1e6:7.1f} MB")
+
+    print(f"Accelerazione: {risultati['completo'] / risultati['da_riga_db']:.1f}x")
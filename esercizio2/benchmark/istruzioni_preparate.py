@@ -0,0 +1,68 @@
+# esercizi/esercizio2/benchmark/istruzioni_preparate.py
+#
+# Misura la latenza per chiamata di leggi_prodotto_per_codice in un ciclo stretto, con e senza
+# istruzioni preparate (PREPARE/EXECUTE). La cache per codice resta disattivata, così ogni chiamata
+# arriva al database.
+#
+#   python esercizio2/benchmark/istruzioni_preparate.py [numero_chiamate]
+
+import sys
+import os
+import random
+import statistics
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import ProdottoDBManager
+
+
+def misura(istruzioni_preparate, codici):
+    db_manager = ProdottoDBManager(istruzioni_preparate=istruzioni_preparate)
+    if not db_manager.connetti():
+        sys.exit(1)
+
+    # Riscaldamento: connessione, cataloghi di sistema e buffer condivisi già caldi per entrambi i casi
+    for codice in codici[:200]:
+        db_manager.leggi_prodotto_per_codice(codice)
+
+    tempi = []
+    for codice in codici:
+        inizio = time.perf_counter()
+        db_manager.leggi_prodotto_per_codice(codice)
+        tempi.append(time.perf_counter() - inizio)
+
+    db_manager.disconnetti()
+    return tempi
+
+
+def riassunto(tempi):
+    tempi = sorted(tempi)
+    p95 = tempi[int(len(tempi) * 0.95) - 1] if len(tempi) >= 20 else tempi[-1]
+    return f"mediana {statistics.median(tempi) * 1e6:7.1f} µs | p95 {p95 * 1e6:7.1f} µs"
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    db_manager = ProdottoDBManager()
+    if not db_manager.connetti():
+        sys.exit(1)
+    esistenti = [p.codice for p in db_manager.itera_prodotti(limite=10_000)]
+    db_manager.disconnetti()
+    if not esistenti:
+        print("Catalogo vuoto: niente da misurare.")
+        sys.exit(0)
+
+    codici = random.Random(42).choices(esistenti, k=n)
+
+    risultati = {
+        "query normale": misura(False, codici),
+        "PREPARE/EXECUTE": misura(True, codici),
+    }
+
+    print(f"--- {n} chiamate a leggi_prodotto_per_codice ---")
+    for nome, tempi in risultati.items():
+        print(f"{nome:>16}: {riassunto(tempi)}")
+    normale, preparata = (statistics.median(t) for t in risultati.values())
+    print(f"Guadagno per chiamata (mediana): {(normale - preparata) * 1e6:.1f} µs ({normale / preparata:.2f}x)")
@@ -0,0 +1,88 @@
+# esercizi/esercizio2/benchmark/ricerca_in_memoria.py
+#
+# Confronta la ricerca (nome + prezzo massimo) servita da IndiceCatalogo con ricerca_prodotti_filtrata
+# sul catalogo attuale del database, e verifica che i due percorsi restituiscano gli stessi prodotti.
+#
+#   python esercizio2/benchmark/ricerca_in_memoria.py [numero_ricerche]
+
+import sys
+import os
+import io
+import random
+import statistics
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import ProdottoDBManager
+from indice_catalogo import IndiceCatalogo, _token
+
+
+def genera_ricerche(prodotti, n, seme=42):
+    casuale = random.Random(seme)
+    ricerche = []
+    for _ in range(n):
+        prodotto = casuale.choice(prodotti)
+        parole = _token(prodotto.nome) or [prodotto.nome]
+        parola = casuale.choice(parole)
+        # Frammento di parola, come farebbe un utente che digita solo l'inizio
+        frammento = parola[:max(3, len(parola) // 2)]
+        prezzo_max = casuale.choice([None, prodotto.prezzo_netto * 2])
+        ricerche.append((frammento, prezzo_max))
+    return ricerche
+
+
+def cronometra(funzione, ricerche):
+    tempi = []
+    for nome, prezzo_max in ricerche:
+        inizio = time.perf_counter()
+        funzione(nome=nome, prezzo_max=prezzo_max)
+        tempi.append(time.perf_counter() - inizio)
+    return tempi
+
+
+def riassunto(tempi):
+    tempi = sorted(tempi)
+    p95 = tempi[int(len(tempi) * 0.95) - 1] if len(tempi) >= 20 else tempi[-1]
+    return f"mediana {statistics.median(tempi) * 1000:8.3f} ms | p95 {p95 * 1000:8.3f} ms"
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    db_manager = ProdottoDBManager()
+    if not db_manager.connetti():
+        sys.exit(1)
+
+    indice = IndiceCatalogo()
+    inizio = time.perf_counter()
+    caricati = indice.carica(db_manager)
+    print(f"Indice caricato: {caricati} prodotti in {time.perf_counter() - inizio:.2f}s")
+    if not caricati:
+        print("Catalogo vuoto: niente da misurare.")
+        sys.exit(0)
+
+    ricerche = genera_ricerche(list(indice.cerca()), n)
+
+    # Le stampe di ricerca_prodotti_filtrata falserebbero le misure
+    with redirect_stdout(io.StringIO()):
+        tempi_sql = cronometra(db_manager.ricerca_prodotti_filtrata, ricerche)
+        differenze = sum(
+            {p.codice for p in db_manager.ricerca_prodotti_filtrata(nome=nome, prezzo_max=prezzo)}
+            != {p.codice for p in indice.cerca(nome=nome, prezzo_max=prezzo)}
+            for nome, prezzo in ricerche
+        )
+    tempi_indice = cronometra(indice.cerca, ricerche)
+
+    print(f"--- {n} ricerche (frammento di nome, metà con prezzo massimo) ---")
+    print(f"{'SQL':>10}: {riassunto(tempi_sql)}")
+    print(f"{'Indice':>10}: {riassunto(tempi_indice)}")
+    print(f"Accelerazione (mediana): {statistics.median(tempi_sql) / statistics.median(tempi_indice):.1f}x")
+    print(f"Ricerche con risultati diversi: {differenze}")
+
+    with redirect_stdout(io.StringIO()):
+        coerenza = indice.verifica_coerenza(db_manager)
+    print("Verifica di coerenza:", {chiave: len(valori) for chiave, valori in coerenza.items()})
+
+    db_manager.disconnetti()
@@ -0,0 +1,349 @@
+# esercizi/esercizio2/benchmark/suite.py
+#
+# Suite di benchmark del percorso dati dei prodotti su un PostgreSQL locale.
+# Crea (se manca) un database dedicato, applica le migrazioni, lo popola con un numero configurabile
+# di prodotti e fornitori e misura:
+#   - costruzione di Prodotto (costruttore completo e da_riga_db)
+#   - idratazione di leggi_prodotti
+#   - ricerca_prodotti_filtrata con e senza filtri
+#   - inserimenti (singoli e massivi) e aggiornamenti al secondo
+#   - latenza end-to-end di GET /api/v1/prodotti (p50/p95/p99) con più client concorrenti
+# I risultati vanno in un file JSON; con --confronta si stampano le variazioni rispetto a un'esecuzione precedente.
+#
+#   python esercizio2/benchmark/suite.py --prodotti 100000 --fornitori 50 --output risultati.json
+#   python esercizio2/benchmark/suite.py --salta-popolamento --confronta risultati.json --output nuovi.json
+#
+# Il database indicato con --database viene svuotato: non usare quello di lavoro.
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from decimal import Decimal
+
+CARTELLA_ESERCIZIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(CARTELLA_ESERCIZIO)
+
+DATABASE_BENCHMARK = "studio_progetto_erp_benchmark"
+# Campi dei risultati che descrivono lo scenario e non vanno confrontati come misure
+CAMPI_DESCRITTIVI = {"client", "richieste", "righe"}
+PAROLE = ["Acciaio", "Bullone", "Cavo", "Dado", "Flangia", "Guarnizione", "Molla", "Perno", "Rondella", "Vite"]
+
+
+def percentili(tempi):
+    """Mediana, p95 e p99 in millisecondi."""
+    tempi = sorted(tempi)
+
+    def rango(p):
+        return tempi[min(len(tempi) - 1, max(0, round(p / 100 * len(tempi)) - 1))]
+
+    return {"p50_ms": statistics.median(tempi) * 1000, "p95_ms": rango(95) * 1000, "p99_ms": rango(99) * 1000}
+
+
+def cronometra(funzione, ripetizioni):
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    return tempi
+
+
+# ------------------------------------------------------------------ preparazione del database
+
+def crea_database(nome):
+    import psycopg2
+    from db_manager import DB_CONFIG
+
+    conn = psycopg2.connect(**{**DB_CONFIG, "database": "postgres"})
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s;", (nome,))
+            if cursor.fetchone() is None:
+                cursor.execute(f'CREATE DATABASE "{nome}" ENCODING \'UTF8\' TEMPLATE template0;')
+                print(f"✅ Database di benchmark '{nome}' creato.")
+    finally:
+        conn.close()
+
+
+def popola(n_prodotti, n_fornitori, seme=42):
+    """Svuota il catalogo e lo riempie con dati sintetici deterministici (COPY per i prodotti)."""
+    import psycopg2
+    from psycopg2.extras import execute_values
+    from db_manager import DB_CONFIG
+
+    casuale = random.Random(seme)
+    buffer = io.StringIO()
+    for i in range(n_prodotti):
+        nome = " ".join(casuale.sample(PAROLE, 3)) + f" {i % 1000}"
+        netto = Decimal(casuale.randint(50, 200_000)) / 100
+        aliquota = casuale.choice((Decimal("4"), Decimal("10"), Decimal("22")))
+        lordo = (netto * (1 + aliquota / 100)).quantize(Decimal("0.01"))
+        buffer.write(f"B{i:07d};{nome};{netto};{aliquota};{lordo};{i % n_fornitori + 1 if n_fornitori else ''}\n")
+    buffer.seek(0)
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("TRUNCATE prodotti, fornitori RESTART IDENTITY CASCADE;")
+            execute_values(
+                cursor, "INSERT INTO fornitori (nome) VALUES %s;",
+                [(f"Fornitore {i + 1}",) for i in range(n_fornitori)]
+            )
+            cursor.copy_expert(
+                "COPY prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore) "
+                "FROM STDIN WITH (FORMAT csv, DELIMITER ';');",
+                buffer
+            )
+        conn.commit()
+        # ANALYZE fuori transazione: le statistiche aggiornate servono al pianificatore durante le misure
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE prodotti; ANALYZE fornitori;")
+    finally:
+        conn.close()
+
+
+# ------------------------------------------------------------------ misure
+
+def misura_costruzione(n):
+    from classe import Prodotto, Fornitore
+
+    fornitore = Fornitore(1, "Fornitore 1")
+    netto, aliquota, lordo = Decimal("12.34"), Decimal("22"), Decimal("15.05")
+    risultati = {}
+
+    inizio = time.perf_counter()
+    for i in range(n):
+        Prodotto(f"B{i}", "Prodotto", 12.34, 22.0, fornitore)
+    risultati["costruttore_us"] = (time.perf_counter() - inizio) / n * 1e6
+
+    inizio = time.perf_counter()
+    for i in range(n):
+        Prodotto.da_riga_db(f"B{i}", "Prodotto", netto, aliquota, lordo, fornitore)
+    risultati["da_riga_db_us"] = (time.perf_counter() - inizio) / n * 1e6
+    return risultati
+
+
+def misura_letture(db_manager, ripetizioni):
+    tempi = cronometra(db_manager.leggi_prodotti, ripetizioni)
+    righe = len(db_manager.leggi_prodotti())
+    migliore = min(tempi)
+    return {"righe": righe, "migliore_s": migliore, "righe_al_s": righe / migliore, "mediana_s": statistics.median(tempi)}
+
+
+def misura_ricerche(db_manager, ripetizioni):
+    casi = {
+        "senza_filtri": {},
+        "nome": {"nome": "bullone"},
+        "prezzo_max": {"prezzo_max": 20.0},
+        "nome_e_prezzo_max": {"nome": "bullone", "prezzo_max": 20.0},
+        "nome_raro": {"nome": "flangia molla perno"},
+    }
+    risultati = {}
+    for nome_caso, filtri in casi.items():
+        # La ricerca senza filtri restituisce tutto il catalogo: bastano meno ripetizioni
+        volte = max(1, ripetizioni // 10) if not filtri else ripetizioni
+        tempi = cronometra(lambda: db_manager.ricerca_prodotti_filtrata(**filtri), volte)
+        risultati[nome_caso] = {"righe": len(db_manager.ricerca_prodotti_filtrata(**filtri)), **percentili(tempi)}
+    return risultati
+
+
+def misura_scritture(db_manager, n_singoli, n_massivi):
+    from classe import Prodotto
+
+    prodotti = [Prodotto(f"BENCH-S{i:06d}", f"Prodotto singolo {i}", 10 + i % 100, 22.0) for i in range(n_singoli)]
+    inizio = time.perf_counter()
+    for prodotto in prodotti:
+        db_manager.inserisci_prodotto(prodotto)
+    inserimenti = time.perf_counter() - inizio
+
+    for prodotto in prodotti:
+        prodotto.prezzo_netto = prodotto.prezzo_netto + 1
+    inizio = time.perf_counter()
+    for prodotto in prodotti:
+        db_manager.aggiorna_prodotto(prodotto)
+    aggiornamenti = time.perf_counter() - inizio
+
+    massivi = [Prodotto(f"BENCH-M{i:07d}", f"Prodotto massivo {i}", 5 + i % 500, 10.0) for i in range(n_massivi)]
+    inizio = time.perf_counter()
+    db_manager.inserisci_prodotti_bulk(massivi)
+    massivo = time.perf_counter() - inizio
+
+    # Il catalogo torna com'era, così le misure successive non dipendono da questa
+    with db_manager._connessione() as (conn, cursor):
+        cursor.execute("DELETE FROM prodotti WHERE codice LIKE 'BENCH-%';")
+        conn.commit()
+
+    return {
+        "inserimenti_al_s": n_singoli / inserimenti,
+        "aggiornamenti_al_s": n_singoli / aggiornamenti,
+        "inserimento_massivo_righe_al_s": n_massivi / massivo,
+    }
+
+
+def avvia_api(porta, database):
+    """Avvia app.py in un processo separato (server WSGI multithread) e attende che risponda."""
+    codice = (
+        "import app\n"
+        "from werkzeug.serving import run_simple\n"
+        f"run_simple('127.0.0.1', {porta}, app.crea_app(), threaded=True)\n"
+    )
+    ambiente = {**os.environ, "DB_NAME": database, "PYTHONUNBUFFERED": "1"}
+    processo = subprocess.Popen(
+        [sys.executable, "-c", codice], cwd=CARTELLA_ESERCIZIO, env=ambiente,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    scadenza = time.monotonic() + 30
+    while time.monotonic() < scadenza:
+        if processo.poll() is not None:
+            raise RuntimeError("L'API si è chiusa durante l'avvio.")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{porta}/api/v1/stato/pronto", timeout=1).read()
+            return processo
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("L'API non ha risposto entro 30 secondi.")
+
+
+def misura_http(porta, percorso, client, richieste):
+    url = f"http://127.0.0.1:{porta}{percorso}"
+
+    def richiesta(_):
+        inizio = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=120) as risposta:
+            risposta.read()
+        return time.perf_counter() - inizio
+
+    richiesta(0)  # riscaldamento
+    inizio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=client) as esecutore:
+        tempi = list(esecutore.map(richiesta, range(richieste)))
+    durata = time.perf_counter() - inizio
+    return {"client": client, "richieste": richieste, "richieste_al_s": richieste / durata, **percentili(tempi)}
+
+
+# ------------------------------------------------------------------ confronto
+
+def appiattisci(dati, prefisso=""):
+    valori = {}
+    for chiave, valore in dati.items():
+        nome = f"{prefisso}{chiave}"
+        if isinstance(valore, dict):
+            valori.update(appiattisci(valore, nome + "."))
+        elif isinstance(valore, (int, float)) and not isinstance(valore, bool) and chiave not in CAMPI_DESCRITTIVI:
+            valori[nome] = valore
+    return valori
+
+
+def confronta(precedenti, attuali):
+    """Stampa la variazione percentuale di ogni misura presente in entrambe le esecuzioni."""
+    prima = appiattisci(precedenti["risultati"])
+    dopo = appiattisci(attuali["risultati"])
+    print("--- Confronto con l'esecuzione precedente ---")
+    for nome in sorted(prima.keys() & dopo.keys()):
+        if prima[nome]:
+            variazione = (dopo[nome] - prima[nome]) / prima[nome] * 100
+            print(f"{nome:>55}: {prima[nome]:12.3f} -> {dopo[nome]:12.3f} ({variazione:+6.1f}%)")
+
+
+# ------------------------------------------------------------------ main
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del percorso dati dei prodotti su PostgreSQL locale.")
+    parser.add_argument("--database", default=DATABASE_BENCHMARK, help="database dedicato (viene svuotato)")
+    parser.add_argument("--prodotti", type=int, default=100_000, help="prodotti da generare")
+    parser.add_argument("--fornitori", type=int, default=50, help="fornitori da generare")
+    parser.add_argument("--salta-popolamento", action="store_true", help="riusa i dati già presenti")
+    parser.add_argument("--ripetizioni", type=int, default=20, help="ripetizioni per le misure di lettura")
+    parser.add_argument("--inserimenti", type=int, default=1000, help="inserimenti/aggiornamenti singoli")
+    parser.add_argument("--inserimenti-massivi", type=int, default=20_000, help="righe dell'inserimento massivo")
+    parser.add_argument("--client", type=int, default=8, help="client HTTP concorrenti")
+    parser.add_argument("--richieste", type=int, default=400, help="richieste HTTP per scenario")
+    parser.add_argument("--porta", type=int, default=5099, help="porta dell'API avviata per il test")
+    parser.add_argument("--output", default="risultati_benchmark.json", help="file JSON dei risultati")
+    parser.add_argument("--confronta", help="file JSON di un'esecuzione precedente")
+    argomenti = parser.parse_args(argv)
+
+    # DB_CONFIG viene letto all'importazione di db_manager: il database va scelto prima
+    os.environ["DB_NAME"] = argomenti.database
+    from db_manager import ProdottoDBManager
+    from migra import applica_migrazioni
+
+    with redirect_stdout(io.StringIO()):
+        crea_database(argomenti.database)
+        migrato = applica_migrazioni()
+    if not migrato:
+        print("❌ Migrazioni non applicate al database di benchmark.")
+        return 1
+
+    if not argomenti.salta_popolamento:
+        inizio = time.perf_counter()
+        popola(argomenti.prodotti, argomenti.fornitori)
+        print(f"✅ Database popolato: {argomenti.prodotti} prodotti, {argomenti.fornitori} fornitori "
+              f"in {time.perf_counter() - inizio:.1f}s.")
+
+    db_manager = ProdottoDBManager()
+    if not db_manager.connetti():
+        return 1
+
+    risultati = {}
+    with redirect_stdout(io.StringIO()):
+        risultati["costruzione_prodotto"] = misura_costruzione(100_000)
+        risultati["leggi_prodotti"] = misura_letture(db_manager, max(3, argomenti.ripetizioni // 4))
+        risultati["ricerca_prodotti_filtrata"] = misura_ricerche(db_manager, argomenti.ripetizioni)
+        risultati["scritture"] = misura_scritture(db_manager, argomenti.inserimenti, argomenti.inserimenti_massivi)
+        with db_manager._connessione() as (conn, cursor):
+            cursor.execute("SELECT version();")
+            versione_pg = cursor.fetchone()[0]
+    db_manager.disconnetti()
+
+    api = avvia_api(argomenti.porta, argomenti.database)
+    try:
+        risultati["http_get_prodotti"] = {
+            "pagina_100": misura_http(argomenti.porta, "/api/v1/prodotti?limit=100", argomenti.client, argomenti.richieste),
+            "catalogo_completo": misura_http(
+                argomenti.porta, "/api/v1/prodotti", argomenti.client, max(argomenti.client, argomenti.richieste // 20)
+            ),
+        }
+    finally:
+        api.terminate()
+        api.wait()
+
+    esecuzione = {
+        "meta": {
+            "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "postgresql": versione_pg,
+            "cpu": os.cpu_count(),
+            "parametri": vars(argomenti),
+        },
+        "risultati": risultati,
+    }
+    with open(argomenti.output, "w", encoding="utf-8") as file_json:
+        json.dump(esecuzione, file_json, indent=2)
+
+    print(json.dumps(risultati, indent=2))
+    print(f"✅ Risultati salvati in: {argomenti.output}")
+
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding="utf-8") as file_json:
+            confronta(json.load(file_json), esecuzione)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Distingue "chiave assente" da un valore None salvato (cache negativa)
+MANCANTE = object()
+
+
+class CacheLRU:
+    """Cache in memoria thread-safe con dimensione massima (LRU) e scadenza (TTL) per voce."""
+
+    def __init__(self, dimensione_max, ttl, ttl_negativo=None, orologio=time.monotonic):
+        if dimensione_max < 1:
+            raise ValueError("La dimensione massima della cache deve essere almeno 1.")
+        self.dimensione_max = dimensione_max
+        self.ttl = ttl
+        self.ttl_negativo = ttl if ttl_negativo is None else ttl_negativo
+        self._orologio = orologio
+        self._voci = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hit = 0
+        self._hit_negativi = 0
+        self._miss = 0
+        self._scadute = 0
+        self._espulse = 0
+        self._invalidazioni = 0
+
+    def leggi(self, chiave):
+        """Restituisce il valore salvato (anche None) oppure MANCANTE se assente o scaduto."""
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None:
+                self._miss += 1
+                return MANCANTE
+
+            valore, scadenza = voce
+            if self._orologio() >= scadenza:
+                del self._voci[chiave]
+                self._scadute += 1
+                self._miss += 1
+                return MANCANTE
+
+            self._voci.move_to_end(chiave)
+            self._hit += 1
+            if valore is None:
+                self._hit_negativi += 1
+            return valore
+
+    def scrivi(self, chiave, valore):
+        ttl = self.ttl_negativo if valore is None else self.ttl
+        with self._lock:
+            self._voci[chiave] = (valore, self._orologio() + ttl)
+            self._voci.move_to_end(chiave)
+            while len(self._voci) > self.dimensione_max:
+                self._voci.popitem(last=False)
+                self._espulse += 1
+
+    def invalida(self, chiave):
+        with self._lock:
+            if self._voci.pop(chiave, None) is not None:
+                self._invalidazioni += 1
+
+    def svuota(self):
+        with self._lock:
+            self._voci.clear()
+
+    def statistiche(self):
+        with self._lock:
+            richieste = self._hit + self._miss
+            return {
+                "dimensione": len(self._voci),
+                "dimensione_max": self.dimensione_max,
+                "ttl_s": self.ttl,
+                "ttl_negativo_s": self.ttl_negativo,
+                "hit": self._hit,
+                "hit_negativi": self._hit_negativi,
+                "miss": self._miss,
+                "hit_ratio": round(self._hit / richieste, 4) if richieste else 0.0,
+                "scadute": self._scadute,
+                "espulse": self._espulse,
+                "invalidazioni": self._invalidazioni,
+            }
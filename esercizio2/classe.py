@@ -2,10 +2,20 @@ import uuid
 from decimal import Decimal, ROUND_HALF_UP
 
 class Fornitore:
+    __slots__ = ("_id", "_nome")
+
     def __init__(self, id_fornitore, nome):
         self._id = id_fornitore 
         self.nome = nome
 
+    @classmethod
+    def da_riga_db(cls, id_fornitore, nome):
+        """Costruttore veloce per righe lette dal DB: i dati sono già stati validati in scrittura."""
+        fornitore = cls.__new__(cls)
+        fornitore._id = id_fornitore
+        fornitore._nome = nome
+        return fornitore
+
     @property
     def id_fornitore(self):
         return self._id
@@ -27,6 +37,8 @@ class Fornitore:
         return self.__str__()
 
 class Prodotto:
+    __slots__ = ("_uuid", "_codice", "_nome", "_prezzo_netto", "_aliquota_iva", "_prezzo_lordo", "_fornitore")
+
     def __init__(self, codice: str, nome: str, prezzo_netto: float, aliquota_iva: float = 22.0, fornitore: 'Fornitore' = None):
         self._uuid = str(uuid.uuid4())
         self._codice = None
@@ -42,6 +54,33 @@ class Prodotto:
         self.prezzo_netto = prezzo_netto
         self.fornitore = fornitore 
 
+    @classmethod
+    def da_riga_db(cls, codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, fornitore=None):
+        """Costruttore veloce per righe lette dal DB.
+
+        Usa direttamente i Decimal restituiti da PostgreSQL, compreso il prezzo lordo già
+        salvato: niente validazione, niente ricalcolo e niente uuid finché non serve.
+        """
+        prodotto = cls.__new__(cls)
+        prodotto._uuid = None
+        prodotto._codice = codice
+        prodotto._nome = nome
+        prodotto._prezzo_netto = prezzo_netto if isinstance(prezzo_netto, Decimal) else Decimal(str(prezzo_netto))
+        prodotto._aliquota_iva = aliquota_iva if isinstance(aliquota_iva, Decimal) else Decimal(str(aliquota_iva))
+        prodotto._prezzo_lordo = None
+        prodotto._fornitore = fornitore
+        if prezzo_lordo is None:
+            prodotto._calcola_prezzo_lordo()
+        else:
+            prodotto._prezzo_lordo = prezzo_lordo if isinstance(prezzo_lordo, Decimal) else Decimal(str(prezzo_lordo))
+        return prodotto
+
+    @property
+    def uuid(self):
+        if self._uuid is None:
+            self._uuid = str(uuid.uuid4())
+        return self._uuid
+
     def _calcola_prezzo_lordo(self):
         if self._prezzo_netto is None or self._aliquota_iva is None:
             return
@@ -1,7 +1,21 @@
 import psycopg2
 import os
+import io
+import csv
+import copy
+import functools
+import inspect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import count, islice
 from dotenv import load_dotenv
 from classe import Prodotto, Fornitore
+from pool import PoolConnessioni
+from cache import CacheLRU, MANCANTE
+from metriche import metriche, CursoreMisurato
 
 load_dotenv() 
 
@@ -12,22 +26,320 @@ DB_CONFIG = {
     "password": os.environ.get("DB_PASSWORD", "la_tua_password_segreta")
 }
 
+
+
+def config_replica(voce):
+    """Parametri di connessione di una replica: 'host:porta' oppure una DSN (postgresql://... o 'host=... port=...').
+
+    Quello che la voce non specifica (database, utente, password) è preso da DB_CONFIG.
+    """
+    if "=" in voce or "://" in voce:
+        return {**DB_CONFIG, **psycopg2.extensions.parse_dsn(voce)}
+    host, _, porta = voce.partition(":")
+    return {**DB_CONFIG, "host": host, **({"port": porta} if porta else {})}
+
+
+# Repliche in sola lettura (opzionali): DB_REPLICHE è un elenco di voci per config_replica separate da virgole.
+# Le letture vanno alle repliche (DB_REPLICHE_STRATEGIA: round_robin o meno_carico), le scritture al primario.
+# Per DB_REPLICHE_ADERENZA secondi dopo una propria scrittura un thread legge dal primario, così vede quello
+# che ha appena scritto anche se le repliche sono in ritardo.
+REPLICHE_CONFIG = {
+    "repliche": [config_replica(voce.strip()) for voce in os.environ.get("DB_REPLICHE", "").split(",") if voce.strip()],
+    "repliche_strategia": os.environ.get("DB_REPLICHE_STRATEGIA", "round_robin"),
+    "repliche_aderenza": float(os.environ.get("DB_REPLICHE_ADERENZA", "5")),
+}
+STRATEGIE_REPLICHE = ("round_robin", "meno_carico")
+
+# Una replica che non accetta connessioni viene esclusa per questo numero di secondi (letture al primario)
+SECONDI_ESCLUSIONE_REPLICA = 30.0
+
+# Modalità pool (usata dall'API): DB_POOL_MAX=0 torna alla connessione singola
+POOL_CONFIG = {
+    "pool_min": int(os.environ.get("DB_POOL_MIN", "1")),
+    "pool_max": int(os.environ.get("DB_POOL_MAX", "10")),
+    "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+}
+
+# Connessioni interrotte (server riavviato, rete): i tentativi di riconnessione sono al più
+# DB_RICONNESSIONE_TENTATIVI, con un'attesa che parte da DB_RICONNESSIONE_ATTESA secondi e raddoppia
+RICONNESSIONE_CONFIG = {
+    "riconnessione_tentativi": int(os.environ.get("DB_RICONNESSIONE_TENTATIVI", "3")),
+    "riconnessione_attesa": float(os.environ.get("DB_RICONNESSIONE_ATTESA", "0.2")),
+}
+
+# Cache delle letture per codice: DB_CACHE_DIMENSIONE=0 (predefinito) la disattiva
+CACHE_CONFIG = {
+    "cache_dimensione": int(os.environ.get("DB_CACHE_DIMENSIONE", "0")),
+    "cache_ttl": float(os.environ.get("DB_CACHE_TTL", "30")),
+    "cache_ttl_negativo": float(os.environ.get("DB_CACHE_TTL_NEGATIVO", "5")),
+}
+
+# Metriche esposte su GET /metrics (METRICHE_ATTIVE=1) e log delle istruzioni più lente di
+# METRICHE_SOGLIA_LENTA_MS millisecondi (funziona anche con le metriche disattivate)
+METRICHE_CONFIG = {
+    "attivo": os.environ.get("METRICHE_ATTIVE", "0") == "1",
+    "soglia_lenta_ms": float(os.environ["METRICHE_SOGLIA_LENTA_MS"]) if os.environ.get("METRICHE_SOGLIA_LENTA_MS") else None,
+}
+metriche.attivo = METRICHE_CONFIG["attivo"]
+metriche.soglia_lenta_ms = METRICHE_CONFIG["soglia_lenta_ms"]
+
+# Colonne del CSV di esportazione (esporta_prodotti_copy), nell'ordine e con i nomi dell'intestazione
+COLONNE_ESPORTAZIONE = ("codice", "nome", "prezzo_netto", "aliquota_iva", "prezzo_lordo", "id_fornitore", "fornitore")
+
+# Modello di lettura (migrazione 005): con DB_MODELLO_LETTURA=1 le letture dei prodotti usano la vista
+# materializzata catalogo_prodotti invece della JOIN. È aggiornata da aggiorna_modello_lettura
+# (aggiorna_modello_lettura.py), quindi le scritture vi compaiono solo dopo il refresh successivo.
+LETTURA_CONFIG = {
+    "modello_lettura": os.environ.get("DB_MODELLO_LETTURA", "0") == "1",
+}
+
+# Da dove leggono le query sui prodotti con il loro fornitore: le tabelle normalizzate unite con la JOIN,
+# oppure il modello di lettura, che ha già il nome del fornitore in riga e contiene solo i prodotti attivi
+SORGENTE_TABELLE = {
+    "tabelle": "prodotti p\n        LEFT JOIN fornitori f ON p.id_fornitore = f.id",
+    "id_fornitore": "f.id",
+    "nome_fornitore": "f.nome",
+}
+SORGENTE_MODELLO = {
+    "tabelle": "catalogo_prodotti p",
+    "id_fornitore": "p.id_fornitore",
+    "nome_fornitore": "p.nome_fornitore",
+}
+
+
+def select_prodotti(sorgente=SORGENTE_TABELLE):
+    """Colonne lette per ricostruire un Prodotto con il suo Fornitore (vedi _riga_a_prodotto)."""
+    return f"""
+        SELECT 
+            p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
+            {sorgente["id_fornitore"]}, {sorgente["nome_fornitore"]}
+        FROM {sorgente["tabelle"]}"""
+
+
+def json_prodotto(sorgente=SORGENTE_TABELLE):
+    """Un prodotto come oggetto JSON costruito da PostgreSQL, con le stesse chiavi di serializzazione.prodotto_a_dict.
+
+    Le letture dell'intero catalogo ricevono così il testo della risposta già pronto, senza creare un Prodotto
+    per riga. I NUMERIC escono con i loro due decimali (22.00): per i client è lo stesso numero di 22.0.
+    """
+    id_fornitore, nome_fornitore = sorgente["id_fornitore"], sorgente["nome_fornitore"]
+    return f"""json_build_object(
+            'codice', p.codice,
+            'nome', p.nome,
+            'prezzo_netto', p.prezzo_netto,
+            'prezzo_lordo', p.prezzo_lordo,
+            'aliquota_iva', p.aliquota_iva,
+            'fornitore', CASE WHEN {id_fornitore} IS NULL THEN NULL
+                ELSE json_build_object('id', {id_fornitore}, 'nome', {nome_fornitore}) END
+        )"""
+
+
+def select_prodotti_json(sorgente=SORGENTE_TABELLE):
+    """Una riga per prodotto con il solo testo JSON (::text evita che psycopg2 lo decodifichi in un dict)."""
+    return f"""
+        SELECT {json_prodotto(sorgente)}::text
+        FROM {sorgente["tabelle"]}"""
+
+
+def istruzioni_per_sorgente(sorgente=SORGENTE_TABELLE):
+    """Istruzioni più frequenti: ogni connessione le prepara una sola volta (PREPARE) e poi le esegue
+    con EXECUTE, così PostgreSQL non deve rianalizzarle e ripianificarle a ogni chiamata.
+
+    Per ciascuna: tipi dei parametri e testo con i segnaposto di psycopg2 (usato anche senza preparazione).
+    Le letture usano `sorgente`, le scritture sempre la tabella prodotti.
+    """
+    select = select_prodotti(sorgente)
+    return {
+        "erp_prodotto_per_codice": (("text",), select + """
+        WHERE p.codice = %s AND p.attivo = TRUE"""),
+        "erp_prodotti_per_codici": (("text[]",), select + """
+        WHERE p.codice = ANY(%s) AND p.attivo = TRUE"""),
+        "erp_elenco_prodotti": ((), select + """
+        WHERE p.attivo = TRUE
+        ORDER BY p.nome ASC"""),
+        "erp_elenco_prodotti_json": ((), f"""
+        SELECT coalesce(json_agg({json_prodotto(sorgente)} ORDER BY p.nome ASC, p.codice ASC), '[]')::text
+        FROM {sorgente["tabelle"]}
+        WHERE p.attivo = TRUE"""),
+        "erp_inserisci_prodotto": (("text", "text", "numeric", "numeric", "numeric", "integer"), """
+        INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id"""),
+        "erp_aggiorna_prodotto": (("text", "numeric", "numeric", "numeric", "text"), """
+        UPDATE prodotti
+        SET 
+            nome = %s,
+            prezzo_netto = %s,
+            aliquota_iva = %s,
+            prezzo_lordo = %s
+        WHERE codice = %s AND attivo = TRUE"""),
+    }
+
+
+SELECT_PRODOTTI = select_prodotti()
+SELECT_PRODOTTI_JSON = select_prodotti_json()
+ISTRUZIONI_PREPARATE = istruzioni_per_sorgente()
+
+
+def execute_values(*args, **kwargs):
+    """psycopg2.extras.execute_values importata al primo utilizzo: serve solo alle scritture in blocco,
+    e il modulo (con logging) allungherebbe l'avvio di CLI e API che non ne fanno."""
+    from psycopg2.extras import execute_values as _execute_values
+    return _execute_values(*args, **kwargs)
+
+
+def segnaposto_numerati(query):
+    """Sostituisce i segnaposto %s di psycopg2 con i parametri posizionali $1, $2, ... di PostgreSQL."""
+    parti = query.split("%s")
+    return "".join(f"{parte}${posizione}" for posizione, parte in enumerate(parti[:-1], start=1)) + parti[-1]
+
+
+def lettura_idempotente(metodo):
+    """Decoratore dei metodi di sola lettura del manager: se durante la chiamata la connessione si è
+    interrotta, la lettura viene ripetuta una volta su una connessione nuova.
+
+    I metodi gestiscono da sé i propri errori (restituiscono None o []), quindi l'interruzione viene
+    segnalata da _connessione. I generatori si ripetono solo se non hanno ancora prodotto nulla.
+    """
+    if inspect.isgeneratorfunction(metodo):
+        @functools.wraps(metodo)
+        def generatore(self, *args, **kwargs):
+            self._locale.connessione_persa = False
+            prodotti = 0
+            try:
+                for elemento in metodo(self, *args, **kwargs):
+                    prodotti += 1
+                    yield elemento
+            except psycopg2.Error:
+                # Un generatore che rilancia gli errori si ripete alle stesse condizioni
+                if not self._locale.connessione_persa or prodotti:
+                    raise
+            if self._locale.connessione_persa and not prodotti:
+                self._locale.connessione_persa = False
+                print(f"⚠️ Connessione al database interrotta: nuovo tentativo di {metodo.__name__}.")
+                yield from metodo(self, *args, **kwargs)
+        return generatore
+
+    @functools.wraps(metodo)
+    def lettura(self, *args, **kwargs):
+        self._locale.connessione_persa = False
+        risultato = metodo(self, *args, **kwargs)
+        if self._locale.connessione_persa:
+            self._locale.connessione_persa = False
+            print(f"⚠️ Connessione al database interrotta: nuovo tentativo di {metodo.__name__}.")
+            risultato = metodo(self, *args, **kwargs)
+        return risultato
+    return lettura
+
+
+class ConnessioneERP(psycopg2.extensions.connection):
+    """Connessione psycopg2 che ricorda se le istruzioni preparate esistono già nella sua sessione.
+
+    Una connessione nuova (riconnessione, o connessione aggiunta dal pool) parte sempre da False.
+    Con le metriche attive i suoi cursori cronometrano ogni istruzione e i rollback vengono contati.
+    Conta i commit: le letture non confermano mai, quindi un commit segnala una scrittura.
+    """
+    preparata = False
+    scritture = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if metriche.misura_sql:
+            self.cursor_factory = CursoreMisurato
+
+    def commit(self):
+        super().commit()
+        self.scritture += 1
+
+    def rollback(self):
+        if metriche.attivo:
+            metriche.registra_rollback()
+        super().rollback()
+
+
+class Replica:
+    """Replica in sola lettura: parametri di connessione, pool (aperto al primo utilizzo) ed esclusione
+    temporanea dopo un errore di connessione."""
+
+    def __init__(self, config):
+        self.config = config
+        self.nome = f"{config.get('host', 'localhost')}:{config.get('port', 5432)}"
+        self.pool = None
+        self.esclusa_fino = 0.0
+
+
 class ProdottoDBManager:
-    def __init__(self):
+    def __init__(self, pool_min=None, pool_max=None, pool_timeout=5.0, fornitori_per_sessione=False,
+                 cache_dimensione=0, cache_ttl=30.0, cache_ttl_negativo=None, istruzioni_preparate=True,
+                 modello_lettura=False, connessione_pigra=False, riconnessione_tentativi=3, riconnessione_attesa=0.2,
+                 repliche=(), repliche_strategia="round_robin", repliche_aderenza=5.0):
         self.conn = None
         self.cursor = None
+        self.pool = None
+        self.pool_min = pool_min or 0
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        # In modalità connessione singola serializza l'uso del cursore condiviso tra thread
+        self._lock = threading.RLock()
+        # Mappa d'identità dei fornitori (id -> Fornitore): per query, o condivisa per tutta la sessione
+        self._fornitori_sessione = {} if fornitori_per_sessione else None
+        # Cache read-through di leggi_prodotto_per_codice (anche negativa: i codici inesistenti salvano None)
+        self.cache = CacheLRU(cache_dimensione, cache_ttl, cache_ttl_negativo) if cache_dimensione else None
+        # Da disattivare dietro un pooler in modalità transaction (es. PgBouncer), che non conserva la sessione
+        self.istruzioni_preparate = istruzioni_preparate
+        # Letture dalla vista materializzata catalogo_prodotti (migrazione 005) invece che dalla JOIN
+        self.modello_lettura = modello_lettura
+        self._sorgente = SORGENTE_MODELLO if modello_lettura else SORGENTE_TABELLE
+        self._istruzioni = istruzioni_per_sorgente(self._sorgente)
+        # Connessione aperta dalla prima operazione invece che da connetti() (avvio dell'API e della CLI)
+        self.connessione_pigra = connessione_pigra
+        self._lock_connessione = threading.Lock()
+        self.riconnessione_tentativi = max(1, riconnessione_tentativi)
+        self.riconnessione_attesa = riconnessione_attesa
+        # Processo proprietario delle connessioni: dopo un fork il figlio deve aprirne di proprie
+        self._pid = os.getpid()
+        # Per thread: connessione interrotta (letta da lettura_idempotente) e istante dell'ultima scrittura
+        self._locale = threading.local()
+        # Repliche per le letture (vedi _scegli_replica); senza repliche tutto va al primario
+        if repliche_strategia not in STRATEGIE_REPLICHE:
+            raise ValueError(f"Strategia delle repliche non valida: {repliche_strategia} (ammesse: {', '.join(STRATEGIE_REPLICHE)}).")
+        self._repliche = [Replica(config) for config in repliche]
+        self.repliche_strategia = repliche_strategia
+        self.repliche_aderenza = repliche_aderenza
+        self._giro_repliche = count()
 
     def connetti(self):
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
-            self.cursor = self.conn.cursor()
-            print("✅ Connessione a PostgreSQL riuscita.")
+            if self.pool_max:
+                # Le connessioni del pool vengono preparate al primo prelievo (vedi _connessione)
+                self.pool = PoolConnessioni(
+                    self.pool_min, self.pool_max, self.pool_timeout, connection_factory=ConnessioneERP, **DB_CONFIG
+                )
+                print(f"✅ Pool di connessioni PostgreSQL pronto (min {self.pool_min}, max {self.pool_max}).")
+            else:
+                self._apri_connessione_singola()
+                print("✅ Connessione a PostgreSQL riuscita.")
             return True
         except psycopg2.Error as e:
             print(f"❌ Errore durante la connessione a PostgreSQL: {e}")
             return False
 
+    def _apri_connessione_singola(self):
+        self.conn = psycopg2.connect(connection_factory=ConnessioneERP, **DB_CONFIG)
+        self.cursor = self.conn.cursor()
+        if self.istruzioni_preparate:
+            self._prepara(self.conn)
+
     def disconnetti(self):
+        if self.pool and not self.pool.chiuso:
+            self.pool.chiudi()
+            print("✅ Pool di connessioni PostgreSQL chiuso.")
+
+        for replica in self._repliche:
+            if replica.pool is not None and not replica.pool.chiuso:
+                replica.pool.chiudi()
+                print(f"✅ Pool della replica {replica.nome} chiuso.")
+
         if self.cursor:
             self.cursor.close()
             
@@ -35,16 +347,278 @@ class ProdottoDBManager:
             self.conn.close()
             print("✅ Connessione a PostgreSQL chiusa.")
 
-    def inserisci_prodotto(self, prodotto):
-        id_fornitore_da_salvare = prodotto.fornitore.id_fornitore if prodotto.fornitore else None
-        
-        query = """
-        INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        RETURNING id; 
+    def _connesso(self):
+        self._verifica_connessione()
+        if self.pool is not None:
+            return not self.pool.chiuso
+        return bool(self.conn) and not self.conn.closed
+
+    def _verifica_connessione(self):
+        """Prepara le connessioni del manager prima di un'operazione: le riapre dopo un fork,
+        si collega alla prima operazione con connessione_pigra e riapre la connessione singola interrotta.
+
+        La chiamano sia _connesso() sia _connessione(), così nessuna operazione la salta.
+        """
+        if self._pid != os.getpid():
+            self._dopo_fork()
+
+        if self.connessione_pigra and self.pool is None and self.conn is None:
+            # Prima operazione: ci si collega ora. Dopo disconnetti() il manager resta scollegato.
+            # Se il database non risponde si riproverà all'operazione successiva.
+            with self._lock_connessione:
+                if self.pool is None and self.conn is None:
+                    self.connetti()
+        elif self.conn is not None and self.conn.closed == 2:
+            # closed vale 2 per una connessione interrotta, 1 dopo close(): disconnetti() non viene annullata
+            with self._lock:
+                if self.conn.closed == 2:
+                    self._riconnetti()
+
+    def _dopo_fork(self):
+        """Il processo è figlio di un fork (es. worker di un server pre-fork avviato dopo la connessione).
+
+        Le connessioni ereditate sono le sessioni del processo padre: non si usano e non si chiudono
+        (close() invierebbe al server la chiusura della sessione del padre). Si abbandonano, e psycopg2
+        le rilascia senza toccare il server perché appartengono a un altro processo; il figlio apre
+        le proprie. Anche i lock vengono ricreati: un altro thread del padre poteva tenerli al fork.
+        """
+        self._pid = os.getpid()
+        self._lock = threading.RLock()
+        self._lock_connessione = threading.Lock()
+        # I pool delle repliche si riaprono al primo utilizzo
+        for replica in self._repliche:
+            replica.pool = None
+            replica.esclusa_fino = 0.0
+
+        ereditata = (self.pool is not None and not self.pool.chiuso) or (self.conn is not None and self.conn.closed != 1)
+        if not ereditata:
+            return
+        self.pool = None
+        self.conn = None
+        self.cursor = None
+        print(f"⚠️ Processo {self._pid} nato da un fork: apertura di connessioni proprie.")
+        self.connetti()
+
+    def _con_ritentativi(self, apri):
+        """Esegue apri() ritentando gli errori di connessione fino a riconnessione_tentativi volte,
+        con un'attesa che raddoppia a ogni tentativo. L'ultimo errore viene rilanciato."""
+        for tentativo in range(1, self.riconnessione_tentativi + 1):
+            try:
+                return apri()
+            except psycopg2.OperationalError as e:
+                if tentativo == self.riconnessione_tentativi:
+                    raise
+                attesa = self.riconnessione_attesa * 2 ** (tentativo - 1)
+                print(f"⚠️ Connessione a PostgreSQL non riuscita (tentativo {tentativo}), nuovo tentativo tra {attesa:.1f}s: {e}")
+                time.sleep(attesa)
+
+    def _riconnetti(self):
+        """Riapre la connessione singola interrotta. Se il database non risponde si riproverà all'operazione successiva."""
+        try:
+            self._con_ritentativi(self._apri_connessione_singola)
+            print("✅ Riconnessione a PostgreSQL riuscita.")
+        except psycopg2.Error as e:
+            print(f"❌ Riconnessione a PostgreSQL non riuscita: {e}")
+
+    def _connessione_interrotta(self, pool):
+        """Registra che la connessione dell'operazione in corso si è interrotta (vedi lettura_idempotente).
+
+        Con il pool anche le altre connessioni aperte finora sono sospette (es. server riavviato):
+        vengono sostituite al loro prossimo utilizzo.
+        """
+        self._locale.connessione_persa = True
+        if pool is not None:
+            pool.invalida()
+
+    def _aderente_al_primario(self):
+        """True se ci sono repliche e il thread ha scritto da meno di repliche_aderenza secondi:
+        le sue letture vanno al primario (e saltano la cache) per vedere le proprie scritture."""
+        if not self._repliche:
+            return False
+        return time.monotonic() - getattr(self._locale, "ultima_scrittura", float("-inf")) < self.repliche_aderenza
+
+    def _cache_utilizzabile(self):
+        """La cache dei prodotti, o None mentre il thread legge dal primario: un altro thread
+        potrebbe averla riempita da una replica in ritardo dopo l'ultima scrittura di questo."""
+        return None if self._aderente_al_primario() else self.cache
+
+    def scegli_replica(self):
+        """Replica per un gruppo di letture che devono vedere lo stesso stato del catalogo (es. versione
+        ed elenco di una stessa risposta), da passare come `replica=` ai metodi di lettura; None è il primario."""
+        return self._scegli_replica()
+
+    def _scegli_replica(self):
+        """Replica a cui mandare una lettura, o None se la lettura va al primario: nessuna replica
+        disponibile, oppure il thread ha scritto da meno di repliche_aderenza secondi (legge le proprie scritture).
+
+        round_robin le alterna; meno_carico sceglie quella con meno connessioni in uso (a parità, a turno).
+        """
+        if not self._repliche or self._aderente_al_primario():
+            return None
+        adesso = time.monotonic()
+
+        disponibili = [replica for replica in self._repliche if replica.esclusa_fino <= adesso]
+        if not disponibili:
+            return None
+        turno = next(self._giro_repliche) % len(disponibili)
+        if self.repliche_strategia == "meno_carico":
+            a_turno = disponibili[turno:] + disponibili[:turno]
+            return min(a_turno, key=lambda replica: replica.pool.in_uso if replica.pool is not None else 0)
+        return disponibili[turno]
+
+    def _preleva_da_replica(self, replica):
+        """Connessione dal pool della replica (aperto qui al primo utilizzo), o None se la replica non risponde:
+        in quel caso resta esclusa per SECONDI_ESCLUSIONE_REPLICA secondi e la lettura va al primario."""
+        try:
+            if replica.pool is None:
+                with self._lock_connessione:
+                    if replica.pool is None:
+                        # Almeno una connessione resta aperta tra una lettura e l'altra, anche senza pool sul primario
+                        massimo = self.pool_max or 1
+                        replica.pool = PoolConnessioni(
+                            max(1, min(self.pool_min, massimo)), massimo, self.pool_timeout,
+                            connection_factory=ConnessioneERP, **replica.config
+                        )
+            return replica.pool.prendi()
+        except psycopg2.OperationalError as e:
+            replica.esclusa_fino = time.monotonic() + SECONDI_ESCLUSIONE_REPLICA
+            print(f"⚠️ Replica {replica.nome} non raggiungibile, letture al primario per {SECONDI_ESCLUSIONE_REPLICA:.0f}s: {e}")
+            return None
+
+    @contextmanager
+    def _connessione(self, replica=False):
+        """Fornisce (conn, cursor) per un'operazione e li rilascia al termine.
+
+        Con il pool la connessione viene prelevata e poi restituita; senza pool si usa
+        la connessione singola in mutua esclusione. In caso di eccezione la transazione
+        aperta viene annullata. Se il server non accetta nuove connessioni, il prelievo
+        dal pool viene ritentato con attese crescenti (vedi _con_ritentativi).
+        Con `replica=True` (solo letture) la connessione viene da una replica, se ce n'è
+        una disponibile (vedi _scegli_replica); altrimenti dal primario. `replica` può essere
+        anche una Replica già scelta (vedi scegli_replica): se nel frattempo è stata esclusa,
+        la lettura va al primario, che non è mai più indietro di lei.
         """
+        self._verifica_connessione()
+        pool = conn = None
+        if replica is True:
+            scelta = self._scegli_replica()
+        elif isinstance(replica, Replica) and replica.esclusa_fino <= time.monotonic():
+            scelta = replica
+        else:
+            scelta = None
+        if scelta is not None:
+            conn = self._preleva_da_replica(scelta)
+            pool = scelta.pool
+        if conn is None and self.pool is not None:
+            pool = self.pool
+            conn = self._con_ritentativi(self.pool.prendi)
+
+        if conn is not None:
+            try:
+                if self.istruzioni_preparate and not conn.preparata:
+                    self._prepara(conn)
+                scritture = conn.scritture
+                with conn.cursor() as cursor:
+                    yield conn, cursor
+                if conn.scritture != scritture:
+                    self._locale.ultima_scrittura = time.monotonic()
+            except Exception:
+                if conn.closed:
+                    self._connessione_interrotta(pool)
+                else:
+                    conn.rollback()
+                raise
+            finally:
+                pool.restituisci(conn)
+        else:
+            with self._lock:
+                if self.conn is None or self.conn.closed:
+                    # Mai connesso, connessione pigra non riuscita o dopo disconnetti()
+                    raise psycopg2.InterfaceError("Connessione a PostgreSQL non attiva.")
+                try:
+                    scritture = self.conn.scritture
+                    yield self.conn, self.cursor
+                    if self.conn.scritture != scritture:
+                        self._locale.ultima_scrittura = time.monotonic()
+                except Exception:
+                    if self.conn and self.conn.closed:
+                        self._connessione_interrotta(None)
+                    elif self.conn:
+                        self.conn.rollback()
+                    raise
+
+    def _prepara(self, conn):
+        """Esegue PREPARE per tutte le istruzioni preparate del manager sulla sessione di `conn`.
+
+        PREPARE non è transazionale: le istruzioni restano valide fino alla chiusura della connessione,
+        anche se la transazione corrente viene annullata.
+        """
+        with conn.cursor() as cursor:
+            for nome, (tipi, query) in self._istruzioni.items():
+                parametri = f" ({', '.join(tipi)})" if tipi else ""
+                cursor.execute(f"PREPARE {nome}{parametri} AS {segnaposto_numerati(query)};")
+        conn.preparata = True
+
+    def _esegui(self, conn, cursor, nome, valori=None):
+        """Esegue una delle istruzioni preparate del manager con EXECUTE (o come query normale se la preparazione è disattivata).
+
+        Se la sessione ha perso le istruzioni (es. DISCARD ALL eseguito da un pooler) le prepara di nuovo
+        e riprova una volta. Va usata come prima istruzione della transazione: il nuovo tentativo la annulla.
+        """
+        tipi, query = self._istruzioni[nome]
+        if not self.istruzioni_preparate:
+            cursor.execute(query + ";", valori)
+            return
+
+        if not conn.preparata:
+            self._prepara(conn)
+        esegui = f"EXECUTE {nome} ({', '.join(['%s'] * len(tipi))});" if tipi else f"EXECUTE {nome};"
+        try:
+            cursor.execute(esegui, valori)
+        except psycopg2.errors.InvalidSqlStatementName:
+            conn.rollback()
+            self._prepara(conn)
+            cursor.execute(esegui, valori)
+
+    def _mappa_fornitori(self):
+        """Mappa d'identità da usare per una query: quella di sessione se attiva, altrimenti una nuova."""
+        return self._fornitori_sessione if self._fornitori_sessione is not None else {}
+
+    def svuota_mappa_fornitori(self):
+        if self._fornitori_sessione is not None:
+            self._fornitori_sessione.clear()
+
+    def _invalida_cache(self, *codici):
+        if self.cache is not None:
+            for codice in codici:
+                self.cache.invalida(codice)
+
+    def statistiche_cache(self):
+        """Restituisce le statistiche della cache per codice, o None se è disattivata."""
+        return self.cache.statistiche() if self.cache is not None else None
+
+    def statistiche_pool(self):
+        """Restituisce le statistiche del pool, o None in modalità connessione singola."""
+        return self.pool.statistiche() if self.pool is not None else None
+
+    def statistiche_repliche(self):
+        """Per ogni replica: nome, disponibilità e statistiche del suo pool (se già aperto), o None senza repliche."""
+        if not self._repliche:
+            return None
+        adesso = time.monotonic()
+        return [
+            {
+                "replica": replica.nome,
+                "disponibile": replica.esclusa_fino <= adesso,
+                **(replica.pool.statistiche() if replica.pool is not None else {}),
+            }
+            for replica in self._repliche
+        ]
+
+    def _valori_inserimento(self, prodotto):
+        id_fornitore_da_salvare = prodotto.fornitore.id_fornitore if prodotto.fornitore else None
         
-        valori = (
+        return (
             prodotto.codice,
             prodotto.nome,
             prodotto.prezzo_netto,
@@ -52,63 +626,265 @@ class ProdottoDBManager:
             prodotto.prezzo_lordo,
             id_fornitore_da_salvare
         )
+
+    def inserisci_prodotto(self, prodotto):
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile inserire i dati.")
+            return None
+
+        valori = self._valori_inserimento(prodotto)
         
         try:
-            self.cursor.execute(query, valori)
-            nuovo_id = self.cursor.fetchone()[0]
-            self.conn.commit()
+            with self._connessione() as (conn, cursor):
+                self._esegui(conn, cursor, "erp_inserisci_prodotto", valori)
+                nuovo_id = cursor.fetchone()[0]
+                conn.commit()
+            self._invalida_cache(prodotto.codice)
             print(f"✅ Prodotto '{prodotto.nome}' inserito con successo! ID DB: {nuovo_id}")
             return nuovo_id
             
         except psycopg2.Error as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore DB durante l'inserimento: {e}")
             return None
         
         except Exception as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore generico: {e}")
             return None
 
+    def inserisci_prodotti_bulk(self, prodotti, batch_size=1000):
+        """Inserisce molti prodotti con INSERT multi-riga e un solo commit per batch.
+
+        Restituisce (ids, scartati): `ids` segue l'ordine di input con None per le righe
+        rifiutate, `scartati` è una lista di (indice, codice, errore). Una riga non valida
+        non annulla il resto del batch. In caso di errore fatale (es. connessione persa)
+        restituisce solo quanto già confermato.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile inserire i dati.")
+            return [], []
+
+        if batch_size < 1:
+            raise ValueError("batch_size deve essere almeno 1.")
+
+        query = """
+        INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore)
+        VALUES %s
+        RETURNING id;
+        """
+
+        ids = []
+        scartati = []
+        confermati = 0
+        iteratore = iter(prodotti)
+
+        try:
+            with self._connessione() as (conn, cursor):
+                while True:
+                    batch = list(islice(iteratore, batch_size))
+                    if not batch:
+                        break
+
+                    righe = []
+                    for prodotto in batch:
+                        indice = len(ids)
+                        ids.append(None)
+                        if not isinstance(prodotto, Prodotto):
+                            scartati.append((indice, None, "L'elemento non è un'istanza di Prodotto."))
+                            continue
+                        righe.append((indice, self._valori_inserimento(prodotto)))
+
+                    if righe:
+                        self._inserisci_batch(cursor, query, righe, ids, scartati)
+                    conn.commit()
+                    self._invalida_cache(*(valori[0] for indice, valori in righe if ids[indice] is not None))
+                    confermati = len(ids)
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'inserimento massivo: {e}")
+            del ids[confermati:]
+            scartati = [s for s in scartati if s[0] < confermati]
+        except Exception as e:
+            print(f"❌ Errore generico durante l'inserimento massivo: {e}")
+            del ids[confermati:]
+            scartati = [s for s in scartati if s[0] < confermati]
+
+        scartati.sort()
+        inseriti = len(ids) - len(scartati)
+        print(f"✅ Inserimento massivo completato: {inseriti} prodotti inseriti, {len(scartati)} scartati.")
+        return ids, scartati
+
+    def _inserisci_batch(self, cursor, query, righe, ids, scartati):
+        """Inserisce un batch in un'unica istruzione; se fallisce, isola le righe non valide."""
+        cursor.execute("SAVEPOINT bulk_batch;")
+        try:
+            nuovi_id = execute_values(cursor, query, [valori for _, valori in righe], page_size=len(righe), fetch=True)
+            cursor.execute("RELEASE SAVEPOINT bulk_batch;")
+            for (indice, _), (nuovo_id,) in zip(righe, nuovi_id):
+                ids[indice] = nuovo_id
+            return
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+
+        # Almeno una riga è stata rifiutata: si riprova riga per riga, ognuna nel proprio savepoint
+        for indice, valori in righe:
+            cursor.execute("SAVEPOINT bulk_riga;")
+            try:
+                ids[indice] = execute_values(cursor, query, [valori], fetch=True)[0][0]
+                cursor.execute("RELEASE SAVEPOINT bulk_riga;")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT bulk_riga;")
+                scartati.append((indice, valori[0], str(e).strip()))
+
+    def risolvi_fornitori(self, nomi, crea=False):
+        """Restituisce {nome: id} per i fornitori richiesti; con `crea` inserisce quelli mancanti."""
+        nomi = list(nomi)
+        if not nomi or not self._connesso():
+            return {}
+
+        try:
+            with self._connessione() as (conn, cursor):
+                if crea:
+                    execute_values(
+                        cursor,
+                        "INSERT INTO fornitori (nome) VALUES %s ON CONFLICT (nome) DO NOTHING;",
+                        [(nome,) for nome in nomi]
+                    )
+                cursor.execute("SELECT nome, id FROM fornitori WHERE nome = ANY(%s);", (nomi,))
+                trovati = dict(cursor.fetchall())
+                conn.commit()
+            return trovati
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la risoluzione dei fornitori: {e}")
+            return {}
+
+    def importa_prodotti_copy(self, righe, aggiorna=False):
+        """Carica un blocco di prodotti già validati con COPY e lo inserisce in un'unica transazione.
+
+        `righe` contiene tuple (numero_riga, codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore).
+        I dati passano da una tabella temporanea: i codici già presenti nel catalogo o ripetuti nel
+        blocco vengono scartati, oppure aggiornati (vince l'ultima occorrenza) se `aggiorna` è True.
+        Restituisce (inseriti, scartati) con scartati = [(numero_riga, codice, errore)], oppure None
+        se un errore DB ha annullato l'intero blocco.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile importare i dati.")
+            return None
+
+        buffer = io.StringIO()
+        csv.writer(buffer, delimiter=';').writerows(righe)
+        buffer.seek(0)
+
+        try:
+            with self._connessione() as (conn, cursor):
+                cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS import_prodotti (
+                    riga INTEGER, codice TEXT, nome TEXT, prezzo_netto NUMERIC, aliquota_iva NUMERIC,
+                    prezzo_lordo NUMERIC, id_fornitore INTEGER
+                ) ON COMMIT DELETE ROWS;
+                """)
+                cursor.copy_expert(
+                    "COPY import_prodotti (riga, codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore) "
+                    "FROM STDIN WITH (FORMAT csv, DELIMITER ';');",
+                    buffer
+                )
+
+                scartati = []
+                if aggiorna:
+                    cursor.execute("""
+                    INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore)
+                    SELECT DISTINCT ON (codice) codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore
+                    FROM import_prodotti
+                    ORDER BY codice, riga DESC
+                    ON CONFLICT (codice) WHERE attivo DO UPDATE SET
+                        nome = EXCLUDED.nome,
+                        prezzo_netto = EXCLUDED.prezzo_netto,
+                        aliquota_iva = EXCLUDED.aliquota_iva,
+                        prezzo_lordo = EXCLUDED.prezzo_lordo,
+                        id_fornitore = EXCLUDED.id_fornitore;
+                    """)
+                else:
+                    cursor.execute("""
+                    SELECT s.riga, s.codice,
+                        CASE WHEN EXISTS (SELECT 1 FROM prodotti p WHERE p.codice = s.codice AND p.attivo)
+                            THEN 'Codice già presente nel catalogo.'
+                            ELSE 'Codice ripetuto nel file.' END
+                    FROM (
+                        SELECT riga, codice, row_number() OVER (PARTITION BY codice ORDER BY riga) AS occorrenza
+                        FROM import_prodotti
+                    ) s
+                    WHERE s.occorrenza > 1 OR EXISTS (SELECT 1 FROM prodotti p WHERE p.codice = s.codice AND p.attivo)
+                    ORDER BY s.riga;
+                    """)
+                    scartati = cursor.fetchall()
+                    cursor.execute("""
+                    INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore)
+                    SELECT DISTINCT ON (codice) codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore
+                    FROM import_prodotti s
+                    WHERE NOT EXISTS (SELECT 1 FROM prodotti p WHERE p.codice = s.codice AND p.attivo)
+                    ORDER BY codice, riga
+                    ON CONFLICT (codice) WHERE attivo DO NOTHING;
+                    """)
+
+                inseriti = cursor.rowcount
+                conn.commit()
+
+            if self.cache is not None:
+                self.cache.svuota()
+            return inseriti, scartati
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'importazione con COPY: {e}")
+            return None
+
+    def esporta_prodotti_copy(self, destinazione, intestazione=True):
+        """Scrive i prodotti attivi in CSV (delimitatore ';', dialetto di esercizio1) con COPY ... TO STDOUT.
+
+        `destinazione` è un oggetto con un metodo write (file aperto in testo o in binario): PostgreSQL
+        produce il CSV e le righe vi arrivano man mano, senza passare da Prodotto né restare in memoria.
+        Colonne: COLONNE_ESPORTAZIONE (riconosciute da importa_catalogo.py); righe ordinate per (nome, codice).
+        Restituisce il numero di prodotti esportati, o None in caso di errore DB.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile esportare i dati.")
+            return None
+
+        query = f"""
+        COPY (
+            SELECT
+                p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo,
+                {self._sorgente["id_fornitore"]} AS id_fornitore, {self._sorgente["nome_fornitore"]} AS fornitore
+            FROM {self._sorgente["tabelle"]}
+            WHERE p.attivo = TRUE
+            ORDER BY p.nome ASC, p.codice ASC
+        ) TO STDOUT WITH (FORMAT csv, DELIMITER ';'{", HEADER" if intestazione else ""});
+        """
+
+        try:
+            with self._connessione(replica=True) as (conn, cursor):
+                cursor.copy_expert(query, destinazione)
+                esportati = cursor.rowcount
+                # Sola lettura: si chiude la transazione senza modifiche
+                conn.rollback()
+            return esportati
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'esportazione con COPY: {e}")
+            return None
+
+    @lettura_idempotente
     def leggi_prodotti(self):
-        if not self.conn:
+        if not self._connesso():
             print("❌ Connessione non attiva. Impossibile leggere i dati.")
             return []
-            
-        query = """
-        SELECT 
-            p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
-            f.id, f.nome
-        FROM prodotti p
-        LEFT JOIN fornitori f ON p.id_fornitore = f.id
-        WHERE p.attivo = TRUE
-        ORDER BY p.nome ASC;
-        """
-        
-        prodotti_letti = []
         
         try:
-            self.cursor.execute(query)
-            risultati = self.cursor.fetchall()
+            with self._connessione(replica=True) as (conn, cursor):
+                self._esegui(conn, cursor, "erp_elenco_prodotti")
+                risultati = cursor.fetchall()
             
-            for riga in risultati:
-                codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, attivo, id_fornitore_db, nome_fornitore_db = riga
-                
-                fornitore_obj = None
-                if id_fornitore_db is not None and nome_fornitore_db is not None:
-                    fornitore_obj = Fornitore(id_fornitore=id_fornitore_db, nome=nome_fornitore_db)
-
-                prodotto_ricostruito = Prodotto(
-                    codice=codice,
-                    nome=nome,
-                    prezzo_netto=float(prezzo_netto),
-                    aliquota_iva=float(aliquota_iva),
-                    fornitore=fornitore_obj
-                )
-                
-                prodotti_letti.append(prodotto_ricostruito)
+            fornitori = self._mappa_fornitori()
+            prodotti_letti = [self._riga_a_prodotto(riga, fornitori) for riga in risultati]
 
             print(f"✅ Lettura completata. Trovati {len(prodotti_letti)} prodotti attivi.")
             return prodotti_letti
@@ -120,41 +896,50 @@ class ProdottoDBManager:
             print(f"❌ Errore generico durante la ricostruzione dei prodotti: {e}")
             return []
 
+    @lettura_idempotente
+    def leggi_prodotti_json(self, replica=True):
+        """Restituisce i prodotti attivi come array JSON (testo) serializzato da PostgreSQL, o None in caso di errore.
+
+        Stessi prodotti di leggi_prodotti, ordinati per (nome, codice), con la forma di prodotto_a_dict.
+        Nessun Prodotto viene ricostruito: è il percorso dell'API per l'elenco completo. Chi ha bisogno
+        degli oggetti di dominio continua a usare leggi_prodotti. `replica` come in _connessione.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile leggere i dati.")
+            return None
+
+        try:
+            with self._connessione(replica=replica) as (conn, cursor):
+                self._esegui(conn, cursor, "erp_elenco_prodotti_json")
+                return cursor.fetchone()[0]
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la lettura dei prodotti in JSON: {e}")
+            return None
+
+    @lettura_idempotente
     def leggi_prodotto_per_codice(self, codice):
-        if not self.conn:
+        if not self._connesso():
             return None
-            
-        query = """
-        SELECT 
-            p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
-            f.id, f.nome
-        FROM prodotti p
-        LEFT JOIN fornitori f ON p.id_fornitore = f.id
-        WHERE p.codice = %s AND p.attivo = TRUE;
-        """
+
+        cache = self._cache_utilizzabile()
+        if cache is not None:
+            in_cache = cache.leggi(codice)
+            if in_cache is not MANCANTE:
+                # Copia: chi modifica il prodotto restituito (es. CLI opzione 4) non altera la cache
+                return copy.copy(in_cache)
         
         try:
-            self.cursor.execute(query, (codice,))
-            riga = self.cursor.fetchone()
+            with self._connessione(replica=True) as (conn, cursor):
+                self._esegui(conn, cursor, "erp_prodotto_per_codice", (codice,))
+                riga = cursor.fetchone()
             
-            if riga:
-                codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, attivo, id_fornitore_db, nome_fornitore_db = riga
-                
-                fornitore_obj = None
-                if id_fornitore_db is not None and nome_fornitore_db is not None:
-                    fornitore_obj = Fornitore(id_fornitore=id_fornitore_db, nome=nome_fornitore_db)
-                
-                prodotto_ricostruito = Prodotto(
-                    codice=codice,
-                    nome=nome,
-                    prezzo_netto=float(prezzo_netto), 
-                    aliquota_iva=float(aliquota_iva),
-                    fornitore=fornitore_obj
-                )
-                
-                return prodotto_ricostruito
-            else:
-                return None 
+            prodotto = self._riga_a_prodotto(riga, self._mappa_fornitori()) if riga else None
+
+            if cache is not None:
+                cache.scrivi(codice, prodotto)
+                return copy.copy(prodotto)
+            return prodotto
                 
         except psycopg2.Error as e:
             print(f"❌ Errore DB durante la ricerca: {e}")
@@ -163,21 +948,60 @@ class ProdottoDBManager:
             print(f"❌ Errore generico durante la ricostruzione del prodotto: {e}")
             return None
         
+    @lettura_idempotente
+    def leggi_prodotti_per_codici(self, codici):
+        """Legge molti prodotti per codice con un'unica query (= ANY), invece di una chiamata per codice.
+
+        Restituisce {codice: Prodotto} nell'ordine dei codici richiesti (senza ripetizioni): i codici
+        inesistenti o non attivi valgono None. Con la cache attiva si interrogano solo i codici mancanti
+        e anche le assenze vengono salvate. In caso di errore DB restituisce None.
+        """
+        if not self._connesso():
+            return None
+
+        risultato = dict.fromkeys(codici)
+        da_leggere = list(risultato)
+
+        cache = self._cache_utilizzabile()
+        if cache is not None:
+            da_leggere = []
+            for codice in risultato:
+                in_cache = cache.leggi(codice)
+                if in_cache is MANCANTE:
+                    da_leggere.append(codice)
+                else:
+                    risultato[codice] = copy.copy(in_cache)
+
+        if not da_leggere:
+            return risultato
+
+        try:
+            with self._connessione(replica=True) as (conn, cursor):
+                self._esegui(conn, cursor, "erp_prodotti_per_codici", (da_leggere,))
+                righe = cursor.fetchall()
+
+            fornitori = self._mappa_fornitori()
+            letti = {riga[0]: self._riga_a_prodotto(riga, fornitori) for riga in righe}
+
+            for codice in da_leggere:
+                prodotto = letti.get(codice)
+                if cache is not None:
+                    cache.scrivi(codice, prodotto)
+                    prodotto = copy.copy(prodotto)
+                risultato[codice] = prodotto
+            return risultato
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la lettura per codici: {e}")
+            return None
+        except Exception as e:
+            print(f"❌ Errore generico durante la ricostruzione dei prodotti: {e}")
+            return None
 
     def aggiorna_prodotto(self, prodotto):
-        if not self.conn:
+        if not self._connesso():
             print("❌ Connessione non attiva. Impossibile aggiornare i dati.")
             return False
-
-        query = """
-        UPDATE prodotti
-        SET 
-            nome = %s,
-            prezzo_netto = %s,
-            aliquota_iva = %s,
-            prezzo_lordo = %s
-        WHERE codice = %s;
-        """
         
         valori = (
             prodotto.nome,
@@ -188,74 +1012,267 @@ class ProdottoDBManager:
         )
         
         try:
-            self.cursor.execute(query, valori)
-            righe_aggiornate = self.cursor.rowcount
-            
-            if righe_aggiornate > 0:
-                self.conn.commit()
-                print(f"✅ Aggiornamento completato per il prodotto '{prodotto.codice}'.")
-                return True
-            else:
-                print(f"⚠️ Errore: Prodotto con codice '{prodotto.codice}' non trovato. Nessun aggiornamento.")
-                self.conn.rollback() 
-                return False
+            with self._connessione() as (conn, cursor):
+                self._esegui(conn, cursor, "erp_aggiorna_prodotto", valori)
+                righe_aggiornate = cursor.rowcount
+                
+                if righe_aggiornate > 0:
+                    conn.commit()
+                    self._invalida_cache(prodotto.codice)
+                    print(f"✅ Aggiornamento completato per il prodotto '{prodotto.codice}'.")
+                    return True
+                else:
+                    print(f"⚠️ Errore: Prodotto con codice '{prodotto.codice}' non trovato. Nessun aggiornamento.")
+                    conn.rollback() 
+                    return False
             
         except psycopg2.Error as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore DB durante l'aggiornamento: {e}")
             return False
         
         except Exception as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore generico: {e}")
             return False
 
+    def aggiorna_prezzi_percentuale(self, percentuale, id_fornitore=None):
+        """Applica una variazione percentuale al prezzo netto dei prodotti attivi, in un'unica UPDATE.
+
+        Con `id_fornitore` la variazione riguarda solo i prodotti di quel fornitore. Netto e lordo
+        sono ricalcolati dal DB con ROUND(..., 2), che per importi positivi coincide con il
+        ROUND_HALF_UP di Prodotto. Restituisce il numero di prodotti aggiornati, o None in caso di errore.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile aggiornare i prezzi.")
+            return None
+
+        # Decimal (e non float) perché il calcolo resti in NUMERIC anche lato PostgreSQL
+        fattore = Decimal(1) + Decimal(str(percentuale)) / Decimal(100)
+        if fattore < 0:
+            print(f"❌ Errore: una variazione del {percentuale}% renderebbe negativi i prezzi.")
+            return None
+
+        query = """
+        UPDATE prodotti
+        SET
+            prezzo_netto = ROUND(prezzo_netto * %(fattore)s, 2),
+            prezzo_lordo = ROUND(ROUND(prezzo_netto * %(fattore)s, 2) * (1 + aliquota_iva / 100), 2)
+        WHERE attivo = TRUE
+        """
+        valori = {"fattore": fattore}
+
+        if id_fornitore is not None:
+            query += " AND id_fornitore = %(id_fornitore)s"
+            valori["id_fornitore"] = id_fornitore
+
+        query += " RETURNING codice;"
+
+        try:
+            with self._connessione() as (conn, cursor):
+                cursor.execute(query, valori)
+                codici = [codice for (codice,) in cursor.fetchall()]
+                conn.commit()
+            self._invalida_cache(*codici)
+            print(f"✅ Prezzi aggiornati del {percentuale}% per {len(codici)} prodotti.")
+            return len(codici)
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'aggiornamento dei prezzi: {e}")
+            return None
+
+    def aggiorna_prezzi_per_codice(self, nuovi_netti):
+        """Imposta nuovi prezzi netti da una mappa {codice: nuovo_netto} con un'unica UPDATE ... FROM (VALUES ...).
+
+        I netti sono arrotondati al centesimo come in Prodotto; il lordo è ricalcolato dal DB con l'aliquota
+        di ciascun prodotto. Tutto avviene in una sola transazione. Restituisce (aggiornati, non_trovati),
+        o None in caso di errore o di prezzi non validi.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile aggiornare i prezzi.")
+            return None
+
+        righe = []
+        for codice, nuovo_netto in nuovi_netti.items():
+            netto = Decimal(str(nuovo_netto)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            if netto < 0:
+                print(f"❌ Errore: il prezzo netto (€{netto:.2f}) per '{codice}' non può essere negativo.")
+                return None
+            righe.append((codice, netto))
+
+        if not righe:
+            return 0, []
+
+        query = """
+        UPDATE prodotti p
+        SET
+            prezzo_netto = v.netto,
+            prezzo_lordo = ROUND(v.netto * (1 + p.aliquota_iva / 100), 2)
+        FROM (VALUES %s) AS v(codice, netto)
+        WHERE p.codice = v.codice AND p.attivo = TRUE
+        RETURNING p.codice;
+        """
+
+        try:
+            with self._connessione() as (conn, cursor):
+                risultati = execute_values(
+                    cursor, query, righe, template="(%s, %s::numeric)", page_size=len(righe), fetch=True
+                )
+                conn.commit()
+
+            aggiornati = {codice for (codice,) in risultati}
+            self._invalida_cache(*aggiornati)
+            non_trovati = [codice for codice, _ in righe if codice not in aggiornati]
+            print(f"✅ Prezzi aggiornati per {len(aggiornati)} prodotti ({len(non_trovati)} codici non trovati).")
+            return len(aggiornati), non_trovati
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'aggiornamento dei prezzi: {e}")
+            return None
+
     def elimina_prodotto(self, codice):
-        if not self.conn:
+        """Eliminazione logica: il prodotto resta nel DB con attivo = FALSE e la data di eliminazione.
+
+        Il codice resta riservato finché la riga non viene archiviata (archivia_prodotti_eliminati).
+        """
+        if not self._connesso():
             print("❌ Connessione non attiva. Impossibile eliminare i dati.")
             return False
 
-        query = "DELETE FROM prodotti WHERE codice = %s;"
+        query = """
+        UPDATE prodotti
+        SET attivo = FALSE, eliminato_il = now()
+        WHERE codice = %s AND attivo = TRUE;
+        """
         
         try:
-            self.cursor.execute(query, (codice,))
-            righe_eliminate = self.cursor.rowcount
-            
-            if righe_eliminate > 0:
-                self.conn.commit()
-                print(f"✅ Prodotto con codice '{codice}' eliminato con successo dal DB.")
-                return True
-            else:
-                print(f"⚠️ Errore: Prodotto con codice '{codice}' non trovato. Nessuna eliminazione.")
-                self.conn.rollback() 
-                return False
+            with self._connessione() as (conn, cursor):
+                cursor.execute(query, (codice,))
+                righe_eliminate = cursor.rowcount
+                
+                if righe_eliminate > 0:
+                    conn.commit()
+                    self._invalida_cache(codice)
+                    print(f"✅ Prodotto con codice '{codice}' eliminato con successo (disattivato).")
+                    return True
+                else:
+                    print(f"⚠️ Errore: Prodotto con codice '{codice}' non trovato o già eliminato. Nessuna eliminazione.")
+                    conn.rollback() 
+                    return False
             
         except psycopg2.Error as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore DB durante l'eliminazione: {e}")
             return False
         
         except Exception as e:
-            if self.conn:
-                self.conn.rollback()
             print(f"❌ Errore generico: {e}")
             return False
 
-    def ricerca_prodotti_filtrata(self, nome=None, prezzo_max=None):
-        if not self.conn:
+    def ripristina_prodotto(self, codice):
+        """Annulla l'eliminazione logica di un prodotto non ancora archiviato.
+
+        Se il codice è stato eliminato più volte si ripristina l'eliminazione più recente; non è possibile
+        se nel frattempo è stato inserito un nuovo prodotto attivo con lo stesso codice.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile ripristinare i dati.")
+            return False
+
+        query = """
+        UPDATE prodotti
+        SET attivo = TRUE, eliminato_il = NULL
+        WHERE id = (
+            SELECT id FROM prodotti
+            WHERE codice = %s AND attivo = FALSE
+            ORDER BY eliminato_il DESC NULLS LAST
+            LIMIT 1
+        );
+        """
+
+        try:
+            with self._connessione() as (conn, cursor):
+                cursor.execute(query, (codice,))
+                ripristinati = cursor.rowcount
+                conn.commit()
+
+            if ripristinati > 0:
+                self._invalida_cache(codice)
+                print(f"✅ Prodotto con codice '{codice}' ripristinato.")
+                return True
+            print(f"⚠️ Errore: nessun prodotto eliminato con codice '{codice}'.")
+            return False
+
+        except psycopg2.errors.UniqueViolation:
+            print(f"⚠️ Errore: esiste già un prodotto attivo con codice '{codice}'. Nessun ripristino.")
+            return False
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante il ripristino: {e}")
+            return False
+
+    def archivia_prodotti_eliminati(self, giorni=30, blocco=1000, pausa=0.0, archivia=True, massimo=None):
+        """Sposta in prodotti_archivio (o cancella, con archivia=False) i prodotti eliminati da più di `giorni`.
+
+        Lavora a blocchi di `blocco` righe, ognuno nella propria breve transazione: i lock durano
+        quanto un blocco e le righe già bloccate da altre transazioni vengono saltate (SKIP LOCKED).
+        `pausa` (secondi) lascia respirare il DB tra un blocco e l'altro; `massimo` limita le righe
+        spostate in questa esecuzione. Restituisce il numero di prodotti spostati, o None in caso di errore.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile archiviare i prodotti.")
+            return None
+
+        if blocco < 1:
+            raise ValueError("blocco deve essere almeno 1.")
+
+        query = """
+        WITH da_spostare AS (
+            SELECT id FROM prodotti
+            WHERE NOT attivo AND eliminato_il < now() - %(giorni)s * INTERVAL '1 day'
+            ORDER BY eliminato_il
+            LIMIT %(blocco)s
+            FOR UPDATE SKIP LOCKED
+        ), spostati AS (
+            DELETE FROM prodotti p USING da_spostare d
+            WHERE p.id = d.id
+            RETURNING p.id, p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.id_fornitore, p.eliminato_il
+        )
+        """
+        if archivia:
+            query += """
+        INSERT INTO prodotti_archivio (id, codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore, eliminato_il)
+        SELECT * FROM spostati;
+        """
+        else:
+            query += "SELECT count(*) FROM spostati;"
+
+        totale = 0
+        try:
+            while massimo is None or totale < massimo:
+                dimensione = blocco if massimo is None else min(blocco, massimo - totale)
+                with self._connessione() as (conn, cursor):
+                    cursor.execute(query, {"giorni": giorni, "blocco": dimensione})
+                    spostati = cursor.rowcount if archivia else cursor.fetchone()[0]
+                    conn.commit()
+                totale += spostati
+                if spostati < dimensione:
+                    break
+                if pausa:
+                    time.sleep(pausa)
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'archiviazione (già spostati {totale} prodotti): {e}")
+            return None
+
+        destinazione = "archiviati" if archivia else "cancellati definitivamente"
+        print(f"✅ {totale} prodotti eliminati da più di {giorni} giorni {destinazione}.")
+        return totale
+
+    @lettura_idempotente
+    def ricerca_prodotti_filtrata(self, nome=None, prezzo_max=None, limite=None):
+        if not self._connesso():
             print("❌ Connessione non attiva. Impossibile eseguire la ricerca.")
             return []
 
-        # La query usa la JOIN per poter includere i dati del fornitore nei risultati
-        query = """
-        SELECT 
-            p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
-            f.id, f.nome
-        FROM prodotti p
-        LEFT JOIN fornitori f ON p.id_fornitore = f.id
+        # La query include i dati del fornitore (JOIN, o colonne già presenti nel modello di lettura)
+        query = select_prodotti(self._sorgente) + """
         WHERE p.attivo = TRUE
         """
         
@@ -273,29 +1290,20 @@ class ProdottoDBManager:
         if condizioni:
             query += " AND " + " AND ".join(condizioni)
         
-        query += " ORDER BY p.nome ASC;"
-        
-        prodotti_letti = []
+        # Con l'indice GIN a trigrammi (migrazione 002) anche ILIKE '%termine%' evita la scansione sequenziale
+        query += " ORDER BY p.nome ASC, p.codice ASC"
+
+        if limite is not None:
+            query += " LIMIT %s"
+            valori.append(limite)
         
         try:
-            self.cursor.execute(query, valori)
-            risultati = self.cursor.fetchall()
+            with self._connessione(replica=True) as (conn, cursor):
+                cursor.execute(query, valori)
+                risultati = cursor.fetchall()
             
-            for riga in risultati:
-                codice, nome_db, prezzo_netto, aliquota_iva, prezzo_lordo, attivo, id_fornitore_db, nome_fornitore_db = riga
-
-                fornitore_obj = None
-                if id_fornitore_db is not None and nome_fornitore_db is not None:
-                    fornitore_obj = Fornitore(id_fornitore=id_fornitore_db, nome=nome_fornitore_db)
-
-                prodotto_ricostruito = Prodotto(
-                    codice=codice,
-                    nome=nome_db,
-                    prezzo_netto=float(prezzo_netto),
-                    aliquota_iva=float(aliquota_iva),
-                    fornitore=fornitore_obj
-                )
-                prodotti_letti.append(prodotto_ricostruito)
+            fornitori = self._mappa_fornitori()
+            prodotti_letti = [self._riga_a_prodotto(riga, fornitori) for riga in risultati]
 
             print(f"✅ Ricerca completata. Trovati {len(prodotti_letti)} prodotti corrispondenti.")
             return prodotti_letti
@@ -307,20 +1315,195 @@ class ProdottoDBManager:
             print(f"❌ Errore generico: {e}")
             return []
             
+    @lettura_idempotente
+    def ricerca_prodotti_simili(self, testo, prezzo_max=None, limite=20, soglia=0.3):
+        """Ricerca tollerante agli errori di battitura, ordinata per somiglianza decrescente.
+
+        Usa la word similarity di pg_trgm (operatore <%, servito dall'indice GIN della migrazione 002):
+        `testo` viene confrontato con la parte più simile del nome. `soglia` va da 0 a 1.
+        Restituisce una lista di (Prodotto, punteggio).
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile eseguire la ricerca.")
+            return []
+
+        if not testo or not testo.strip():
+            return []
+
+        query = f"""
+        SELECT 
+            p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
+            {self._sorgente["id_fornitore"]}, {self._sorgente["nome_fornitore"]},
+            word_similarity(%(testo)s, p.nome) AS punteggio
+        FROM {self._sorgente["tabelle"]}
+        WHERE p.attivo = TRUE AND %(testo)s <%% p.nome
+        """
+        valori = {"testo": testo.strip(), "limite": limite}
+
+        if prezzo_max is not None and prezzo_max >= 0:
+            query += " AND p.prezzo_netto <= %(prezzo_max)s"
+            valori["prezzo_max"] = prezzo_max
+
+        query += " ORDER BY punteggio DESC, p.nome ASC LIMIT %(limite)s;"
+
+        try:
+            with self._connessione(replica=True) as (conn, cursor):
+                # Soglia valida solo per questa transazione
+                cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true);", (str(soglia),))
+                cursor.execute(query, valori)
+                risultati = cursor.fetchall()
+                conn.rollback()
+
+            fornitori = self._mappa_fornitori()
+            simili = [(self._riga_a_prodotto(riga[:8], fornitori), float(riga[8])) for riga in risultati]
+
+            print(f"✅ Ricerca per somiglianza completata. Trovati {len(simili)} prodotti.")
+            return simili
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la ricerca per somiglianza: {e}")
+            return []
+
+    def _fornitore_da_riga(self, id_fornitore, nome, fornitori):
+        """Restituisce l'unica istanza di Fornitore per `id_fornitore` presente nella mappa d'identità."""
+        fornitore = fornitori.get(id_fornitore)
+        if fornitore is None:
+            fornitore = fornitori.setdefault(id_fornitore, Fornitore.da_riga_db(id_fornitore, nome))
+        if fornitore.nome != nome:
+            # Con la mappa di sessione il nome può essere cambiato nel frattempo: si aggiorna l'istanza esistente
+            fornitore.nome = nome
+        return fornitore
+
+    def _riga_a_prodotto(self, riga, fornitori):
+        """Ricostruisce un Prodotto (con l'eventuale Fornitore) da una riga della JOIN prodotti/fornitori.
+
+        I prodotti dello stesso fornitore condividono l'istanza presa dalla mappa `fornitori`.
+        """
+        codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, attivo, id_fornitore_db, nome_fornitore_db = riga
+
+        fornitore_obj = None
+        if id_fornitore_db is not None and nome_fornitore_db is not None:
+            fornitore_obj = self._fornitore_da_riga(id_fornitore_db, nome_fornitore_db, fornitori)
+
+        return Prodotto.da_riga_db(codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, fornitore_obj)
+
+    def _query_prodotti_attivi(self, select, nome=None, prezzo_max=None, dopo=None, limite=None, codici=None):
+        """Completa `select` (prodotti con alias p, vedi select_prodotti) con i filtri di itera_prodotti.
+
+        Restituisce (query, valori), con i soli prodotti attivi ordinati per (nome, codice).
+        """
+        condizioni = ["p.attivo = TRUE"]
+        valori = []
+
+        if nome:
+            condizioni.append("p.nome ILIKE %s")
+            valori.append(f"%{nome}%")
+
+        if prezzo_max is not None and prezzo_max >= 0:
+            condizioni.append("p.prezzo_netto <= %s")
+            valori.append(prezzo_max)
+
+        if codici is not None:
+            condizioni.append("p.codice = ANY(%s)")
+            valori.append(list(codici))
+
+        if dopo is not None:
+            # Confronto tra tuple: riprende subito dopo l'ultima coppia (nome, codice) vista
+            condizioni.append("(p.nome, p.codice) > (%s, %s)")
+            valori.extend(dopo)
+
+        query = select + " WHERE " + " AND ".join(condizioni) + " ORDER BY p.nome ASC, p.codice ASC"
+
+        if limite is not None:
+            query += " LIMIT %s"
+            valori.append(limite)
+
+        return query, valori
+
+    @lettura_idempotente
+    def itera_prodotti(self, nome=None, prezzo_max=None, dopo=None, limite=None, itersize=2000, codici=None,
+                       modello_lettura=None, primario=False, solleva=False, replica=True):
+        """Generatore sui prodotti attivi ordinati per (nome, codice), letti da un cursore lato server.
+
+        In memoria restano al più `itersize` righe alla volta. `dopo` è la coppia (nome, codice)
+        dell'ultimo prodotto già ricevuto (paginazione keyset) e `limite` tronca il risultato.
+        `codici` restringe la lettura a un insieme di codici. `modello_lettura=False` legge dalle
+        tabelle anche se il manager usa il modello di lettura (chi deve vedere le ultime scritture);
+        per lo stesso motivo `primario=True` legge dal primario anche se sono configurate repliche
+        (`replica` come in _connessione). Con `solleva=True` gli errori vengono rilanciati invece di interrompere in silenzio la lettura,
+        per chi deve distinguere un risultato incompleto da uno completo (es. l'indice in memoria).
+        La connessione resta impegnata finché il generatore non è esaurito o chiuso.
+        """
+        if not self._connesso():
+            if solleva:
+                raise psycopg2.InterfaceError("Connessione a PostgreSQL non attiva.")
+            print("❌ Connessione non attiva. Impossibile leggere i dati.")
+            return
+
+        sorgente = self._sorgente if modello_lettura is None else (
+            SORGENTE_MODELLO if modello_lettura else SORGENTE_TABELLE
+        )
+        query, valori = self._query_prodotti_attivi(
+            select_prodotti(sorgente), nome=nome, prezzo_max=prezzo_max, dopo=dopo, limite=limite, codici=codici
+        )
+
+        try:
+            with self._connessione(replica=False if primario else replica) as (conn, _):
+                with conn.cursor(name=f"prodotti_{uuid.uuid4().hex}") as cursor:
+                    cursor.itersize = itersize
+                    cursor.execute(query, valori)
+                    fornitori = self._mappa_fornitori()
+                    for riga in cursor:
+                        yield self._riga_a_prodotto(riga, fornitori)
+
+        except psycopg2.Error as e:
+            if solleva:
+                raise
+            print(f"❌ Errore DB durante la lettura in streaming: {e}")
+        except Exception as e:
+            if solleva:
+                raise
+            print(f"❌ Errore generico durante la lettura in streaming: {e}")
+
+    @lettura_idempotente
+    def itera_prodotti_json(self, nome=None, prezzo_max=None, dopo=None, limite=None, itersize=2000, codici=None,
+                            replica=True):
+        """Come itera_prodotti, ma produce per ogni prodotto il suo oggetto JSON (testo) serializzato da PostgreSQL.
+
+        Serve le risposte in streaming, quindi gli errori vengono sempre rilanciati (come itera_prodotti
+        con `solleva=True`): una lettura interrotta non deve sembrare un elenco completo.
+        """
+        if not self._connesso():
+            raise psycopg2.InterfaceError("Connessione a PostgreSQL non attiva.")
+
+        query, valori = self._query_prodotti_attivi(
+            select_prodotti_json(self._sorgente), nome=nome, prezzo_max=prezzo_max, dopo=dopo, limite=limite, codici=codici
+        )
+
+        with self._connessione(replica=replica) as (conn, _):
+            with conn.cursor(name=f"prodotti_json_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize
+                cursor.execute(query, valori)
+                for (testo,) in cursor:
+                    yield testo
+
+    @lettura_idempotente
     def leggi_tutti_i_fornitori(self):
         """Recupera tutti i fornitori dal database."""
-        if not self.conn:
+        if not self._connesso():
             return []
         
         query = "SELECT id, nome FROM fornitori ORDER BY nome ASC;"
         fornitori_letti = []
 
         try:
-            self.cursor.execute(query)
-            risultati = self.cursor.fetchall()
+            with self._connessione(replica=True) as (conn, cursor):
+                cursor.execute(query)
+                risultati = cursor.fetchall()
             
+            fornitori = self._mappa_fornitori()
             for id_db, nome_db in risultati:
-                fornitori_letti.append(Fornitore(id_fornitore=id_db, nome=nome_db))
+                fornitori_letti.append(self._fornitore_da_riga(id_db, nome_db, fornitori))
                 
             return fornitori_letti
             
@@ -329,4 +1512,96 @@ class ProdottoDBManager:
             return []
         except Exception as e:
             print(f"❌ Errore generico: {e}")
-            return []
\ No newline at end of file
+            return []
+    @lettura_idempotente
+    def leggi_versione_catalogo(self, replica=True):
+        """Restituisce (versione, aggiornato_il) del catalogo, o None se non disponibile.
+
+        La riga è mantenuta dai trigger della migrazione 001: è la lettura economica usata
+        dall'API per rispondere 304 senza toccare la tabella prodotti. Con il modello di lettura
+        è la versione fotografata dall'ultimo refresh, cioè quella dei dati effettivamente restituiti.
+        Con le repliche va letta dalla stessa replica dell'elenco (vedi scegli_replica).
+        """
+        if not self._connesso():
+            return None
+
+        tabella = "catalogo_prodotti_stato" if self.modello_lettura else "catalogo_versione"
+
+        try:
+            with self._connessione(replica=replica) as (conn, cursor):
+                cursor.execute(f"SELECT versione, aggiornato_il FROM {tabella};")
+                riga = cursor.fetchone()
+            return (riga[0], riga[1]) if riga else None
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la lettura della versione del catalogo: {e}")
+            return None
+
+    @lettura_idempotente
+    def verifica_database(self):
+        """Esegue SELECT 1 e restituisce il tempo di risposta in millisecondi, o None se il database non risponde.
+
+        È il controllo di prontezza dell'API: con la connessione pigra apre anche la connessione.
+        """
+        if not self._connesso():
+            return None
+
+        try:
+            inizio = time.perf_counter()
+            with self._connessione() as (conn, cursor):
+                cursor.execute("SELECT 1;")
+                cursor.fetchone()
+                conn.rollback()
+            return (time.perf_counter() - inizio) * 1000
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante la verifica della connessione: {e}")
+            return None
+
+    def aggiorna_modello_lettura(self, forza=False):
+        """Aggiorna la vista materializzata catalogo_prodotti con REFRESH ... CONCURRENTLY.
+
+        Le letture dalla vista non vengono bloccate durante l'aggiornamento. Se il catalogo non è cambiato
+        dall'ultimo refresh (stessa versione della migrazione 001) non fa nulla, a meno di `forza`.
+        Restituisce True se la vista è stata aggiornata, False se era già allineata, None in caso di errore.
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile aggiornare il modello di lettura.")
+            return None
+
+        try:
+            with self._connessione() as (conn, cursor):
+                # La versione si legge prima del refresh: quella registrata non supera mai i dati della vista,
+                # così un ETag già visto non può coprire dati più vecchi (al più costa una risposta 200 in più)
+                cursor.execute("""
+                SELECT v.versione, v.aggiornato_il, s.versione
+                FROM catalogo_versione v CROSS JOIN catalogo_prodotti_stato s;
+                """)
+                versione, aggiornato_il, versione_vista = cursor.fetchone()
+                if versione == versione_vista and not forza:
+                    conn.rollback()
+                    return False
+
+                inizio = time.perf_counter()
+                cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY catalogo_prodotti;")
+                # Due refresh concorrenti si mettono in coda: la versione registrata non torna mai indietro
+                cursor.execute("""
+                UPDATE catalogo_prodotti_stato SET versione = %s, aggiornato_il = %s
+                WHERE versione < %s;
+                """, (versione, aggiornato_il, versione))
+                conn.commit()
+
+            print(f"✅ Modello di lettura aggiornato alla versione {versione} in {time.perf_counter() - inizio:.2f}s.")
+            return True
+
+        except psycopg2.Error as e:
+            print(f"❌ Errore DB durante l'aggiornamento del modello di lettura: {e}")
+            return None
+
+# Tempi, righe ed errori per metodo (GET /metrics). Con le metriche disattivate ogni chiamata
+# paga solo il controllo di metriche.attivo.
+metriche.strumenta(
+    ProdottoDBManager,
+    escludi=("connetti", "disconnetti", "svuota_mappa_fornitori", "statistiche_cache", "statistiche_pool",
+             "statistiche_repliche", "verifica_database")
+)
@@ -0,0 +1,306 @@
+import asyncio
+from decimal import Decimal
+import asyncpg
+from classe import Prodotto, Fornitore
+from db_manager import (
+    DB_CONFIG, SORGENTE_MODELLO, SORGENTE_TABELLE, istruzioni_per_sorgente, select_prodotti, select_prodotti_json,
+    segnaposto_numerati
+)
+
+
+def _decimale(valore):
+    # asyncpg converte i float in NUMERIC con tutte le cifre binarie (10.1 -> 10.0999...): si passa dal testo
+    return None if valore is None else Decimal(str(valore))
+
+
+class ProdottoDBManagerAsync:
+    """Controparte asyncio di ProdottoDBManager, basata su asyncpg e sul suo pool di connessioni.
+
+    Espone le stesse operazioni come coroutine, con gli stessi valori di ritorno in caso di errore
+    (None, False o liste vuote). Ogni chiamata preleva una connessione dal pool solo per la durata
+    della query: un solo processo può servire centinaia di richieste concorrenti con pochi collegamenti.
+    asyncpg prepara e tiene in cache le istruzioni per connessione, come fa il manager sincrono con PREPARE.
+    """
+
+    def __init__(self, pool_min=1, pool_max=10, pool_timeout=5.0, modello_lettura=False):
+        self.pool = None
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.pool_timeout = pool_timeout
+        # Come nel manager sincrono: letture dalla vista materializzata catalogo_prodotti (migrazione 005)
+        self.modello_lettura = modello_lettura
+        self._sorgente = SORGENTE_MODELLO if modello_lettura else SORGENTE_TABELLE
+        # Stesse query del manager sincrono, con i parametri posizionali ($1, $2, ...) richiesti da asyncpg
+        self._query = {
+            nome: segnaposto_numerati(query) for nome, (_, query) in istruzioni_per_sorgente(self._sorgente).items()
+        }
+
+    async def connetti(self):
+        try:
+            self.pool = await asyncpg.create_pool(
+                min_size=min(self.pool_min, self.pool_max), max_size=self.pool_max, **DB_CONFIG
+            )
+            print(f"✅ Pool asyncio di connessioni PostgreSQL pronto (min {self.pool_min}, max {self.pool_max}).")
+            return True
+        except (asyncpg.PostgresError, OSError) as e:
+            print(f"❌ Errore durante la connessione a PostgreSQL: {e}")
+            return False
+
+    async def disconnetti(self):
+        if self.pool is not None and not self.pool.is_closing():
+            await self.pool.close()
+            print("✅ Pool asyncio di connessioni PostgreSQL chiuso.")
+
+    def _connesso(self):
+        return self.pool is not None and not self.pool.is_closing()
+
+    def _connessione(self):
+        # Oltre pool_timeout secondi di attesa per una connessione libera la richiesta fallisce
+        return self.pool.acquire(timeout=self.pool_timeout)
+
+    def statistiche_pool(self):
+        """Restituisce le statistiche del pool, o None se non è connesso."""
+        if not self._connesso():
+            return None
+        return {
+            "min": self.pool.get_min_size(),
+            "max": self.pool.get_max_size(),
+            "timeout_s": self.pool_timeout,
+            "aperte": self.pool.get_size(),
+            "libere": self.pool.get_idle_size(),
+        }
+
+    def _riga_a_prodotto(self, riga, fornitori):
+        """Come ProdottoDBManager._riga_a_prodotto: i prodotti dello stesso fornitore ne condividono l'istanza."""
+        codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, attivo, id_fornitore_db, nome_fornitore_db = riga
+
+        fornitore_obj = None
+        if id_fornitore_db is not None and nome_fornitore_db is not None:
+            fornitore_obj = fornitori.get(id_fornitore_db)
+            if fornitore_obj is None:
+                fornitore_obj = fornitori[id_fornitore_db] = Fornitore.da_riga_db(id_fornitore_db, nome_fornitore_db)
+
+        return Prodotto.da_riga_db(codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, fornitore_obj)
+
+    def _valori_inserimento(self, prodotto):
+        return (
+            prodotto.codice,
+            prodotto.nome,
+            _decimale(prodotto.prezzo_netto),
+            _decimale(prodotto.aliquota_iva),
+            _decimale(prodotto.prezzo_lordo),
+            prodotto.fornitore.id_fornitore if prodotto.fornitore else None
+        )
+
+    async def inserisci_prodotto(self, prodotto):
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile inserire i dati.")
+            return None
+
+        try:
+            async with self._connessione() as conn:
+                nuovo_id = await conn.fetchval(self._query["erp_inserisci_prodotto"], *self._valori_inserimento(prodotto))
+            print(f"✅ Prodotto '{prodotto.nome}' inserito con successo! ID DB: {nuovo_id}")
+            return nuovo_id
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante l'inserimento: {e}")
+            return None
+
+    async def leggi_prodotti(self):
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile leggere i dati.")
+            return []
+
+        try:
+            async with self._connessione() as conn:
+                risultati = await conn.fetch(self._query["erp_elenco_prodotti"])
+
+            fornitori = {}
+            prodotti_letti = [self._riga_a_prodotto(riga, fornitori) for riga in risultati]
+            print(f"✅ Lettura completata. Trovati {len(prodotti_letti)} prodotti attivi.")
+            return prodotti_letti
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la lettura dei prodotti: {e}")
+            return []
+
+    async def leggi_prodotti_json(self):
+        """Come ProdottoDBManager.leggi_prodotti_json: l'array JSON (testo) dei prodotti attivi, o None in caso di errore."""
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile leggere i dati.")
+            return None
+
+        try:
+            async with self._connessione() as conn:
+                return await conn.fetchval(self._query["erp_elenco_prodotti_json"])
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la lettura dei prodotti in JSON: {e}")
+            return None
+
+    async def leggi_prodotto_per_codice(self, codice):
+        if not self._connesso():
+            return None
+
+        try:
+            async with self._connessione() as conn:
+                riga = await conn.fetchrow(self._query["erp_prodotto_per_codice"], codice)
+            return self._riga_a_prodotto(riga, {}) if riga else None
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la ricerca: {e}")
+            return None
+
+    async def aggiorna_prodotto(self, prodotto):
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile aggiornare i dati.")
+            return False
+
+        valori = (
+            prodotto.nome,
+            _decimale(prodotto.prezzo_netto),
+            _decimale(prodotto.aliquota_iva),
+            _decimale(prodotto.prezzo_lordo),
+            prodotto.codice
+        )
+
+        try:
+            async with self._connessione() as conn:
+                esito = await conn.execute(self._query["erp_aggiorna_prodotto"], *valori)
+
+            # asyncpg restituisce il tag di comando, es. "UPDATE 1"
+            if int(esito.split()[-1]) > 0:
+                print(f"✅ Aggiornamento completato per il prodotto '{prodotto.codice}'.")
+                return True
+            print(f"⚠️ Errore: Prodotto con codice '{prodotto.codice}' non trovato. Nessun aggiornamento.")
+            return False
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante l'aggiornamento: {e}")
+            return False
+
+    def _query_filtrata(self, nome=None, prezzo_max=None, dopo=None, limite=None, codici=None, select=None):
+        """Stessi filtri e stesso ordinamento (nome, codice) di ProdottoDBManager.itera_prodotti."""
+        condizioni = []
+        valori = []
+
+        if nome:
+            valori.append(f"%{nome}%")
+            condizioni.append(f"p.nome ILIKE ${len(valori)}")
+
+        if prezzo_max is not None and prezzo_max >= 0:
+            valori.append(_decimale(prezzo_max))
+            condizioni.append(f"p.prezzo_netto <= ${len(valori)}")
+
+        if codici is not None:
+            valori.append(list(codici))
+            condizioni.append(f"p.codice = ANY(${len(valori)})")
+
+        if dopo is not None:
+            valori.extend(dopo)
+            condizioni.append(f"(p.nome, p.codice) > (${len(valori) - 1}, ${len(valori)})")
+
+        query = (select or select_prodotti(self._sorgente)) + " WHERE p.attivo = TRUE"
+        if condizioni:
+            query += " AND " + " AND ".join(condizioni)
+        query += " ORDER BY p.nome ASC, p.codice ASC"
+
+        if limite is not None:
+            valori.append(limite)
+            query += f" LIMIT ${len(valori)}"
+
+        return query, valori
+
+    async def ricerca_prodotti_filtrata(self, nome=None, prezzo_max=None, limite=None):
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile eseguire la ricerca.")
+            return []
+
+        query, valori = self._query_filtrata(nome=nome, prezzo_max=prezzo_max, limite=limite)
+
+        try:
+            async with self._connessione() as conn:
+                risultati = await conn.fetch(query, *valori)
+
+            fornitori = {}
+            prodotti_letti = [self._riga_a_prodotto(riga, fornitori) for riga in risultati]
+            print(f"✅ Ricerca completata. Trovati {len(prodotti_letti)} prodotti corrispondenti.")
+            return prodotti_letti
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la ricerca filtrata: {e}")
+            return []
+
+    async def leggi_pagina(self, dopo=None, limite=100):
+        """Una pagina keyset dei prodotti attivi, ordinata per (nome, codice), letta con una sola query."""
+        if not self._connesso():
+            return []
+
+        query, valori = self._query_filtrata(dopo=dopo, limite=limite)
+
+        try:
+            async with self._connessione() as conn:
+                risultati = await conn.fetch(query, *valori)
+            fornitori = {}
+            return [self._riga_a_prodotto(riga, fornitori) for riga in risultati]
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la lettura della pagina: {e}")
+            return []
+
+    async def itera_prodotti(self, nome=None, prezzo_max=None, dopo=None, limite=None, itersize=2000):
+        """Generatore asincrono sui prodotti attivi, letti da un cursore lato server `itersize` righe alla volta.
+
+        La connessione resta impegnata finché il generatore non è esaurito o chiuso (aclose).
+        """
+        if not self._connesso():
+            print("❌ Connessione non attiva. Impossibile leggere i dati.")
+            return
+
+        query, valori = self._query_filtrata(nome=nome, prezzo_max=prezzo_max, dopo=dopo, limite=limite)
+
+        try:
+            async with self._connessione() as conn:
+                # I cursori di asyncpg richiedono una transazione aperta
+                async with conn.transaction(readonly=True):
+                    fornitori = {}
+                    async for riga in conn.cursor(query, *valori, prefetch=itersize):
+                        yield self._riga_a_prodotto(riga, fornitori)
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la lettura in streaming: {e}")
+
+    async def itera_prodotti_json(self, nome=None, prezzo_max=None, dopo=None, limite=None, itersize=2000):
+        """Come itera_prodotti, ma produce per ogni prodotto il suo oggetto JSON (testo) serializzato da PostgreSQL.
+
+        Serve le risposte in streaming, quindi gli errori vengono rilanciati: una lettura interrotta
+        non deve sembrare un elenco completo.
+        """
+        if not self._connesso():
+            raise asyncpg.InterfaceError("Connessione a PostgreSQL non attiva.")
+
+        query, valori = self._query_filtrata(
+            nome=nome, prezzo_max=prezzo_max, dopo=dopo, limite=limite, select=select_prodotti_json(self._sorgente)
+        )
+
+        async with self._connessione() as conn:
+            async with conn.transaction(readonly=True):
+                async for riga in conn.cursor(query, *valori, prefetch=itersize):
+                    yield riga[0]
+
+    async def leggi_versione_catalogo(self):
+        """Restituisce (versione, aggiornato_il) del catalogo, o None se non disponibile."""
+        if not self._connesso():
+            return None
+
+        try:
+            async with self._connessione() as conn:
+                # Con il modello di lettura vale la versione dell'ultimo refresh (vedi ProdottoDBManager)
+                tabella = "catalogo_prodotti_stato" if self.modello_lettura else "catalogo_versione"
+                riga = await conn.fetchrow(f"SELECT versione, aggiornato_il FROM {tabella};")
+            return (riga[0], riga[1]) if riga else None
+
+        except (asyncpg.PostgresError, asyncio.TimeoutError) as e:
+            print(f"❌ Errore DB durante la lettura della versione del catalogo: {e}")
+            return None
@@ -0,0 +1,312 @@
+# esercizi/esercizio2/esporta_catalogo.py
+#
+# Esportazione dei prodotti attivi con COPY ... TO STDOUT: CSV con delimitatore ';' (lo stesso dialetto
+# di esercizio1 e di importa_catalogo.py) oppure, con pyarrow installato, Parquet o Arrow IPC per l'analisi.
+# PostgreSQL produce il CSV e i dati passano a blocchi: la memoria usata non dipende dalla dimensione
+# del catalogo. Le stesse funzioni servono GET /api/v1/prodotti/export in app.py.
+#
+#   python esercizio2/esporta_catalogo.py catalogo.csv [--formato csv|parquet|arrow]
+#
+# Senza --formato il formato si ricava dall'estensione (.parquet, .arrow/.arrows, altrimenti CSV).
+# Con '-' come destinazione il CSV va sullo standard output.
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_manager import ProdottoDBManager, COLONNE_ESPORTAZIONE
+
+# formato -> (mimetype, estensione del file)
+FORMATI = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+FORMATI_COLONNARI = ("parquet", "arrow")
+# pyarrow si importa solo quando serve un formato colonnare: app.py importa questo modulo all'avvio
+# e l'import di pyarrow ne raddoppierebbe il tempo anche per chi esporta solo CSV
+PYARROW_DISPONIBILE = importlib.util.find_spec("pyarrow") is not None
+
+# COPY scrive una riga alla volta: le righe vengono raggruppate in blocchi di circa BYTE_PER_BLOCCO,
+# e al più BLOCCHI_IN_CODA blocchi aspettano il consumatore (oltre, COPY si ferma finché non legge)
+BYTE_PER_BLOCCO = 1 << 20
+BLOCCHI_IN_CODA = 8
+# CSV letto da pyarrow per ogni batch colonnare (un row group Parquet per batch)
+BYTE_PER_BATCH = 8 << 20
+
+_FINE = object()
+
+
+class ErroreEsportazione(Exception):
+    """L'esportazione si è interrotta per un errore DB: i dati già inviati sono incompleti."""
+
+
+class _EsportazioneAnnullata(Exception):
+    """Il consumatore ha smesso di leggere (es. client HTTP disconnesso): COPY viene interrotto."""
+
+
+class _ScrittoreCoda:
+    """Destinazione di COPY TO che raggruppa le righe in blocchi e li passa al consumatore tramite la coda."""
+
+    def __init__(self, coda, annullata):
+        self._coda = coda
+        self._annullata = annullata
+        self._parti = []
+        self._dimensione = 0
+
+    def write(self, dati):
+        self._parti.append(dati)
+        self._dimensione += len(dati)
+        if self._dimensione >= BYTE_PER_BLOCCO:
+            self.svuota()
+
+    def svuota(self):
+        if self._parti:
+            self.metti(b"".join(self._parti))
+            self._parti = []
+            self._dimensione = 0
+
+    def metti(self, elemento):
+        # Attesa a intervalli: se il consumatore non legge più, il thread di COPY non resta bloccato
+        while not self._annullata.is_set():
+            try:
+                self._coda.put(elemento, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _EsportazioneAnnullata()
+
+
+def itera_csv(db_manager, intestazione=True):
+    """Generatore sui blocchi (bytes) del CSV di esporta_prodotti_copy.
+
+    COPY gira in un thread separato e si ferma quando la coda è piena, quindi in memoria restano al più
+    BLOCCHI_IN_CODA blocchi. Se il generatore viene chiuso prima della fine COPY viene interrotto.
+    Solleva ErroreEsportazione se l'esportazione fallisce a metà.
+    """
+    coda = queue.Queue(maxsize=BLOCCHI_IN_CODA)
+    annullata = threading.Event()
+    scrittore = _ScrittoreCoda(coda, annullata)
+    esito = {}
+
+    def esporta():
+        try:
+            esito["righe"] = db_manager.esporta_prodotti_copy(scrittore, intestazione=intestazione)
+            scrittore.svuota()
+            scrittore.metti(_FINE)
+        except _EsportazioneAnnullata:
+            pass
+
+    thread = threading.Thread(target=esporta, name="esportazione-copy", daemon=True)
+    thread.start()
+    try:
+        while True:
+            blocco = coda.get()
+            if blocco is _FINE:
+                break
+            yield blocco
+        if esito.get("righe") is None:
+            raise ErroreEsportazione("COPY interrotto da un errore DB: esportazione incompleta.")
+    finally:
+        annullata.set()
+        thread.join()
+
+
+class _LettoreBlocchi(io.RawIOBase):
+    """Flusso in lettura sopra un iterabile di blocchi bytes, per il lettore CSV di pyarrow."""
+
+    def __init__(self, blocchi):
+        self._blocchi = iter(blocchi)
+        self._resto = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._resto:
+            self._resto = next(self._blocchi, b"")
+            if not self._resto:
+                return 0
+        letti = min(len(buffer), len(self._resto))
+        buffer[:letti] = self._resto[:letti]
+        self._resto = self._resto[letti:]
+        return letti
+
+    def close(self):
+        chiudi = getattr(self._blocchi, "close", None)
+        if chiudi is not None:
+            chiudi()
+        super().close()
+
+
+class _UscitaBlocchi:
+    """Destinazione per gli scrittori pyarrow che trattiene i byte scritti finché non vengono ritirati."""
+
+    def __init__(self):
+        self._parti = []
+        self._posizione = 0
+        self.closed = False
+
+    def write(self, dati):
+        self._parti.append(bytes(dati))
+        self._posizione += len(dati)
+        return len(dati)
+
+    def tell(self):
+        return self._posizione
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def ritira(self):
+        dati = b"".join(self._parti)
+        self._parti = []
+        return dati
+
+
+def schema_colonnare():
+    """Schema Arrow delle COLONNE_ESPORTAZIONE: i prezzi restano decimali a due cifre, come nel database."""
+    import pyarrow as pa
+
+    tipi = {
+        "codice": pa.string(),
+        "nome": pa.string(),
+        "prezzo_netto": pa.decimal128(12, 2),
+        "aliquota_iva": pa.decimal128(5, 2),
+        "prezzo_lordo": pa.decimal128(12, 2),
+        "id_fornitore": pa.int32(),
+        "fornitore": pa.string(),
+    }
+    return pa.schema([(colonna, tipi[colonna]) for colonna in COLONNE_ESPORTAZIONE])
+
+
+def itera_batch(db_manager):
+    """Generatore sui RecordBatch Arrow del catalogo, convertiti a blocchi dal CSV di COPY."""
+    import pyarrow.csv as pa_csv
+
+    schema = schema_colonnare()
+    with _LettoreBlocchi(itera_csv(db_manager)) as flusso:
+        lettore = pa_csv.open_csv(
+            flusso,
+            read_options=pa_csv.ReadOptions(block_size=BYTE_PER_BATCH),
+            parse_options=pa_csv.ParseOptions(delimiter=";"),
+            # Il fornitore mancante arriva da COPY come campo vuoto: diventa null
+            convert_options=pa_csv.ConvertOptions(column_types=schema, strings_can_be_null=True),
+        )
+        for batch in lettore:
+            yield batch
+
+
+def _scrittore_colonnare(destinazione, formato, schema):
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(destinazione, schema)
+    import pyarrow.ipc as pa_ipc
+    return pa_ipc.new_stream(destinazione, schema)
+
+
+def itera_colonnare(db_manager, formato):
+    """Generatore sui blocchi (bytes) del file Parquet o del flusso Arrow IPC, scritti un batch alla volta."""
+    uscita = _UscitaBlocchi()
+    scrittore = _scrittore_colonnare(uscita, formato, schema_colonnare())
+    for batch in itera_batch(db_manager):
+        scrittore.write_batch(batch)
+        dati = uscita.ritira()
+        if dati:
+            yield dati
+    # Parquet scrive qui il footer con i metadati dei row group
+    scrittore.close()
+    yield uscita.ritira()
+
+
+def formato_da_estensione(percorso):
+    estensione = os.path.splitext(percorso)[1].lower()
+    if estensione == ".parquet":
+        return "parquet"
+    if estensione in (".arrow", ".arrows"):
+        return "arrow"
+    return "csv"
+
+
+def esporta(db_manager, destinazione, formato):
+    """Scrive l'esportazione in `destinazione` (percorso; solo per il CSV anche '-' per lo standard output
+    o un file binario già aperto).
+
+    Restituisce il numero di prodotti esportati, o None in caso di errore.
+    """
+    if formato == "csv":
+        if destinazione == "-":
+            destinazione = sys.stdout.buffer
+        if not isinstance(destinazione, str):
+            return db_manager.esporta_prodotti_copy(destinazione)
+        with open(destinazione, "wb") as file_csv:
+            return db_manager.esporta_prodotti_copy(file_csv)
+
+    esportati = 0
+    scrittore = _scrittore_colonnare(destinazione, formato, schema_colonnare())
+    try:
+        for batch in itera_batch(db_manager):
+            scrittore.write_batch(batch)
+            esportati += batch.num_rows
+    except ErroreEsportazione as e:
+        print(f"❌ {e}")
+        return None
+    finally:
+        scrittore.close()
+    return esportati
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Esporta il catalogo dei prodotti attivi.")
+    parser.add_argument("destinazione", help="file di destinazione ('-' per il CSV sullo standard output)")
+    parser.add_argument("--formato", choices=sorted(FORMATI), default=None,
+                        help="formato di uscita (default: dall'estensione, altrimenti csv)")
+    argomenti = parser.parse_args(argv)
+
+    formato = argomenti.formato or formato_da_estensione(argomenti.destinazione)
+    if formato in FORMATI_COLONNARI and not PYARROW_DISPONIBILE:
+        print(f"❌ Il formato {formato} richiede pyarrow (pip install pyarrow).")
+        return 1
+    if formato != "csv" and argomenti.destinazione == "-":
+        print("❌ Lo standard output è supportato solo per il CSV.")
+        return 1
+
+    destinazione = argomenti.destinazione
+    messaggi = contextlib.nullcontext()
+    if destinazione == "-":
+        # Lo standard output porta il CSV: i messaggi del manager vanno sullo standard error
+        destinazione = sys.stdout.buffer
+        messaggi = contextlib.redirect_stdout(sys.stderr)
+
+    with messaggi:
+        db_manager = ProdottoDBManager()
+        if not db_manager.connetti():
+            return 1
+
+        try:
+            inizio = time.perf_counter()
+            esportati = esporta(db_manager, destinazione, formato)
+            if esportati is None:
+                return 1
+            if argomenti.destinazione != "-":
+                dimensione = os.path.getsize(argomenti.destinazione) / 1e6
+                print(f"✅ Esportati {esportati} prodotti in {argomenti.destinazione} "
+                      f"({formato}, {dimensione:.1f} MB) in {time.perf_counter() - inizio:.2f}s.")
+            return 0
+        finally:
+            db_manager.disconnetti()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
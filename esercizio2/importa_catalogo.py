@@ -0,0 +1,254 @@
+# esercizi/esercizio2/importa_catalogo.py
+#
+# Importazione di un listino fornitore (CSV con delimitatore ';', lo stesso dialetto di esercizio1)
+# nella tabella prodotti. Il file viene letto a blocchi, le righe sono validate con le regole di
+# Prodotto da un pool di processi e i blocchi validi arrivano al database tramite COPY.
+# Le righe scartate finiscono in un report CSV con numero di riga e motivo.
+#
+#   python esercizio2/importa_catalogo.py listino.csv --fornitore "Acme" [--crea-fornitori] [--aggiorna]
+#
+# Colonne riconosciute nell'intestazione (maiuscole e spazi non contano, le altre sono ignorate):
+#   codice, nome | nome prodotto, prezzo netto | prezzo base,
+#   aliquota iva (percentuale, es. 22) | aliquota (frazione come in esercizio1, es. 0.22), fornitore
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+ALIAS_COLONNE = {
+    "codice": "codice",
+    "codice_prodotto": "codice",
+    "nome": "nome",
+    "nome_prodotto": "nome",
+    "prezzo_netto": "prezzo_netto",
+    "prezzo_base": "prezzo_netto",
+    "aliquota_iva": "aliquota_iva",
+    "aliquota": "aliquota_frazione",
+    "fornitore": "fornitore",
+    "nome_fornitore": "fornitore",
+}
+
+RIGHE_PER_BLOCCO = 20_000
+
+
+def mappa_intestazione(intestazione):
+    """Restituisce {campo: indice di colonna} a partire dalla riga di intestazione."""
+    colonne = {}
+    for indice, nome in enumerate(intestazione):
+        campo = ALIAS_COLONNE.get(nome.strip().lower().replace(" ", "_"))
+        if campo and campo not in colonne:
+            colonne[campo] = indice
+
+    mancanti = {"codice", "nome", "prezzo_netto"} - colonne.keys()
+    if mancanti:
+        raise ValueError(f"Colonne obbligatorie mancanti nell'intestazione: {', '.join(sorted(mancanti))}.")
+    return colonne
+
+
+def _numero(testo):
+    return float(testo.strip().replace(",", "."))
+
+
+def valida_blocco(righe, colonne, fornitore_predefinito):
+    """Valida un blocco di righe (numero_riga, valori) con le regole di Prodotto.
+
+    Eseguita nei processi del pool. Restituisce (valide, errori): le valide sono tuple
+    (numero_riga, codice, nome, netto, aliquota, lordo, nome_fornitore) già normalizzate,
+    gli errori tuple (numero_riga, messaggio, valori).
+    """
+    valide = []
+    errori = []
+
+    for numero, valori in righe:
+        try:
+            if len(valori) <= max(colonne.values()):
+                raise ValueError(f"Attese almeno {max(colonne.values()) + 1} colonne, trovate {len(valori)}.")
+
+            if "aliquota_iva" in colonne and valori[colonne["aliquota_iva"]].strip():
+                aliquota = _numero(valori[colonne["aliquota_iva"]])
+            elif "aliquota_frazione" in colonne and valori[colonne["aliquota_frazione"]].strip():
+                aliquota = _numero(valori[colonne["aliquota_frazione"]]) * 100
+            else:
+                aliquota = 22.0
+
+            prodotto = Prodotto(
+                codice=valori[colonne["codice"]],
+                nome=valori[colonne["nome"]],
+                prezzo_netto=_numero(valori[colonne["prezzo_netto"]]),
+                aliquota_iva=round(aliquota, 2)
+            )
+
+            nome_fornitore = fornitore_predefinito
+            if "fornitore" in colonne and valori[colonne["fornitore"]].strip():
+                nome_fornitore = valori[colonne["fornitore"]].strip()
+
+            valide.append((
+                numero,
+                prodotto.codice,
+                prodotto.nome,
+                f"{prodotto.prezzo_netto:.2f}",
+                f"{prodotto.aliquota_iva:.2f}",
+                f"{prodotto.prezzo_lordo:.2f}",
+                nome_fornitore
+            ))
+
+        except (ValueError, TypeError, ArithmeticError) as e:
+            errori.append((numero, str(e), valori))
+
+    return valide, errori
+
+
+def leggi_blocchi(lettore, dimensione_blocco):
+    """Generatore sui blocchi di righe (numero_riga, valori) di un csv.reader già posizionato dopo l'intestazione."""
+    righe = ((lettore.line_num, valori) for valori in lettore if valori)
+    while True:
+        blocco = list(islice(righe, dimensione_blocco))
+        if not blocco:
+            return
+        yield blocco
+
+
+class ImportatoreCatalogo:
+    def __init__(self, db_manager, file_scarti, crea_fornitori=False, aggiorna=False):
+        self.db_manager = db_manager
+        self.crea_fornitori = crea_fornitori
+        self.aggiorna = aggiorna
+        self.fornitori = {}
+        self.scrittore_scarti = csv.writer(file_scarti, delimiter=";")
+        self.scrittore_scarti.writerow(["Riga", "Errore", "Contenuto"])
+        self.lette = 0
+        self.importate = 0
+        self.scartate = 0
+
+    def scarta(self, numero, errore, valori):
+        self.scrittore_scarti.writerow([numero, errore, ";".join(valori)])
+        self.scartate += 1
+
+    def _id_fornitori(self, nomi):
+        """Risolve i nomi dei fornitori in id, interrogando il DB solo per quelli non ancora in cache."""
+        mancanti = {nome for nome in nomi if nome is not None and nome not in self.fornitori}
+        if mancanti:
+            trovati = self.db_manager.risolvi_fornitori(mancanti, crea=self.crea_fornitori)
+            for nome in mancanti:
+                # Anche i nomi sconosciuti vanno in cache (come None), per non richiederli a ogni blocco
+                self.fornitori[nome] = trovati.get(nome)
+        return self.fornitori
+
+    def carica(self, righe_blocco, valide, errori):
+        self.lette += len(righe_blocco)
+        for numero, messaggio, valori in errori:
+            self.scarta(numero, messaggio, valori)
+
+        id_fornitori = self._id_fornitori(riga[6] for riga in valide)
+        originali = dict(righe_blocco)
+
+        da_copiare = []
+        for numero, codice, nome, netto, aliquota, lordo, nome_fornitore in valide:
+            id_fornitore = None
+            if nome_fornitore is not None:
+                id_fornitore = id_fornitori.get(nome_fornitore)
+                if id_fornitore is None:
+                    self.scarta(numero, f"Fornitore '{nome_fornitore}' non trovato.", originali[numero])
+                    continue
+            da_copiare.append((numero, codice, nome, netto, aliquota, lordo, id_fornitore))
+
+        if not da_copiare:
+            return
+
+        esito = self.db_manager.importa_prodotti_copy(da_copiare, aggiorna=self.aggiorna)
+        if esito is None:
+            for riga in da_copiare:
+                self.scarta(riga[0], "Blocco annullato da un errore del database.", originali[riga[0]])
+            return
+
+        inseriti, scartati = esito
+        for numero, codice, errore in scartati:
+            self.scarta(numero, errore, originali[numero])
+        self.importate += len(da_copiare) - len(scartati)
+
+
+def importa_catalogo(percorso, db_manager, percorso_scarti, fornitore=None, crea_fornitori=False,
+                     aggiorna=False, processi=None, dimensione_blocco=RIGHE_PER_BLOCCO):
+    processi = processi or os.cpu_count() or 1
+
+    with open(percorso, newline="", encoding="utf-8") as file_csv, \
+            open(percorso_scarti, "w", newline="", encoding="utf-8") as file_scarti:
+        lettore = csv.reader(file_csv, delimiter=";")
+        colonne = mappa_intestazione(next(lettore, []))
+        importatore = ImportatoreCatalogo(db_manager, file_scarti, crea_fornitori, aggiorna)
+        blocchi = leggi_blocchi(lettore, dimensione_blocco)
+
+        if processi <= 1:
+            for blocco in blocchi:
+                importatore.carica(blocco, *valida_blocco(blocco, colonne, fornitore))
+            return importatore
+
+        # Al più due blocchi in volo per processo: la memoria resta limitata anche su file enormi,
+        # e mentre il processo principale esegue il COPY i worker validano i blocchi successivi
+        with ProcessPoolExecutor(max_workers=processi) as esecutore:
+            in_volo = deque()
+            for blocco in blocchi:
+                in_volo.append((blocco, esecutore.submit(valida_blocco, blocco, colonne, fornitore)))
+                if len(in_volo) >= processi * 2:
+                    blocco_pronto, futuro = in_volo.popleft()
+                    importatore.carica(blocco_pronto, *futuro.result())
+            while in_volo:
+                blocco_pronto, futuro = in_volo.popleft()
+                importatore.carica(blocco_pronto, *futuro.result())
+
+        return importatore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa un listino CSV (';') nella tabella prodotti.")
+    parser.add_argument("file", help="listino CSV con intestazione")
+    parser.add_argument("--fornitore", help="nome del fornitore per le righe senza colonna fornitore")
+    parser.add_argument("--crea-fornitori", action="store_true", help="crea i fornitori non ancora presenti")
+    parser.add_argument("--aggiorna", action="store_true", help="aggiorna i codici già presenti invece di scartarli")
+    parser.add_argument("--processi", type=int, default=None, help="processi di validazione (default: numero di CPU)")
+    parser.add_argument("--blocco", type=int, default=RIGHE_PER_BLOCCO, help="righe per blocco")
+    parser.add_argument("--scarti", help="file CSV delle righe scartate (default: <file>.scarti.csv)")
+    argomenti = parser.parse_args(argv)
+
+    percorso_scarti = argomenti.scarti or os.path.splitext(argomenti.file)[0] + ".scarti.csv"
+
+    db_manager = ProdottoDBManager()
+    if not db_manager.connetti():
+        return 1
+
+    try:
+        inizio = time.perf_counter()
+        esito = importa_catalogo(
+            argomenti.file, db_manager, percorso_scarti,
+            fornitore=argomenti.fornitore,
+            crea_fornitori=argomenti.crea_fornitori,
+            aggiorna=argomenti.aggiorna,
+            processi=argomenti.processi,
+            dimensione_blocco=argomenti.blocco
+        )
+        secondi = time.perf_counter() - inizio
+    except (OSError, ValueError) as e:
+        print(f"❌ Importazione interrotta: {e}")
+        return 1
+    finally:
+        db_manager.disconnetti()
+
+    print(f"✅ Importazione completata in {secondi:.1f}s: {esito.lette} righe lette, "
+          f"{esito.importate} importate, {esito.scartate} scartate ({esito.lette / max(secondi, 1e-9):,.0f} righe/s).")
+    if esito.scartate:
+        print(f"⚠️ Righe scartate salvate in: {percorso_scarti}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
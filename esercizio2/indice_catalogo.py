@@ -0,0 +1,251 @@
+import bisect
+import json
+import re
+import select
+import threading
+import psycopg2
+from db_manager import DB_CONFIG
+
+# Oltre questo numero di codici in attesa conviene ricaricare tutto invece di rileggerli uno per uno
+SOGLIA_RICARICA = 10_000
+
+_SEPARATORI = re.compile(r"\W+")
+
+
+def _token(testo):
+    return [t for t in _SEPARATORI.split(testo.lower()) if t]
+
+
+class IndiceCatalogo:
+    """Indice in memoria dei prodotti attivi per ricerche per nome e prezzo massimo senza round trip al DB.
+
+    Contiene un indice invertito sui token del nome e un array di prezzi ordinato per i tagli di prezzo.
+    Si carica una volta dalle tabelle del primario e resta allineato al DB ascoltando il canale 'catalogo'
+    (LISTEN/NOTIFY, migrazione 003).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._prodotti = {}
+        self._nomi = {}
+        self._netti = {}
+        self._ordinamento = {}
+        self._token = {}
+        self._prezzi = []
+        self._fornitori = {}
+        self._stop = threading.Event()
+        self._pronto = threading.Event()
+        self._thread = None
+        self.ricariche = 0
+        self.notifiche_applicate = 0
+
+    # ------------------------------------------------------------------ struttura
+
+    def _aggiungi(self, prodotto, ordina=True):
+        """Aggiunge un prodotto alle strutture. Con `ordina=False` il prezzo viene solo accodato:
+        chi carica molti prodotti ordina _prezzi una volta alla fine (vedi carica)."""
+        if prodotto.fornitore is not None:
+            # Un'unica istanza di Fornitore per id, così una rinomina aggiorna tutti i prodotti
+            condiviso = self._fornitori.setdefault(prodotto.fornitore.id_fornitore, prodotto.fornitore)
+            condiviso.nome = prodotto.fornitore.nome
+            prodotto.fornitore = condiviso
+
+        codice = prodotto.codice
+        nome = prodotto.nome.lower()
+        self._prodotti[codice] = prodotto
+        self._nomi[codice] = nome
+        self._netti[codice] = prodotto.prezzo_netto
+        # Stesso ordinamento della query SQL (ORDER BY nome, codice)
+        self._ordinamento[codice] = (prodotto.nome, codice)
+        for token in set(_token(nome)):
+            self._token.setdefault(token, set()).add(codice)
+        if ordina:
+            bisect.insort(self._prezzi, (prodotto.prezzo_netto, codice))
+        else:
+            self._prezzi.append((prodotto.prezzo_netto, codice))
+
+    def _rimuovi(self, codice):
+        prodotto = self._prodotti.pop(codice, None)
+        if prodotto is None:
+            return
+        del self._netti[codice]
+        del self._ordinamento[codice]
+        for token in set(_token(self._nomi.pop(codice))):
+            codici = self._token.get(token)
+            if codici is not None:
+                codici.discard(codice)
+                if not codici:
+                    del self._token[token]
+        posizione = bisect.bisect_left(self._prezzi, (prodotto.prezzo_netto, codice))
+        if posizione < len(self._prezzi) and self._prezzi[posizione] == (prodotto.prezzo_netto, codice):
+            del self._prezzi[posizione]
+
+    def carica(self, db_manager):
+        """(Ri)costruisce l'indice dai prodotti attivi. Restituisce il numero di prodotti caricati.
+
+        Le nuove strutture si costruiscono a parte e sostituiscono le attuali solo se la lettura è
+        completa: se il DB non risponde l'errore viene rilanciato e l'indice resta com'era.
+        """
+        # Sempre dalle tabelle del primario: un modello di lettura non ancora aggiornato, o una replica
+        # in ritardo, perderebbe le notifiche già ricevute
+        nuovo = IndiceCatalogo()
+        for prodotto in db_manager.itera_prodotti(modello_lettura=False, primario=True, solleva=True):
+            nuovo._aggiungi(prodotto, ordina=False)
+        nuovo._prezzi.sort()
+
+        with self._lock:
+            self._prodotti = nuovo._prodotti
+            self._nomi = nuovo._nomi
+            self._netti = nuovo._netti
+            self._ordinamento = nuovo._ordinamento
+            self._token = nuovo._token
+            self._prezzi = nuovo._prezzi
+            self._fornitori = nuovo._fornitori
+            self.ricariche += 1
+        return len(nuovo._prodotti)
+
+    # ------------------------------------------------------------------ ricerca
+
+    def cerca(self, nome=None, prezzo_max=None):
+        """Stessa semantica di ricerca_prodotti_filtrata: nome contenuto (senza maiuscole), prezzo netto <= massimo.
+
+        I token della ricerca selezionano i candidati dall'indice invertito; la sottostringa completa
+        viene poi verificata sul nome. Il risultato è ordinato per nome e codice.
+        """
+        with self._lock:
+            candidati = None
+
+            if nome:
+                testo = nome.lower()
+                for parte in _token(testo):
+                    # La parte può essere un frammento di parola: si uniscono i token che la contengono
+                    trovati = set()
+                    for token, codici in self._token.items():
+                        if parte in token:
+                            trovati |= codici
+                    candidati = trovati if candidati is None else candidati & trovati
+                    if not candidati:
+                        return []
+                if candidati is None:
+                    candidati = set(self._prodotti)
+                candidati = {codice for codice in candidati if testo in self._nomi[codice]}
+
+            filtro_prezzo = prezzo_max is not None and prezzo_max >= 0
+
+            if candidati is None and filtro_prezzo:
+                # Solo prezzo: il taglio sull'array ordinato dà direttamente i codici
+                limite = bisect.bisect_right(self._prezzi, (float(prezzo_max), chr(0x10FFFF)))
+                codici = [codice for _, codice in self._prezzi[:limite]]
+            else:
+                codici = list(self._prodotti if candidati is None else candidati)
+                if filtro_prezzo:
+                    netti = self._netti
+                    codici = [codice for codice in codici if netti[codice] <= prezzo_max]
+
+            codici.sort(key=self._ordinamento.__getitem__)
+            return [self._prodotti[codice] for codice in codici]
+
+    def __len__(self):
+        return len(self._prodotti)
+
+    # ------------------------------------------------------------------ aggiornamento incrementale
+
+    def applica_notifiche(self, payloads, db_manager):
+        """Applica un gruppo di notifiche del canale 'catalogo', rileggendo in un'unica query i codici toccati."""
+        codici = set()
+        ricarica = False
+
+        for payload in payloads:
+            evento = json.loads(payload)
+            if evento.get("ricarica"):
+                ricarica = True
+            elif evento["tabella"] == "prodotti":
+                codici.add(evento["codice"])
+                if evento.get("codice_precedente"):
+                    codici.add(evento["codice_precedente"])
+            elif evento["tabella"] == "fornitori":
+                with self._lock:
+                    fornitore = self._fornitori.get(evento["id"])
+                    if fornitore is not None:
+                        fornitore.nome = evento["nome"]
+
+        if ricarica or len(codici) > SOGLIA_RICARICA:
+            self.carica(db_manager)
+        elif codici:
+            # Se la rilettura fallisce l'errore arriva a _ciclo_ascolto, che si riconnette e ricarica tutto
+            aggiornati = list(db_manager.itera_prodotti(codici=codici, modello_lettura=False, primario=True, solleva=True))
+            with self._lock:
+                for codice in codici:
+                    self._rimuovi(codice)
+                for prodotto in aggiornati:
+                    self._aggiungi(prodotto)
+
+        self.notifiche_applicate += len(payloads)
+
+    def avvia_ascolto(self, db_manager, attesa_iniziale=30.0):
+        """Avvia il thread che ascolta il canale 'catalogo'. Attende il primo caricamento completo."""
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._ciclo_ascolto, args=(db_manager,), name="indice-catalogo", daemon=True
+        )
+        self._thread.start()
+        return self._pronto.wait(attesa_iniziale)
+
+    def ferma_ascolto(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _ciclo_ascolto(self, db_manager):
+        attesa = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute("LISTEN catalogo;")
+
+                # Caricamento dopo il LISTEN: nessuna modifica va persa tra la lettura e l'ascolto.
+                # Vale anche dopo una riconnessione, quando le notifiche intermedie non sono più recuperabili.
+                self.carica(db_manager)
+                self._pronto.set()
+                attesa = 1.0
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        payloads = [notifica.payload for notifica in conn.notifies]
+                        conn.notifies.clear()
+                        self.applica_notifiche(payloads, db_manager)
+
+            except (psycopg2.Error, OSError) as e:
+                print(f"❌ Indice catalogo: ascolto interrotto ({e}). Nuovo tentativo tra {attesa:.0f}s.")
+                self._stop.wait(attesa)
+                attesa = min(attesa * 2, 30.0)
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+
+    # ------------------------------------------------------------------ verifica
+
+    def verifica_coerenza(self, db_manager):
+        """Confronta l'indice con il DB. Restituisce i codici mancanti, in eccesso e con dati diversi."""
+        nel_db = {p.codice: p for p in db_manager.itera_prodotti(modello_lettura=False, primario=True, solleva=True)}
+        with self._lock:
+            in_memoria = dict(self._prodotti)
+
+        def impronta(p):
+            return (p.nome, p.prezzo_netto, p.prezzo_lordo, p.aliquota_iva,
+                    p.fornitore.id_fornitore if p.fornitore else None, p.fornitore.nome if p.fornitore else None)
+
+        return {
+            "mancanti": sorted(nel_db.keys() - in_memoria.keys()),
+            "in_eccesso": sorted(in_memoria.keys() - nel_db.keys()),
+            "diversi": sorted(
+                codice for codice in nel_db.keys() & in_memoria.keys()
+                if impronta(nel_db[codice]) != impronta(in_memoria[codice])
+            ),
+        }
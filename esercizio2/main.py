@@ -1,10 +1,24 @@
+# esercizi/esercizio2/main.py
+#
+# CLI del gestionale prodotti. Il menu compare subito: la connessione a PostgreSQL si apre alla prima
+# operazione che usa il database (e si ritenta alla successiva se il database non risponde).
+#
+#   python esercizio2/main.py            (oppure: python -m esercizio2.main)
+
 import sys
 import os
-from .classe import Prodotto, Fornitore
-from .db_manager import ProdottoDBManager
 
-# Inizializzazione del Database Manager
-db_manager = ProdottoDBManager()
+# Aggiusta il path per l'importazione dei moduli locali (db_manager e classe)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from classe import Prodotto, Fornitore
+from db_manager import ProdottoDBManager, CACHE_CONFIG, RICONNESSIONE_CONFIG, REPLICHE_CONFIG
+
+# Inizializzazione del Database Manager: nella CLI i fornitori letti sono condivisi per tutta la sessione
+# e le ricerche per codice (opzioni 3 e 4) passano dalla cache, se abilitata nel .env
+db_manager = ProdottoDBManager(
+    fornitori_per_sessione=True, connessione_pigra=True, **CACHE_CONFIG, **RICONNESSIONE_CONFIG, **REPLICHE_CONFIG
+)
 
 def mostra_menu():
     print("\n==================================")
@@ -164,6 +178,13 @@ def ricerca_avanzata_interattiva():
             prezzo_max=prezzo_max_filtro
         )
         
+        if not risultati and nome_filtro:
+            # Nessuna corrispondenza esatta: proviamo la ricerca tollerante agli errori di battitura
+            simili = db_manager.ricerca_prodotti_simili(nome_filtro, prezzo_max=prezzo_max_filtro, limite=10)
+            if simili:
+                print("\n🔎 Nessun risultato esatto. Forse cercavi:")
+                risultati = [prodotto for prodotto, _ in simili]
+
         mostra_prodotti(risultati)
 
     except ValueError as e:
@@ -187,9 +208,6 @@ def visualizza_fornitori_interattivo():
 
 def avvia_cli():
     print("--- Avvio CLI del Gestionale Prodotto ---")
-    if not db_manager.connetti():
-        print("Impossibile connettersi al database. Uscita.")
-        sys.exit(1)
 
     while True:
         mostra_menu()
@@ -219,7 +237,4 @@ def avvia_cli():
     print("Programma terminato.")
 
 if __name__ == '__main__':
-    # Assicurati che l'ambiente sia impostato per l'esecuzione del modulo
-    # Aggiungi la directory superiore al PYTHONPATH per l'importazione
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     avvia_cli()
\ No newline at end of file
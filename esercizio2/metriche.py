@@ -0,0 +1,311 @@
+import functools
+import inspect
+import re
+import threading
+import time
+import psycopg2.extensions
+
+# Limiti superiori (secondi) dei bucket degli istogrammi di latenza
+BUCKET_SECONDI = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LETTERALI_STRINGA = re.compile(r"'(?:[^']|'')*'")
+_LETTERALI_NUMERICI = re.compile(r"(?<![$\w])\d+(?:\.\d+)?\b")
+_SPAZI = re.compile(r"\s+")
+_TUPLA = r"\((?:\?|NULL|::\w+|,|\s)+\)"
+_TUPLE_VALUES = re.compile(rf"VALUES\s*{_TUPLA}(?:\s*,\s*{_TUPLA})*", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=512)
+def _normalizza_testo(testo):
+    testo = _LETTERALI_STRINGA.sub("?", testo)
+    testo = _LETTERALI_NUMERICI.sub("?", testo)
+    testo = _SPAZI.sub(" ", testo).strip().rstrip(";")
+    # execute_values espande VALUES %s in una tupla per riga: diventano VALUES (...), una sola serie per istruzione
+    return _TUPLE_VALUES.sub("VALUES (...)", testo)[:200]
+
+
+def normalizza_sql(query):
+    """Testo dell'istruzione usato come etichetta: senza valori letterali, spazi compattati, al più 200 caratteri."""
+    if isinstance(query, bytes):
+        # Query già composte (es. execute_values): i valori sono nel testo, che cambia a ogni chiamata
+        query = query.decode("utf-8", "replace")
+        if len(query) > 4000:
+            query = query[:4000]
+        return _normalizza_testo.__wrapped__(query)
+    if not isinstance(query, str):
+        query = str(query)
+    return _normalizza_testo(query)
+
+
+class Istogramma:
+    """Conteggio, somma e bucket cumulativi di una serie di durate (stesso modello dei histogram Prometheus)."""
+
+    __slots__ = ("conteggi", "somma", "totale")
+
+    def __init__(self):
+        self.conteggi = [0] * (len(BUCKET_SECONDI) + 1)
+        self.somma = 0.0
+        self.totale = 0
+
+    def osserva(self, secondi):
+        posizione = 0
+        while posizione < len(BUCKET_SECONDI) and secondi > BUCKET_SECONDI[posizione]:
+            posizione += 1
+        self.conteggi[posizione] += 1
+        self.somma += secondi
+        self.totale += 1
+
+
+class _Serie:
+    __slots__ = ("durate", "righe", "errori")
+
+    def __init__(self):
+        self.durate = Istogramma()
+        self.righe = 0
+        self.errori = 0
+
+
+def _etichette(**valori):
+    parti = []
+    for chiave, valore in valori.items():
+        testo = str(valore).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parti.append(f'{chiave}="{testo}"')
+    return "{" + ",".join(parti) + "}"
+
+
+class RegistroMetriche:
+    """Raccoglie tempi, righe ed errori di metodi del manager, istruzioni SQL e route HTTP.
+
+    Da disattivato (`attivo=False`) i punti di misura si riducono al controllo di un attributo.
+    Con `soglia_lenta_ms` ogni istruzione SQL più lenta della soglia viene stampata.
+    """
+
+    def __init__(self, attivo=False, soglia_lenta_ms=None):
+        self.attivo = attivo
+        self.soglia_lenta_ms = soglia_lenta_ms
+        self._lock = threading.Lock()
+        self._locale = threading.local()
+        self._metodi = {}
+        self._sql = {}
+        self._route = {}
+        self._rollback = 0
+
+    def _serie(self, tabella, chiave):
+        serie = tabella.get(chiave)
+        if serie is None:
+            serie = tabella.setdefault(chiave, _Serie())
+        return serie
+
+    # ------------------------------------------------------------------ registrazione
+
+    @property
+    def misura_sql(self):
+        """True se le istruzioni SQL vanno cronometrate (metriche attive o soglia delle query lente impostata)."""
+        return self.attivo or self.soglia_lenta_ms is not None
+
+    def registra_sql(self, query, secondi, righe, errore=False):
+        istruzione = normalizza_sql(query)
+
+        if self.attivo:
+            with self._lock:
+                serie = self._serie(self._sql, istruzione)
+                serie.durate.osserva(secondi)
+                if errore:
+                    serie.errori += 1
+                elif righe > 0:
+                    serie.righe += righe
+
+            # Le righe lette o scritte vengono attribuite anche al metodo del manager in corso nel thread
+            metodo = getattr(self._locale, "metodo", None)
+            if metodo is not None and righe > 0:
+                metodo.righe += righe
+
+        if self.soglia_lenta_ms is not None and secondi * 1000 >= self.soglia_lenta_ms:
+            print(f"⚠️ Query lenta ({secondi * 1000:.1f} ms, {max(righe, 0)} righe): {istruzione}")
+
+    def registra_rollback(self):
+        with self._lock:
+            self._rollback += 1
+
+    def registra_richiesta(self, metodo_http, route, stato, secondi):
+        with self._lock:
+            serie = self._serie(self._route, (metodo_http, route, stato))
+            serie.durate.osserva(secondi)
+            if stato >= 500:
+                serie.errori += 1
+
+    def _registra_metodo(self, nome, secondi, righe, errore):
+        with self._lock:
+            serie = self._serie(self._metodi, nome)
+            serie.durate.osserva(secondi)
+            serie.righe += righe
+            if errore:
+                serie.errori += 1
+
+    # ------------------------------------------------------------------ strumentazione
+
+    def misura_metodo(self, funzione):
+        """Decoratore: tempo, righe ed eccezioni di un metodo del manager (anche se generatore)."""
+        nome = funzione.__name__
+
+        if inspect.isgeneratorfunction(funzione):
+            @functools.wraps(funzione)
+            def generatore(*args, **kwargs):
+                if not self.attivo:
+                    yield from funzione(*args, **kwargs)
+                    return
+                # Per i generatori conta il tempo totale fino all'esaurimento e le righe prodotte
+                inizio = time.perf_counter()
+                prodotte = 0
+                errore = False
+                try:
+                    for elemento in funzione(*args, **kwargs):
+                        prodotte += 1
+                        yield elemento
+                except Exception:
+                    errore = True
+                    raise
+                finally:
+                    self._registra_metodo(nome, time.perf_counter() - inizio, prodotte, errore)
+            return generatore
+
+        @functools.wraps(funzione)
+        def metodo(*args, **kwargs):
+            if not self.attivo:
+                return funzione(*args, **kwargs)
+            corrente = _Serie()
+            precedente = getattr(self._locale, "metodo", None)
+            self._locale.metodo = corrente
+            inizio = time.perf_counter()
+            errore = False
+            try:
+                return funzione(*args, **kwargs)
+            except Exception:
+                errore = True
+                raise
+            finally:
+                self._locale.metodo = precedente
+                self._registra_metodo(nome, time.perf_counter() - inizio, corrente.righe, errore)
+        return metodo
+
+    def strumenta(self, classe, escludi=()):
+        """Applica misura_metodo a tutti i metodi pubblici di `classe` (tranne quelli in `escludi`)."""
+        for nome, attributo in list(vars(classe).items()):
+            if nome.startswith("_") or nome in escludi or not inspect.isfunction(attributo):
+                continue
+            setattr(classe, nome, self.misura_metodo(attributo))
+        return classe
+
+    # ------------------------------------------------------------------ esportazione
+
+    def azzera(self):
+        with self._lock:
+            self._metodi.clear()
+            self._sql.clear()
+            self._route.clear()
+            self._rollback = 0
+
+    def _righe_istogramma(self, nome, etichette, istogramma):
+        righe = []
+        cumulato = 0
+        for limite, conteggio in zip(BUCKET_SECONDI, istogramma.conteggi):
+            cumulato += conteggio
+            righe.append(f"{nome}_bucket{_etichette(**etichette, le=limite)} {cumulato}")
+        righe.append(f"{nome}_bucket{_etichette(**etichette, le='+Inf')} {istogramma.totale}")
+        righe.append(f"{nome}_sum{_etichette(**etichette)} {istogramma.somma:.6f}")
+        righe.append(f"{nome}_count{_etichette(**etichette)} {istogramma.totale}")
+        return righe
+
+    def esporta_prometheus(self, indicatori=None):
+        """Testo nel formato di esposizione Prometheus (0.0.4).
+
+        `indicatori` è un dizionario opzionale {nome_metrica: (tipo, descrizione, valore)} di valori letti
+        al momento da altre fonti (es. statistiche del pool); `valore` può essere un numero o un dizionario
+        {((etichetta, valore_etichetta), ...): numero}.
+        """
+        # Copia sotto lock, formattazione fuori: le richieste in corso non aspettano l'esportazione
+        with self._lock:
+            metodi = {nome: (_copia(s.durate), s.righe, s.errori) for nome, s in self._metodi.items()}
+            sql = {nome: (_copia(s.durate), s.righe, s.errori) for nome, s in self._sql.items()}
+            route = {chiave: _copia(s.durate) for chiave, s in self._route.items()}
+            rollback = self._rollback
+
+        righe = []
+
+        def famiglia(nome, tipo, descrizione):
+            righe.append(f"# HELP {nome} {descrizione}")
+            righe.append(f"# TYPE {nome} {tipo}")
+
+        famiglia("erp_db_metodo_durata_secondi", "histogram", "Durata dei metodi di ProdottoDBManager.")
+        for nome, (durate, _, _) in sorted(metodi.items()):
+            righe.extend(self._righe_istogramma("erp_db_metodo_durata_secondi", {"metodo": nome}, durate))
+        famiglia("erp_db_metodo_righe_total", "counter", "Righe lette o scritte dai metodi di ProdottoDBManager.")
+        for nome, (_, numero, _) in sorted(metodi.items()):
+            righe.append(f"erp_db_metodo_righe_total{_etichette(metodo=nome)} {numero}")
+        famiglia("erp_db_metodo_errori_total", "counter", "Eccezioni propagate dai metodi di ProdottoDBManager.")
+        for nome, (_, _, errori) in sorted(metodi.items()):
+            righe.append(f"erp_db_metodo_errori_total{_etichette(metodo=nome)} {errori}")
+
+        famiglia("erp_db_sql_durata_secondi", "histogram", "Durata delle istruzioni SQL, per testo normalizzato.")
+        for istruzione, (durate, _, _) in sorted(sql.items()):
+            righe.extend(self._righe_istogramma("erp_db_sql_durata_secondi", {"istruzione": istruzione}, durate))
+        famiglia("erp_db_sql_righe_total", "counter", "Righe restituite o modificate dalle istruzioni SQL.")
+        for istruzione, (_, numero, _) in sorted(sql.items()):
+            righe.append(f"erp_db_sql_righe_total{_etichette(istruzione=istruzione)} {numero}")
+        famiglia("erp_db_sql_errori_total", "counter", "Istruzioni SQL terminate con un errore del database.")
+        for istruzione, (_, _, errori) in sorted(sql.items()):
+            righe.append(f"erp_db_sql_errori_total{_etichette(istruzione=istruzione)} {errori}")
+
+        famiglia("erp_db_rollback_total", "counter", "Transazioni annullate con rollback().")
+        righe.append(f"erp_db_rollback_total {rollback}")
+
+        famiglia("erp_http_richiesta_durata_secondi", "histogram", "Durata delle richieste HTTP per route e stato.")
+        for (metodo_http, nome_route, stato), durate in sorted(route.items()):
+            etichette = {"metodo": metodo_http, "route": nome_route, "stato": stato}
+            righe.extend(self._righe_istogramma("erp_http_richiesta_durata_secondi", etichette, durate))
+
+        for nome, (tipo, descrizione, valori) in (indicatori or {}).items():
+            famiglia(nome, tipo, descrizione)
+            if isinstance(valori, dict):
+                for etichette, valore in valori.items():
+                    righe.append(f"{nome}{_etichette(**dict(etichette))} {valore}")
+            else:
+                righe.append(f"{nome} {valori}")
+
+        return "\n".join(righe) + "\n"
+
+
+def _copia(istogramma):
+    copia = Istogramma()
+    copia.conteggi = list(istogramma.conteggi)
+    copia.somma = istogramma.somma
+    copia.totale = istogramma.totale
+    return copia
+
+
+# Registro di processo: lo configura db_manager a partire da .env (METRICHE_CONFIG)
+metriche = RegistroMetriche()
+
+
+class CursoreMisurato(psycopg2.extensions.cursor):
+    """Cursore psycopg2 che registra durata, righe ed errori di ogni istruzione nel registro `metriche`."""
+
+    def execute(self, query, vars=None):
+        inizio = time.perf_counter()
+        try:
+            risultato = super().execute(query, vars)
+        except psycopg2.Error:
+            metriche.registra_sql(query, time.perf_counter() - inizio, 0, errore=True)
+            raise
+        metriche.registra_sql(query, time.perf_counter() - inizio, self.rowcount)
+        return risultato
+
+    def copy_expert(self, sql, file, size=8192):
+        inizio = time.perf_counter()
+        try:
+            risultato = super().copy_expert(sql, file, size)
+        except psycopg2.Error:
+            metriche.registra_sql(sql, time.perf_counter() - inizio, 0, errore=True)
+            raise
+        metriche.registra_sql(sql, time.perf_counter() - inizio, self.rowcount)
+        return risultato
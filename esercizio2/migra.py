@@ -0,0 +1,66 @@
+# esercizi/esercizio2/migra.py
+#
+# Applica in ordine le migrazioni SQL della cartella migrazioni/ non ancora eseguite.
+# Ogni file gira nella propria transazione e viene registrato nella tabella schema_migrazioni.
+#
+#   python esercizio2/migra.py
+
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_manager import DB_CONFIG
+
+CARTELLA_MIGRAZIONI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrazioni")
+
+
+def elenco_migrazioni():
+    return sorted(nome for nome in os.listdir(CARTELLA_MIGRAZIONI) if nome.endswith(".sql"))
+
+
+def applica_migrazioni():
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"❌ Errore durante la connessione a PostgreSQL: {e}")
+        return False
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrazioni (
+                nome TEXT PRIMARY KEY,
+                applicata_il TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """)
+            cursor.execute("SELECT nome FROM schema_migrazioni;")
+            applicate = {nome for (nome,) in cursor.fetchall()}
+        conn.commit()
+
+        da_applicare = [nome for nome in elenco_migrazioni() if nome not in applicate]
+        if not da_applicare:
+            print("✅ Database già aggiornato: nessuna migrazione da applicare.")
+            return True
+
+        for nome in da_applicare:
+            with open(os.path.join(CARTELLA_MIGRAZIONI, nome), encoding="utf-8") as file_sql:
+                sql = file_sql.read()
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrazioni (nome) VALUES (%s);", (nome,))
+            conn.commit()
+            print(f"✅ Migrazione applicata: {nome}")
+        return True
+
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Errore DB durante le migrazioni: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if applica_migrazioni() else 1)
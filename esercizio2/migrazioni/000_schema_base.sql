@@ -0,0 +1,18 @@
+-- Schema di base del gestionale: fornitori e prodotti (relazione Many2one tramite id_fornitore).
+-- Idempotente: non modifica un database già creato a mano seguendo il README.
+
+CREATE TABLE IF NOT EXISTS fornitori (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS prodotti (
+    id SERIAL PRIMARY KEY,
+    codice VARCHAR(50) NOT NULL UNIQUE,
+    nome VARCHAR(200) NOT NULL,
+    prezzo_netto NUMERIC(12, 2) NOT NULL CHECK (prezzo_netto >= 0),
+    aliquota_iva NUMERIC(5, 2) NOT NULL DEFAULT 22.00 CHECK (aliquota_iva >= 0),
+    prezzo_lordo NUMERIC(12, 2) NOT NULL,
+    attivo BOOLEAN NOT NULL DEFAULT TRUE,
+    id_fornitore INTEGER REFERENCES fornitori (id)
+);
@@ -0,0 +1,28 @@
+-- Versione del catalogo per le GET condizionali dell'API (ETag / Last-Modified).
+-- Ogni istruzione che modifica prodotti o fornitori incrementa il contatore, così un polling
+-- a catalogo invariato costa una sola lettura di questa riga.
+
+CREATE TABLE IF NOT EXISTS catalogo_versione (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    versione BIGINT NOT NULL DEFAULT 0,
+    aggiornato_il TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO catalogo_versione (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementa_versione_catalogo() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalogo_versione SET versione = versione + 1, aggiornato_il = clock_timestamp();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prodotti_versione_catalogo ON prodotti;
+CREATE TRIGGER prodotti_versione_catalogo
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON prodotti
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versione_catalogo();
+
+DROP TRIGGER IF EXISTS fornitori_versione_catalogo ON fornitori;
+CREATE TRIGGER fornitori_versione_catalogo
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON fornitori
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementa_versione_catalogo();
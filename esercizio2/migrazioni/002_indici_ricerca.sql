@@ -0,0 +1,11 @@
+-- Indici per la ricerca prodotti.
+-- GIN con trigrammi su nome: rende indicizzabili sia ILIKE '%termine%' sia la ricerca per somiglianza
+-- (operatori % e <% di pg_trgm). Il btree su (attivo, prezzo_netto) serve il filtro prezzo massimo.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS prodotti_nome_trgm_idx ON prodotti USING gin (nome gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS prodotti_attivo_prezzo_idx ON prodotti (attivo, prezzo_netto);
+
+ANALYZE prodotti;
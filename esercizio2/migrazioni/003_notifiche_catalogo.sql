@@ -0,0 +1,45 @@
+-- Notifiche LISTEN/NOTIFY sul canale 'catalogo' per tenere aggiornati gli indici in memoria dei nodi API.
+-- Il payload JSON indica cosa è cambiato; il contenuto aggiornato viene poi riletto dal listener.
+
+CREATE OR REPLACE FUNCTION notifica_prodotto_modificato() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('catalogo', json_build_object('tabella', 'prodotti', 'codice', OLD.codice)::text);
+    ELSIF TG_OP = 'UPDATE' AND NEW.codice IS DISTINCT FROM OLD.codice THEN
+        PERFORM pg_notify('catalogo', json_build_object('tabella', 'prodotti', 'codice', NEW.codice, 'codice_precedente', OLD.codice)::text);
+    ELSE
+        PERFORM pg_notify('catalogo', json_build_object('tabella', 'prodotti', 'codice', NEW.codice)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prodotti_notifica_catalogo ON prodotti;
+CREATE TRIGGER prodotti_notifica_catalogo
+    AFTER INSERT OR UPDATE OR DELETE ON prodotti
+    FOR EACH ROW EXECUTE FUNCTION notifica_prodotto_modificato();
+
+CREATE OR REPLACE FUNCTION notifica_fornitore_modificato() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('catalogo', json_build_object('tabella', 'fornitori', 'id', NEW.id, 'nome', NEW.nome)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS fornitori_notifica_catalogo ON fornitori;
+CREATE TRIGGER fornitori_notifica_catalogo
+    AFTER UPDATE OF nome ON fornitori
+    FOR EACH ROW EXECUTE FUNCTION notifica_fornitore_modificato();
+
+-- TRUNCATE non attiva i trigger di riga: si chiede ai listener una ricarica completa
+CREATE OR REPLACE FUNCTION notifica_catalogo_svuotato() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('catalogo', json_build_object('tabella', TG_TABLE_NAME, 'ricarica', true)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prodotti_notifica_svuotamento ON prodotti;
+CREATE TRIGGER prodotti_notifica_svuotamento
+    AFTER TRUNCATE ON prodotti
+    FOR EACH STATEMENT EXECUTE FUNCTION notifica_catalogo_svuotato();
@@ -0,0 +1,38 @@
+-- Eliminazione logica dei prodotti: elimina_prodotto imposta attivo = FALSE e la data di eliminazione.
+-- Le letture filtrano sempre su attivo, quindi gli indici parziali WHERE attivo restano piccoli e
+-- contengono solo le righe che le query possono restituire.
+-- I prodotti eliminati da tempo vengono spostati in prodotti_archivio a blocchi (purga_prodotti.py).
+
+ALTER TABLE prodotti ADD COLUMN IF NOT EXISTS eliminato_il TIMESTAMPTZ;
+
+-- Righe già disattivate prima di questa migrazione: la data di eliminazione parte da adesso
+UPDATE prodotti SET eliminato_il = now() WHERE NOT attivo AND eliminato_il IS NULL;
+
+-- Elenco e paginazione keyset (ORDER BY nome, codice) sui soli prodotti attivi
+CREATE INDEX IF NOT EXISTS prodotti_attivi_nome_codice_idx ON prodotti (nome, codice) WHERE attivo;
+
+-- Lettura per codice (singola e con = ANY): l'indice unico su codice copre anche le righe eliminate
+CREATE INDEX IF NOT EXISTS prodotti_attivi_codice_idx ON prodotti (codice) WHERE attivo;
+
+-- Filtro prezzo massimo: sostituisce l'indice (attivo, prezzo_netto) della migrazione 002
+DROP INDEX IF EXISTS prodotti_attivo_prezzo_idx;
+CREATE INDEX IF NOT EXISTS prodotti_attivi_prezzo_idx ON prodotti (prezzo_netto) WHERE attivo;
+
+-- La purga cerca gli eliminati più vecchi di una soglia senza scorrere la tabella
+CREATE INDEX IF NOT EXISTS prodotti_eliminati_idx ON prodotti (eliminato_il) WHERE NOT attivo;
+
+CREATE TABLE IF NOT EXISTS prodotti_archivio (
+    id INTEGER PRIMARY KEY,
+    codice VARCHAR(50) NOT NULL,
+    nome VARCHAR(200) NOT NULL,
+    prezzo_netto NUMERIC(12, 2) NOT NULL,
+    aliquota_iva NUMERIC(5, 2) NOT NULL,
+    prezzo_lordo NUMERIC(12, 2) NOT NULL,
+    id_fornitore INTEGER,
+    eliminato_il TIMESTAMPTZ,
+    archiviato_il TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS prodotti_archivio_codice_idx ON prodotti_archivio (codice);
+
+ANALYZE prodotti;
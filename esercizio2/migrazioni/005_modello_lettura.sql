@@ -0,0 +1,45 @@
+-- Modello di lettura denormalizzato: i prodotti attivi con il nome del fornitore già in riga, così elenco,
+-- ricerca e lettura per codice non ripetono la JOIN prodotti/fornitori a ogni chiamata.
+-- È una vista materializzata: si aggiorna con REFRESH MATERIALIZED VIEW CONCURRENTLY (aggiorna_modello_lettura.py),
+-- che non blocca le letture e richiede l'indice unico su codice.
+-- Le letture la usano solo con DB_MODELLO_LETTURA=1.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS catalogo_prodotti AS
+SELECT
+    p.id, p.codice, p.nome, p.prezzo_netto, p.aliquota_iva, p.prezzo_lordo, p.attivo,
+    f.id AS id_fornitore, f.nome AS nome_fornitore
+FROM prodotti p
+LEFT JOIN fornitori f ON p.id_fornitore = f.id
+WHERE p.attivo;
+
+-- Lettura per codice (singola e con = ANY); necessario per il refresh concorrente
+CREATE UNIQUE INDEX IF NOT EXISTS catalogo_prodotti_codice_idx ON catalogo_prodotti (codice);
+
+-- Elenco e paginazione keyset (ORDER BY nome, codice)
+CREATE INDEX IF NOT EXISTS catalogo_prodotti_nome_codice_idx ON catalogo_prodotti (nome, codice);
+
+-- Filtro prezzo massimo
+CREATE INDEX IF NOT EXISTS catalogo_prodotti_prezzo_idx ON catalogo_prodotti (prezzo_netto);
+
+-- ILIKE '%termine%' e ricerca per somiglianza, come l'indice della migrazione 002 (se pg_trgm è installata)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS catalogo_prodotti_nome_trgm_idx ON catalogo_prodotti USING gin (nome gin_trgm_ops);
+    END IF;
+END
+$$;
+
+-- Versione del catalogo (migrazione 001) a cui risale il contenuto della vista: con il modello di lettura
+-- l'API la usa per ETag e Last-Modified, e il refresh la confronta per saltare i refresh inutili
+CREATE TABLE IF NOT EXISTS catalogo_prodotti_stato (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    versione BIGINT NOT NULL,
+    aggiornato_il TIMESTAMPTZ NOT NULL
+);
+
+INSERT INTO catalogo_prodotti_stato (id, versione, aggiornato_il)
+SELECT TRUE, versione, aggiornato_il FROM catalogo_versione
+ON CONFLICT DO NOTHING;
+
+ANALYZE catalogo_prodotti;
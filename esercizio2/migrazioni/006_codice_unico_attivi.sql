@@ -0,0 +1,13 @@
+-- Codice unico tra i soli prodotti attivi: con l'eliminazione logica (migrazione 004) la riga eliminata resta
+-- in tabella fino alla purga, e il vincolo UNIQUE (codice) dello schema di base impediva di reinserire
+-- subito un prodotto con lo stesso codice. Le righe eliminate con lo stesso codice possono essere più d'una;
+-- lo storico resta in prodotti_archivio dopo la purga.
+
+ALTER TABLE prodotti DROP CONSTRAINT IF EXISTS prodotti_codice_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS prodotti_attivi_codice_unico ON prodotti (codice) WHERE attivo;
+
+-- Sostituito dall'indice unico, che copre le stesse letture per codice
+DROP INDEX IF EXISTS prodotti_attivi_codice_idx;
+
+ANALYZE prodotti;
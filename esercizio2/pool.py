@@ -0,0 +1,162 @@
+import threading
+import time
+from psycopg2 import extensions as pg_ext
+from psycopg2 import pool as pg_pool
+
+
+class PoolEsauritoError(pg_pool.PoolError):
+    """Nessuna connessione libera nel pool entro il timeout configurato."""
+
+
+class _PoolRiutilizzo(pg_pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool che tiene da parte le connessioni riconsegnate fino a maxconn.
+
+    Quello di psycopg2 chiude ogni connessione riconsegnata quando ne ha già minconn libere: sotto carico
+    concorrente (più di minconn richieste insieme) apriva di continuo connessioni nuove, ognuna con i suoi
+    PREPARE. Conta anche le connessioni aperte, per le statistiche.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.aperte = 0
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        self.aperte += 1
+        return conn
+
+    def _putconn(self, conn, key=None, close=False):
+        if self.closed:
+            raise pg_pool.PoolError("connection pool is closed")
+
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise pg_pool.PoolError("trying to put unkeyed connection")
+
+        if close or conn.closed or len(self._pool) >= self.maxconn:
+            conn.close()
+        elif conn.info.transaction_status == pg_ext.TRANSACTION_STATUS_UNKNOWN:
+            # Connessione persa con il server
+            conn.close()
+        else:
+            if conn.info.transaction_status != pg_ext.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._pool.append(conn)
+
+        del self._used[key]
+        del self._rused[id(conn)]
+
+
+class PoolConnessioni:
+    """Pool thread-safe di connessioni PostgreSQL con timeout di attesa e statistiche."""
+
+    def __init__(self, minconn, maxconn, timeout=5.0, **config):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Dimensioni del pool non valide: serve 0 <= min <= max e max >= 1.")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = _PoolRiutilizzo(minconn, maxconn, **config)
+        # Il semaforo limita i prelievi a maxconn: chi arriva dopo attende invece di ricevere PoolError
+        self._slot = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+
+        # Dopo una connessione persa (es. server riavviato) anche le altre aperte prima sono sospette:
+        # invalida() passa a una nuova generazione e quelle delle generazioni precedenti vengono sostituite
+        self._generazione = 0
+        # Le connessioni iniziali (minconn) sono già nel pool: vanno registrate ora, o sembrerebbero nuove
+        self._generazioni = {id(conn): 0 for conn in self._pool._pool}
+        self._invalidazioni = 0
+
+        self._in_uso = 0
+        self._prelievi = 0
+        self._attese = 0
+        self._timeout_scaduti = 0
+        self._secondi_attesa = 0.0
+
+    def prendi(self):
+        """Preleva una connessione, attendendo al massimo `timeout` secondi."""
+        inizio = time.perf_counter()
+        if not self._slot.acquire(blocking=False):
+            with self._lock:
+                self._attese += 1
+            if not self._slot.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._timeout_scaduti += 1
+                raise PoolEsauritoError(
+                    f"Pool esaurito: nessuna connessione libera entro {self.timeout}s "
+                    f"({self.maxconn} connessioni in uso)."
+                )
+
+        try:
+            conn = self._pool.getconn()
+            while not self._attuale(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slot.release()
+            raise
+
+        with self._lock:
+            self._in_uso += 1
+            self._prelievi += 1
+            self._secondi_attesa += time.perf_counter() - inizio
+        return conn
+
+    def _attuale(self, conn):
+        """Vero se `conn` è nuova o aperta dopo l'ultima invalida(); le altre vanno chiuse e sostituite."""
+        with self._lock:
+            if self._generazioni.setdefault(id(conn), self._generazione) == self._generazione:
+                return True
+            del self._generazioni[id(conn)]
+            return False
+
+    def invalida(self):
+        """Segna come da sostituire tutte le connessioni aperte finora: le libere al prossimo prelievo,
+        quelle in uso alla riconsegna. Da chiamare quando una connessione risulta interrotta."""
+        with self._lock:
+            self._generazione += 1
+            self._invalidazioni += 1
+
+    def restituisci(self, conn, chiudi=False):
+        """Riconsegna una connessione al pool (chiudendola se `chiudi`, se è rotta o se è stata invalidata)."""
+        try:
+            with self._lock:
+                if self._generazioni.get(id(conn)) != self._generazione:
+                    chiudi = True
+                if chiudi or conn.closed:
+                    self._generazioni.pop(id(conn), None)
+            self._pool.putconn(conn, close=chiudi or bool(conn.closed))
+        finally:
+            with self._lock:
+                self._in_uso -= 1
+            self._slot.release()
+
+    def chiudi(self):
+        self._pool.closeall()
+
+    @property
+    def chiuso(self):
+        return self._pool.closed
+
+    @property
+    def in_uso(self):
+        return self._in_uso
+
+    def statistiche(self):
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "timeout_s": self.timeout,
+                "in_uso": self._in_uso,
+                "libere": self.maxconn - self._in_uso,
+                "prelievi": self._prelievi,
+                "attese": self._attese,
+                "timeout_scaduti": self._timeout_scaduti,
+                "invalidazioni": self._invalidazioni,
+                "connessioni_aperte": self._pool.aperte,
+                "attesa_media_ms": round(self._secondi_attesa * 1000 / self._prelievi, 3) if self._prelievi else 0.0,
+            }
@@ -0,0 +1,52 @@
+# esercizi/esercizio2/purga_prodotti.py
+#
+# Sposta in prodotti_archivio i prodotti eliminati (attivo = FALSE) da più di N giorni, a blocchi
+# di righe in transazioni brevi, così le letture e le scritture sul catalogo non restano bloccate.
+# Pensato per cron o per girare in background con --ogni.
+#
+#   python esercizio2/purga_prodotti.py --giorni 30 [--blocco 1000] [--pausa 0.1] [--senza-archivio] [--ogni 3600]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_manager import ProdottoDBManager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archivia i prodotti eliminati da più di N giorni.")
+    parser.add_argument("--giorni", type=float, default=30, help="età minima dell'eliminazione (default: 30)")
+    parser.add_argument("--blocco", type=int, default=1000, help="righe spostate per transazione")
+    parser.add_argument("--pausa", type=float, default=0.0, help="secondi di attesa tra un blocco e l'altro")
+    parser.add_argument("--massimo", type=int, default=None, help="righe massime per esecuzione")
+    parser.add_argument("--senza-archivio", action="store_true", help="cancella le righe invece di archiviarle")
+    parser.add_argument("--ogni", type=float, default=None, help="ripete la purga ogni N secondi")
+    argomenti = parser.parse_args(argv)
+
+    db_manager = ProdottoDBManager()
+    if not db_manager.connetti():
+        return 1
+
+    try:
+        while True:
+            esito = db_manager.archivia_prodotti_eliminati(
+                giorni=argomenti.giorni,
+                blocco=argomenti.blocco,
+                pausa=argomenti.pausa,
+                archivia=not argomenti.senza_archivio,
+                massimo=argomenti.massimo
+            )
+            if argomenti.ogni is None:
+                return 0 if esito is not None else 1
+            time.sleep(argomenti.ogni)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        db_manager.disconnetti()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+# esercizi/esercizio2/serializzazione.py
+#
+# Rappresentazione JSON dei prodotti e costanti condivise dalle due API:
+# app.py (Flask, WSGI) e app_async.py (Quart, ASGI).
+
+# Paginazione keyset: dimensione di pagina predefinita e massima per ?limit=
+LIMITE_PAGINA_DEFAULT = 100
+LIMITE_PAGINA_MAX = 1000
+
+# Risposte in streaming: NDJSON su richiesta tramite header Accept, righe inviate a blocchi
+MIMETYPE_NDJSON = 'application/x-ndjson'
+RIGHE_PER_BLOCCO = 500
+
+
+def prodotto_a_dict(p):
+    """Serializzazione completa del Prodotto, includendo il fornitore.
+
+    L'elenco completo è serializzato da PostgreSQL con la stessa forma (db_manager.json_prodotto):
+    le due vanno modificate insieme.
+    """
+    fornitore_data = None
+    if p.fornitore:
+        fornitore_data = {
+            'id': p.fornitore.id_fornitore,
+            'nome': p.fornitore.nome
+        }
+
+    return {
+        'codice': p.codice,
+        'nome': p.nome,
+        'prezzo_netto': p.prezzo_netto,
+        'prezzo_lordo': p.prezzo_lordo,
+        'aliquota_iva': p.aliquota_iva,
+        'fornitore': fornitore_data # <-- La relazione è qui
+    }
+
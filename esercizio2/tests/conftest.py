@@ -0,0 +1,26 @@
+# esercizi/esercizio2/tests/conftest.py
+#
+# I test usano il database configurato nel .env (DB_NAME, DB_USER, DB_PASSWORD) con le migrazioni applicate:
+# senza un PostgreSQL raggiungibile vengono saltati.
+#
+#   python -m pytest esercizio2/tests
+
+import sys
+import os
+
+import psycopg2
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import DB_CONFIG
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Parametri di connessione del database di prova; salta il test se il database non risponde."""
+    try:
+        psycopg2.connect(**DB_CONFIG).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL non raggiungibile: {e}")
+    return DB_CONFIG
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import time
+
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+PREFISSO = "TEST-CACHE-"
+A, B, C = (PREFISSO + lettera for lettera in "ABC")
+
+
+@pytest.fixture
+def pulizia(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice LIKE %s;", (PREFISSO + "%",))
+        conn.close()
+
+    pulisci()
+    yield
+    pulisci()
+
+
+@pytest.fixture
+def crea_manager(pulizia):
+    creati = []
+
+    def crea(**opzioni):
+        manager = ProdottoDBManager(**opzioni)
+        assert manager.connetti()
+        creati.append(manager)
+        return manager
+
+    yield crea
+    for manager in creati:
+        manager.disconnetti()
+
+
+def scrivi_senza_manager(database, query, *valori):
+    """Modifica il DB alle spalle del manager: la cache non viene invalidata."""
+    with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+        cursor.execute(query, valori)
+    conn.close()
+
+
+def test_inserimento_invalida_l_assenza_in_cache(crea_manager):
+    manager = crea_manager(cache_dimensione=10)
+    assert manager.leggi_prodotto_per_codice(A) is None
+
+    manager.inserisci_prodotto(Prodotto(A, "Nuovo", 10.0, 22.0))
+    assert manager.leggi_prodotto_per_codice(A).nome == "Nuovo"
+
+
+def test_aggiornamento_ed_eliminazione_invalidano(crea_manager):
+    manager = crea_manager(cache_dimensione=10)
+    manager.inserisci_prodotto(Prodotto(A, "Originale", 10.0, 22.0))
+    assert manager.leggi_prodotto_per_codice(A).nome == "Originale"
+
+    manager.aggiorna_prodotto(Prodotto(A, "Aggiornato", 12.0, 22.0))
+    letto = manager.leggi_prodotto_per_codice(A)
+    assert (letto.nome, letto.prezzo_netto) == ("Aggiornato", 12.0)
+
+    manager.elimina_prodotto(A)
+    assert manager.leggi_prodotto_per_codice(A) is None
+    assert manager.statistiche_cache()["invalidazioni"] >= 2
+
+
+def test_modificare_il_prodotto_letto_non_altera_la_cache(crea_manager):
+    manager = crea_manager(cache_dimensione=10)
+    manager.inserisci_prodotto(Prodotto(A, "Originale", 10.0, 22.0))
+
+    manager.leggi_prodotto_per_codice(A).nome = "Modificato in memoria"
+    assert manager.leggi_prodotto_per_codice(A).nome == "Originale"
+
+
+def test_assenza_scade_dopo_il_ttl_negativo(crea_manager, database):
+    manager = crea_manager(cache_dimensione=10, cache_ttl=60, cache_ttl_negativo=0.2)
+    assert manager.leggi_prodotto_per_codice(A) is None
+    manager.inserisci_prodotto(Prodotto(B, "Presente", 10.0, 22.0))
+    assert manager.leggi_prodotto_per_codice(B).nome == "Presente"
+
+    scrivi_senza_manager(database, "INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo) "
+                                   "VALUES (%s, 'Da fuori', 10, 22, 12.2);", A)
+    scrivi_senza_manager(database, "UPDATE prodotti SET nome = 'Cambiato da fuori' WHERE codice = %s;", B)
+    assert manager.leggi_prodotto_per_codice(A) is None
+
+    time.sleep(0.3)
+    assert manager.leggi_prodotto_per_codice(A).nome == "Da fuori"
+    # Le voci positive seguono il TTL ordinario
+    assert manager.leggi_prodotto_per_codice(B).nome == "Presente"
+    assert manager.statistiche_cache()["scadute"] == 1
+
+
+def test_ttl_negativo_dalla_variabile_d_ambiente():
+    cartella = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = {**os.environ, "DB_CACHE_DIMENSIONE": "10", "DB_CACHE_TTL": "30", "DB_CACHE_TTL_NEGATIVO": "0.5"}
+    codice = "from db_manager import CACHE_CONFIG, ProdottoDBManager; print(ProdottoDBManager(**CACHE_CONFIG).cache.ttl_negativo)"
+
+    esecuzione = subprocess.run([sys.executable, "-c", codice], cwd=cartella, env=ambiente,
+                                capture_output=True, text=True, check=True)
+    assert esecuzione.stdout.strip() == "0.5"
+
+
+def test_voce_meno_recente_espulsa(crea_manager, database):
+    manager = crea_manager(cache_dimensione=2, cache_ttl=60)
+    for codice in (A, B, C):
+        manager.inserisci_prodotto(Prodotto(codice, "Originale", 10.0, 22.0))
+
+    manager.leggi_prodotto_per_codice(A)
+    manager.leggi_prodotto_per_codice(B)
+    manager.leggi_prodotto_per_codice(A)
+    manager.leggi_prodotto_per_codice(C)
+    assert manager.statistiche_cache()["espulse"] == 1
+
+    scrivi_senza_manager(database, "UPDATE prodotti SET nome = 'Cambiato da fuori' WHERE codice LIKE %s;", PREFISSO + "%")
+    assert manager.leggi_prodotto_per_codice(A).nome == "Originale"
+    assert manager.leggi_prodotto_per_codice(C).nome == "Originale"
+    assert manager.leggi_prodotto_per_codice(B).nome == "Cambiato da fuori"
@@ -0,0 +1,82 @@
+import os
+
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+CODICE = "TEST-CONNESSIONE-PIGRA"
+
+
+@pytest.fixture
+def pulizia(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice = %s;", (CODICE,))
+        conn.close()
+
+    pulisci()
+    yield
+    pulisci()
+
+
+@pytest.mark.parametrize("pool_max", [None, 2])
+def test_inserimento_come_prima_operazione_con_connessione_pigra(pulizia, pool_max):
+    manager = ProdottoDBManager(pool_max=pool_max, connessione_pigra=True)
+    try:
+        assert manager.inserisci_prodotto(Prodotto(CODICE, "Prodotto pigro", 10.0, 22.0)) is not None
+        assert manager.leggi_prodotto_per_codice(CODICE).nome == "Prodotto pigro"
+    finally:
+        manager.disconnetti()
+
+
+def test_inserimento_dopo_disconnessione_non_solleva(pulizia, capsys):
+    manager = ProdottoDBManager(connessione_pigra=True)
+    assert manager.verifica_database()
+    manager.disconnetti()
+
+    assert manager.inserisci_prodotto(Prodotto(CODICE, "Dopo disconnetti", 10.0, 22.0)) is None
+    assert "non attiva" in capsys.readouterr().out
+
+
+def _pid_sessione(manager):
+    with manager._connessione() as (conn, cursor):
+        cursor.execute("SELECT pg_backend_pid();")
+        pid = cursor.fetchone()[0]
+        conn.rollback()
+    return pid
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="os.fork non disponibile")
+@pytest.mark.parametrize("pool_max", [None, 2])
+def test_inserimento_dopo_fork_usa_una_sessione_propria(pulizia, pool_max):
+    manager = ProdottoDBManager(pool_max=pool_max)
+    assert manager.connetti()
+    try:
+        sessione_padre = _pid_sessione(manager)
+        lettura, scrittura = os.pipe()
+        figlio = os.fork()
+        if figlio == 0:
+            # Processo figlio: la prima operazione è un inserimento
+            esito = 1
+            try:
+                os.close(lettura)
+                if manager.inserisci_prodotto(Prodotto(CODICE, "Dal figlio", 10.0, 22.0)) is not None:
+                    os.write(scrittura, str(_pid_sessione(manager)).encode())
+                    esito = 0
+            finally:
+                os._exit(esito)
+
+        os.close(scrittura)
+        with os.fdopen(lettura) as risposta:
+            sessione_figlio = risposta.read()
+        _, stato = os.waitpid(figlio, 0)
+
+        assert os.waitstatus_to_exitcode(stato) == 0
+        assert int(sessione_figlio) != sessione_padre
+        # La sessione del padre è ancora utilizzabile
+        assert _pid_sessione(manager) == sessione_padre
+        assert manager.leggi_prodotto_per_codice(CODICE).nome == "Dal figlio"
+    finally:
+        manager.disconnetti()
@@ -0,0 +1,45 @@
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+CODICE = "TEST-ELIMINA-REINSERISCI"
+
+
+@pytest.fixture
+def db_manager(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice = %s;", (CODICE,))
+        conn.close()
+
+    pulisci()
+    manager = ProdottoDBManager()
+    assert manager.connetti()
+    yield manager
+    manager.disconnetti()
+    pulisci()
+
+
+def test_codice_eliminato_si_puo_reinserire(db_manager):
+    assert db_manager.inserisci_prodotto(Prodotto(CODICE, "Prima versione", 10.0, 22.0)) is not None
+    assert db_manager.elimina_prodotto(CODICE)
+
+    nuovo_id = db_manager.inserisci_prodotto(Prodotto(CODICE, "Seconda versione", 12.0, 22.0))
+    assert nuovo_id is not None
+    assert db_manager.leggi_prodotto_per_codice(CODICE).nome == "Seconda versione"
+
+
+def test_codice_attivo_resta_unico(db_manager):
+    assert db_manager.inserisci_prodotto(Prodotto(CODICE, "Prima versione", 10.0, 22.0)) is not None
+    assert db_manager.inserisci_prodotto(Prodotto(CODICE, "Duplicato", 12.0, 22.0)) is None
+
+
+def test_ripristino_rifiutato_se_il_codice_e_di_nuovo_in_uso(db_manager):
+    db_manager.inserisci_prodotto(Prodotto(CODICE, "Prima versione", 10.0, 22.0))
+    db_manager.elimina_prodotto(CODICE)
+    db_manager.inserisci_prodotto(Prodotto(CODICE, "Seconda versione", 12.0, 22.0))
+
+    assert not db_manager.ripristina_prodotto(CODICE)
+    assert db_manager.leggi_prodotto_per_codice(CODICE).nome == "Seconda versione"
@@ -0,0 +1,27 @@
+import csv
+import io
+import os
+import subprocess
+import sys
+
+import psycopg2
+
+from db_manager import COLONNE_ESPORTAZIONE
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "esporta_catalogo.py")
+
+
+def test_csv_sullo_standard_output_senza_messaggi(database):
+    esecuzione = subprocess.run([sys.executable, SCRIPT, "-"], capture_output=True, check=True)
+
+    righe = list(csv.reader(io.StringIO(esecuzione.stdout.decode("utf-8")), delimiter=";"))
+    assert tuple(righe[0]) == COLONNE_ESPORTAZIONE
+    assert all(len(riga) == len(COLONNE_ESPORTAZIONE) for riga in righe[1:])
+
+    with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM prodotti WHERE attivo;")
+        attivi = cursor.fetchone()[0]
+    conn.close()
+    assert len(righe) - 1 == attivi
+    # I messaggi di connessione e chiusura restano visibili sullo standard error
+    assert "✅" in esecuzione.stderr.decode("utf-8")
@@ -0,0 +1,82 @@
+import json
+
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+from indice_catalogo import IndiceCatalogo
+
+CODICE = "TEST-INDICE-CATALOGO"
+
+
+@pytest.fixture
+def db_manager(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice = %s;", (CODICE,))
+        conn.close()
+
+    pulisci()
+    manager = ProdottoDBManager()
+    assert manager.connetti()
+    yield manager
+    manager.disconnetti()
+    pulisci()
+
+
+@pytest.fixture
+def indice(db_manager):
+    indice = IndiceCatalogo()
+    indice.carica(db_manager)
+    return indice
+
+
+def notifica(codice):
+    return json.dumps({"tabella": "prodotti", "codice": codice})
+
+
+def test_ricerca_uguale_a_ricerca_prodotti_filtrata(db_manager, indice):
+    for nome, prezzo_max in [("vite", None), ("A", 50.0), (None, 10.0), ("inesistente-xyz", None)]:
+        attesi = db_manager.ricerca_prodotti_filtrata(nome=nome, prezzo_max=prezzo_max)
+        trovati = indice.cerca(nome=nome, prezzo_max=prezzo_max)
+        assert [p.codice for p in trovati] == [p.codice for p in attesi], (nome, prezzo_max)
+
+    assert indice.verifica_coerenza(db_manager) == {"mancanti": [], "in_eccesso": [], "diversi": []}
+
+
+def test_notifica_aggiunge_aggiorna_e_rimuove(db_manager, indice):
+    db_manager.inserisci_prodotto(Prodotto(CODICE, "Prodotto indicizzato", 10.0, 22.0))
+    indice.applica_notifiche([notifica(CODICE)], db_manager)
+    assert [p.codice for p in indice.cerca(nome="indicizzato")] == [CODICE]
+
+    db_manager.aggiorna_prodotto(Prodotto(CODICE, "Prodotto rinominato", 99.0, 22.0))
+    indice.applica_notifiche([notifica(CODICE)], db_manager)
+    assert indice.cerca(nome="indicizzato") == []
+    assert [p.prezzo_netto for p in indice.cerca(nome="rinominato")] == [99.0]
+
+    db_manager.elimina_prodotto(CODICE)
+    indice.applica_notifiche([notifica(CODICE)], db_manager)
+    assert indice.cerca(nome="rinominato") == []
+
+
+def test_ricarica_fallita_lascia_l_indice_intatto(db_manager, indice):
+    caricati, ricariche = len(indice), indice.ricariche
+    db_manager.disconnetti()
+
+    with pytest.raises(psycopg2.Error):
+        indice.carica(db_manager)
+
+    assert len(indice) == caricati
+    assert indice.ricariche == ricariche
+
+
+def test_rilettura_fallita_non_toglie_prodotti(db_manager, indice):
+    db_manager.inserisci_prodotto(Prodotto(CODICE, "Prodotto indicizzato", 10.0, 22.0))
+    indice.applica_notifiche([notifica(CODICE)], db_manager)
+    db_manager.disconnetti()
+
+    with pytest.raises(psycopg2.Error):
+        indice.applica_notifiche([notifica(CODICE)], db_manager)
+
+    assert [p.codice for p in indice.cerca(nome="indicizzato")] == [CODICE]
@@ -0,0 +1,79 @@
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+PREFISSO = "TEST-BULK-"
+
+
+@pytest.fixture
+def db_manager(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice LIKE %s;", (PREFISSO + "%",))
+        conn.close()
+
+    pulisci()
+    manager = ProdottoDBManager()
+    assert manager.connetti()
+    yield manager
+    manager.disconnetti()
+    pulisci()
+
+
+def prodotto(numero):
+    return Prodotto(f"{PREFISSO}{numero:03d}", f"Prodotto massivo {numero}", 10.0 + numero, 22.0)
+
+
+def codici_nel_db(database):
+    with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT id, codice FROM prodotti WHERE codice LIKE %s;", (PREFISSO + "%",))
+        righe = dict(cursor.fetchall())
+    conn.close()
+    return righe
+
+
+def test_id_nell_ordine_di_input(db_manager, database):
+    prodotti = [prodotto(n) for n in (5, 1, 4, 2, 3)]
+
+    ids, scartati = db_manager.inserisci_prodotti_bulk(prodotti, batch_size=2)
+
+    assert scartati == []
+    assert codici_nel_db(database) == {id_: p.codice for id_, p in zip(ids, prodotti)}
+
+
+def test_righe_non_valide_scartate_senza_annullare_il_batch(db_manager, database):
+    assert db_manager.inserisci_prodotto(prodotto(0)) is not None
+    troppo_lungo = prodotto(9)
+    troppo_lungo.codice = PREFISSO + "X" * 60
+    prodotti = [prodotto(1), "non un prodotto", prodotto(0), prodotto(2), prodotto(2), troppo_lungo, prodotto(3)]
+
+    ids, scartati = db_manager.inserisci_prodotti_bulk(prodotti, batch_size=100)
+
+    assert len(ids) == len(prodotti)
+    assert [indice for indice, _, _ in scartati] == [1, 2, 4, 5]
+    assert [codice for _, codice, _ in scartati] == [None, prodotto(0).codice, prodotto(2).codice, troppo_lungo.codice]
+    assert all(errore for _, _, errore in scartati)
+    assert [i for i, id_ in enumerate(ids) if id_ is not None] == [0, 3, 6]
+
+    nel_db = codici_nel_db(database)
+    assert {nel_db[ids[i]] for i in (0, 3, 6)} == {prodotto(n).codice for n in (1, 2, 3)}
+    assert len(nel_db) == 4
+
+
+def test_errore_fatale_conserva_solo_i_batch_confermati(db_manager, database):
+    def prodotti():
+        for numero in range(6):
+            if numero == 4:
+                # Primi due batch confermati: la sessione viene chiusa dal server prima del terzo
+                with psycopg2.connect(**database) as altra, altra.cursor() as cursor:
+                    cursor.execute("SELECT pg_terminate_backend(%s);", (db_manager.conn.info.backend_pid,))
+                altra.close()
+            yield prodotto(numero)
+
+    ids, scartati = db_manager.inserisci_prodotti_bulk(prodotti(), batch_size=2)
+
+    assert len(ids) == 4 and None not in ids
+    assert scartati == []
+    assert sorted(codici_nel_db(database).values()) == [prodotto(n).codice for n in range(4)]
@@ -0,0 +1,47 @@
+import threading
+
+from pool import PoolConnessioni
+
+
+def test_connessioni_riutilizzate_sotto_carico_concorrente(database):
+    pool = PoolConnessioni(1, 4, timeout=30, **database)
+    errori = []
+
+    def lavoro():
+        try:
+            for _ in range(100):
+                conn = pool.prendi()
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT 1;")
+                        cursor.fetchone()
+                    conn.rollback()
+                finally:
+                    pool.restituisci(conn)
+        except Exception as e:
+            errori.append(e)
+
+    thread = [threading.Thread(target=lavoro) for _ in range(8)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    statistiche = pool.statistiche()
+    pool.chiudi()
+
+    assert not errori
+    assert statistiche["prelievi"] == 800
+    # Le connessioni riconsegnate restano nel pool: al più una per prelievo contemporaneo
+    assert statistiche["connessioni_aperte"] <= 4
+
+
+def test_connessione_chiusa_non_torna_nel_pool(database):
+    pool = PoolConnessioni(1, 2, **database)
+    conn = pool.prendi()
+    conn.close()
+    pool.restituisci(conn)
+
+    nuova = pool.prendi()
+    assert nuova is not conn and not nuova.closed
+    pool.restituisci(nuova)
+    pool.chiudi()
@@ -0,0 +1,92 @@
+from decimal import Decimal
+
+import psycopg2
+import pytest
+
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+PREFISSO = "TEST-PREZZI-"
+FORNITORE = "Fornitore di prova prezzi"
+
+# (netto, aliquota): 0,25 x 1,22 = 0,305 e 0,45 x 1,10 = 0,495 sono mezzi centesimi esatti
+LISTINO = [("0.25", "22"), ("1.25", "10"), ("0.45", "10"), ("3.35", "4"), ("10.00", "22"), ("19.99", "22")]
+
+
+@pytest.fixture
+def catalogo(database):
+    """Prodotti di un fornitore dedicato, così le variazioni percentuali non toccano il resto del catalogo."""
+    def pulisci(cursor):
+        cursor.execute("DELETE FROM prodotti WHERE codice LIKE %s;", (PREFISSO + "%",))
+        cursor.execute("DELETE FROM fornitori WHERE nome = %s;", (FORNITORE,))
+
+    with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+        pulisci(cursor)
+        cursor.execute("INSERT INTO fornitori (nome) VALUES (%s) RETURNING id;", (FORNITORE,))
+        id_fornitore = cursor.fetchone()[0]
+        for numero, (netto, aliquota) in enumerate(LISTINO):
+            prodotto = Prodotto(f"{PREFISSO}{numero}", "Prodotto prezzi", netto, aliquota)
+            cursor.execute(
+                "INSERT INTO prodotti (codice, nome, prezzo_netto, aliquota_iva, prezzo_lordo, id_fornitore) "
+                "VALUES (%s, %s, %s, %s, %s, %s);",
+                (prodotto.codice, prodotto.nome, netto, aliquota, prodotto._prezzo_lordo, id_fornitore)
+            )
+    conn.close()
+
+    manager = ProdottoDBManager()
+    assert manager.connetti()
+    yield manager, id_fornitore
+    manager.disconnetti()
+
+    with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+        pulisci(cursor)
+    conn.close()
+
+
+def prezzi_nel_db(manager):
+    with manager._connessione() as (conn, cursor):
+        cursor.execute("SELECT codice, prezzo_netto, aliquota_iva, prezzo_lordo FROM prodotti WHERE codice LIKE %s;",
+                       (PREFISSO + "%",))
+        righe = cursor.fetchall()
+        conn.rollback()
+    return {codice: (netto, aliquota, lordo) for codice, netto, aliquota, lordo in righe}
+
+
+def atteso(netto, aliquota):
+    """Netto e lordo calcolati da Prodotto per gli stessi valori."""
+    prodotto = Prodotto("ATTESO", "Atteso", netto, aliquota)
+    return prodotto._prezzo_netto, prodotto._prezzo_lordo
+
+
+@pytest.mark.parametrize("percentuale", [0, "0.05", -10, "3.3", 50])
+def test_variazione_percentuale_come_prodotto(catalogo, percentuale):
+    manager, id_fornitore = catalogo
+    prima = prezzi_nel_db(manager)
+
+    assert manager.aggiorna_prezzi_percentuale(percentuale, id_fornitore=id_fornitore) == len(LISTINO)
+
+    fattore = 1 + Decimal(str(percentuale)) / 100
+    for codice, (netto, aliquota, lordo) in prezzi_nel_db(manager).items():
+        netto_prima, _, _ = prima[codice]
+        assert (netto, lordo) == atteso(netto_prima * fattore, aliquota), codice
+
+
+def test_mezzo_centesimo_arrotondato_per_eccesso(catalogo):
+    manager, id_fornitore = catalogo
+    manager.aggiorna_prezzi_percentuale(0, id_fornitore=id_fornitore)
+
+    nel_db = prezzi_nel_db(manager)
+    assert nel_db[PREFISSO + "0"][2] == Decimal("0.31")
+    assert nel_db[PREFISSO + "2"][2] == Decimal("0.50")
+
+
+def test_prezzi_per_codice_come_prodotto(catalogo):
+    manager, _ = catalogo
+    nuovi = {PREFISSO + "0": "1.005", PREFISSO + "1": "2.675", PREFISSO + "2": 0.45, PREFISSO + "3": "7.125"}
+
+    assert manager.aggiorna_prezzi_per_codice(nuovi) == (len(nuovi), [])
+
+    nel_db = prezzi_nel_db(manager)
+    for codice, nuovo_netto in nuovi.items():
+        netto, aliquota, lordo = nel_db[codice]
+        assert (netto, lordo) == atteso(nuovo_netto, aliquota), codice
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from app import crea_app
+from classe import Prodotto
+from db_manager import ProdottoDBManager
+
+# Il primario fa anche da replica (più repliche sono più voci verso lo stesso server):
+# si verificano l'instradamento delle letture e il riuso delle connessioni
+CODICE = "TEST-REPLICHE"
+
+
+def replica_irraggiungibile(database):
+    return {**database, "port": 1}
+
+
+@pytest.fixture
+def pulizia(database):
+    def pulisci():
+        with psycopg2.connect(**database) as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM prodotti WHERE codice = %s;", (CODICE,))
+        conn.close()
+
+    pulisci()
+    yield
+    pulisci()
+
+
+def prelievi(manager):
+    return [replica.get("prelievi", 0) for replica in manager.statistiche_repliche()]
+
+
+def test_connessione_della_replica_riutilizzata_senza_pool(database):
+    manager = ProdottoDBManager(repliche=[database])
+    assert manager.connetti()
+    try:
+        for _ in range(50):
+            assert manager.leggi_tutti_i_fornitori() is not None
+
+        replica = manager.statistiche_repliche()[0]
+        assert replica["min"] == 1
+        assert replica["connessioni_aperte"] == 1
+    finally:
+        manager.disconnetti()
+
+
+def test_connessioni_della_replica_riutilizzate_sotto_carico_concorrente(database):
+    manager = ProdottoDBManager(pool_min=1, pool_max=4, pool_timeout=30, repliche=[database])
+    assert manager.connetti()
+    errori = []
+
+    def lettore():
+        try:
+            for _ in range(50):
+                assert manager.leggi_tutti_i_fornitori() is not None
+        except Exception as e:
+            errori.append(e)
+
+    try:
+        lettori = [threading.Thread(target=lettore) for _ in range(8)]
+        for thread in lettori:
+            thread.start()
+        for thread in lettori:
+            thread.join()
+
+        assert not errori
+        replica = manager.statistiche_repliche()[0]
+        assert replica["connessioni_aperte"] <= 4
+    finally:
+        manager.disconnetti()
+
+
+def test_round_robin_alterna_le_repliche(database):
+    manager = ProdottoDBManager(repliche=[database, dict(database)])
+    assert manager.connetti()
+    try:
+        scelte = [manager._scegli_replica() for _ in range(4)]
+        assert scelte == [manager._repliche[0], manager._repliche[1]] * 2
+    finally:
+        manager.disconnetti()
+
+
+def test_meno_carico_sceglie_la_replica_meno_impegnata(database):
+    manager = ProdottoDBManager(pool_max=2, repliche=[database, dict(database)], repliche_strategia="meno_carico")
+    assert manager.connetti()
+    try:
+        impegnata = manager._repliche[0]
+        conn = manager._preleva_da_replica(impegnata)
+        try:
+            assert all(manager._scegli_replica() is manager._repliche[1] for _ in range(4))
+        finally:
+            impegnata.pool.restituisci(conn)
+    finally:
+        manager.disconnetti()
+
+
+def test_dopo_una_scrittura_il_thread_legge_dal_primario(database, pulizia):
+    manager = ProdottoDBManager(repliche=[database], repliche_aderenza=0.5, cache_dimensione=100)
+    assert manager.connetti()
+    try:
+        assert manager._scegli_replica() is manager._repliche[0]
+        assert manager.inserisci_prodotto(Prodotto(CODICE, "Scritto dal thread", 10.0, 22.0)) is not None
+        assert manager._scegli_replica() is None
+
+        # Un altro thread ha riempito la cache da una replica in ritardo: il thread che ha scritto non la usa
+        manager.cache.scrivi(CODICE, None)
+        assert manager.leggi_prodotto_per_codice(CODICE).nome == "Scritto dal thread"
+        assert manager.leggi_prodotti_per_codici([CODICE])[CODICE] is not None
+        assert prelievi(manager) == [0]
+
+        # Gli altri thread continuano a leggere dalle repliche
+        scelte = []
+        altro = threading.Thread(target=lambda: scelte.append(manager._scegli_replica()))
+        altro.start()
+        altro.join()
+        assert scelte == [manager._repliche[0]]
+
+        time.sleep(0.5)
+        assert manager._scegli_replica() is manager._repliche[0]
+    finally:
+        manager.disconnetti()
+
+
+def test_replica_irraggiungibile_esclusa_e_letture_al_primario(database):
+    manager = ProdottoDBManager(repliche=[replica_irraggiungibile(database)])
+    assert manager.connetti()
+    try:
+        assert manager.leggi_tutti_i_fornitori() is not None
+        assert manager.statistiche_repliche()[0]["disponibile"] is False
+        assert manager._scegli_replica() is None
+    finally:
+        manager.disconnetti()
+
+
+@pytest.mark.parametrize("parametri", ["", "?stream=1", "?limit=5"])
+def test_versione_ed_elenco_dalla_stessa_replica(database, parametri):
+    manager = ProdottoDBManager(pool_max=2, repliche=[database, dict(database)])
+    assert manager.connetti()
+    client = crea_app(db_manager=manager).test_client()
+    try:
+        for _ in range(4):
+            prima = prelievi(manager)
+            risposta = client.get(f"/api/v1/prodotti{parametri}")
+            assert risposta.status_code == 200
+            assert risposta.headers.get("ETag")
+            risposta.get_data()
+            # Due letture per richiesta (versione ed elenco), entrambe dalla stessa replica
+            assert sorted(dopo - precedenti for dopo, precedenti in zip(prelievi(manager), prima)) == [0, 2]
+    finally:
+        manager.disconnetti()
@@ -0,0 +1,51 @@
+import psycopg2
+import pytest
+
+from app import crea_app, genera_array_json, genera_ndjson
+from db_manager import ProdottoDBManager
+
+
+@pytest.fixture
+def db_manager(database):
+    manager = ProdottoDBManager()
+    assert manager.connetti()
+    yield manager
+    manager.disconnetti()
+
+
+def interrompi_dopo(frammenti, conn, blocchi, database):
+    """Inoltra i frammenti e, dopo `blocchi` frammenti, termina dal server la sessione di `conn`."""
+    for numero, frammento in enumerate(frammenti, start=1):
+        yield frammento
+        if numero == blocchi:
+            with psycopg2.connect(**database) as altra, altra.cursor() as cursor:
+                cursor.execute("SELECT pg_terminate_backend(%s);", (conn.info.backend_pid,))
+            altra.close()
+
+
+@pytest.mark.parametrize("genera", [genera_array_json, genera_ndjson])
+def test_errore_a_meta_flusso_non_chiude_la_risposta(db_manager, database, genera):
+    oggetti = (p.codice for p in db_manager.itera_prodotti(itersize=100, solleva=True))
+    inviati = []
+
+    with pytest.raises(psycopg2.Error):
+        for frammento in interrompi_dopo(genera(oggetti), db_manager.conn, 2, database):
+            inviati.append(frammento)
+
+    assert inviati
+    assert not "".join(inviati).endswith("]")
+
+
+def test_elenco_in_streaming_troncato_non_sembra_completo(db_manager, database):
+    app = crea_app(db_manager=db_manager)
+    risposta = app.test_client().get('/api/v1/prodotti?stream=1', buffered=False)
+    assert risposta.status_code == 200
+    inviati = []
+
+    with pytest.raises(psycopg2.Error):
+        for frammento in interrompi_dopo(risposta.response, db_manager.conn, 2, database):
+            inviati.append(frammento)
+
+    corpo = b"".join(inviati)
+    assert corpo.startswith(b"[")
+    assert not corpo.endswith(b"]")